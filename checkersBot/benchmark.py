@@ -0,0 +1,203 @@
+from __future__ import annotations
+from .color import Color
+from .detection import FindMarkers, FindBoardCoords, BoardDestination, ReadBoardArray, ReadBoardWarped
+from .calibration import BoardCalibration
+from .colorlut import ColorLUT
+from checkersGame.board import Board
+from .synthetic import RenderBoard, RandomPosition, LoadRecorded
+from time import perf_counter
+import argparse
+import numpy
+import cv2
+
+_red = "\033[31m"
+_blue = "\033[34m"
+_white = "\033[37m"
+_yellow = "\033[33m"
+_green = "\033[32m"
+_cyan = "\033[96m"
+
+"""
+    Offline benchmark of the vision pipeline, no robot or camera needed
+
+    Usage:
+        python -m checkersBot.benchmark --frames 50 --perspective 0.08 --noise 8 --gradient 0.4
+        python -m checkersBot.benchmark --recorded RECORDINGS/
+
+    Stages measured per frame:
+        - markers: full frame ArUco detection
+        - coords: homography and cell projection from detected markers
+        - drift: calibration drift check around the known markers
+        - read: ReadBoardArray over the full frame
+        - warped: ReadBoardWarped over a small warped image of the board
+        - lut: ColorLUT.Read over the warped board, the table is calibrated on a separate frame
+    Accuracy is the fraction of cells whose player (empty, 1 or -1) was read correctly.
+"""
+
+def _Sign(IDs) -> numpy.ndarray:
+    return numpy.sign(numpy.asarray(IDs)).astype(numpy.int8)
+class BenchmarkResult:
+    """Stores latencies and accuracies of every stage over a set of frames"""
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = {}
+        self.accuracies: dict[str, list[float]] = {}
+        self.failures: dict[str, int] = {}
+    def AddLatency(self, stage: str, seconds: float):
+        self.latencies.setdefault(stage, []).append(seconds)
+    def AddAccuracy(self, stage: str, accuracy: float):
+        self.accuracies.setdefault(stage, []).append(accuracy)
+    def AddFailure(self, stage: str):
+        self.failures[stage] = self.failures.get(stage, 0) + 1
+    def __str__(self) -> str:
+        """Returns a table with latency percentiles and accuracy per stage
+
+        Returns:
+            str: Report of the benchmark
+        """
+        report = f"{'stage':<10}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'accuracy':>10}{'failures':>10}\n"
+        for stage, values in self.latencies.items():
+            ms = numpy.array(values) * 1000
+            accuracy = f"{numpy.mean(self.accuracies[stage]):.4f}" if stage in self.accuracies else "-"
+            report += f"{stage:<10}{numpy.percentile(ms, 50):>10.3f}{numpy.percentile(ms, 95):>10.3f}{ms.max():>10.3f}{accuracy:>10}{self.failures.get(stage, 0):>10}\n"
+        return report
+def _Timed(function, *args, repeats = 1, **kwargs):
+    """Runs a function repeatedly and returns its last result and its fastest time"""
+    best = float("inf")
+    for _ in range(repeats):
+        start = perf_counter()
+        result = function(*args, **kwargs)
+        best = min(best, perf_counter() - start)
+    return result, best
+def CalibrateLUT(frame, IDs, size = 6) -> ColorLUT:
+    """Builds a color table from a frame of a known position, as main does right after setting the board
+
+    Args:
+        frame (numpy.array): BGR frame.
+        IDs (numpy.array): (N, N+2) tile IDs in the frame.
+        size (int, optional): Size of the board (N). Defaults to 6.
+
+    Returns:
+        ColorLUT: Calibrated table, None if the markers were not found
+    """
+    markers = FindMarkers(frame)
+    if len(markers) < 4:
+        return None
+    _, corners = FindBoardCoords(frame, size, markers=markers)
+    colors = ColorLUT()
+    colors.Calibrate(frame, cv2.getPerspectiveTransform(corners, BoardDestination(size)), IDs, size)
+    return colors
+def BenchmarkFrame(result: BenchmarkResult, frame, truth, player1: Color, player2: Color, size = 6, repeats = 3, colors: ColorLUT = None):
+    """Runs every stage over a single frame and stores its measures
+
+    Args:
+        result (BenchmarkResult): Result to add the measures to.
+        frame (numpy.array): BGR frame.
+        truth (numpy.array): (N, N+2) true tile IDs.
+        player1 (Color): Color of player1 Tiles (1).
+        player2 (Color): Color of player2 Tiles (-1).
+        size (int, optional): Size of the board (N). Defaults to 6.
+        repeats (int, optional): Runs per stage, the fastest one is kept. Defaults to 3.
+        colors (ColorLUT, optional): Calibrated color table, the lut stage is skipped without it. Defaults to None.
+    """
+    truth = _Sign(truth)
+    markers, seconds = _Timed(FindMarkers, frame, repeats=repeats)
+    result.AddLatency("markers", seconds)
+    if len(markers) < 4:
+        result.AddFailure("markers")
+        return
+    (coords, corners), seconds = _Timed(FindBoardCoords, frame, size, markers=markers, repeats=repeats)
+    result.AddLatency("coords", seconds)
+    calibration = BoardCalibration(size, path=None)
+    calibration.markers, calibration.coords, calibration.corners = markers, coords, corners
+    calibration.M = cv2.getPerspectiveTransform(corners, BoardDestination(size))
+    _, seconds = _Timed(calibration.Drift, frame, repeats=repeats)
+    result.AddLatency("drift", seconds)
+    IDs, seconds = _Timed(ReadBoardArray, frame, player1, player2, coords, size, repeats=repeats)
+    result.AddLatency("read", seconds)
+    result.AddAccuracy("read", float((_Sign(IDs) == truth).mean()))
+    IDs, seconds = _Timed(ReadBoardWarped, frame, player1, player2, calibration.M, size, repeats=repeats)
+    result.AddLatency("warped", seconds)
+    result.AddAccuracy("warped", float((_Sign(IDs) == truth).mean()))
+    if colors is None:
+        return
+    IDs, seconds = _Timed(colors.Read, frame, calibration.M, size, repeats=repeats)
+    result.AddLatency("lut", seconds)
+    result.AddAccuracy("lut", float((_Sign(IDs) == truth).mean()))
+def BenchmarkSynthetic(frames = 20, player1: Color = Color(35, 85, 120), player2: Color = Color(110, 250, 80), size = 6, resolution = (480, 640), perspective = 0.05, brightness = 1.0, gradient = 0.0, noise = 4.0, repeats = 3, seed = 0, debug = False) -> BenchmarkResult:
+    """Benchmarks the vision pipeline over synthetic frames of random positions
+
+    Args:
+        frames (int, optional): Ammount of frames to render. Defaults to 20.
+        player1 (Color, optional): Color of player1 Tiles (1). Defaults to Color(35, 85, 120).
+        player2 (Color, optional): Color of player2 Tiles (-1). Defaults to Color(110, 250, 80).
+        size (int, optional): Size of the board (N). Defaults to 6.
+        resolution (tuple[int, int], optional): Frame height and width. Defaults to (480, 640).
+        perspective (float, optional): Random corner displacement, see RenderBoard. Defaults to 0.05.
+        brightness (float, optional): Multiplier of the V channel. Defaults to 1.0.
+        gradient (float, optional): Strength of a lighting gradient. Defaults to 0.0.
+        noise (float, optional): Standard deviation of pixel noise. Defaults to 4.0.
+        repeats (int, optional): Runs per stage, the fastest one is kept. Defaults to 3.
+        seed (int, optional): Seed of the random generators. Defaults to 0.
+
+    Returns:
+        BenchmarkResult: Measures of every stage
+    """
+    result = BenchmarkResult()
+    #The color table is calibrated on the starting position under the same lighting, as in a game
+    start = Board(1, size)
+    start.SetBoard()
+    frame, truth, _ = RenderBoard(start, player1, player2, resolution, perspective=perspective, brightness=brightness, gradient=gradient, noise=noise, seed=seed + frames)
+    colors = CalibrateLUT(frame, truth, size)
+    if colors is None:
+        result.AddFailure("lut")
+    for i in range(frames):
+        board = RandomPosition(size, i % 20, seed + i)
+        frame, truth, _ = RenderBoard(board, player1, player2, resolution, perspective=perspective, brightness=brightness, gradient=gradient, noise=noise, seed=seed + i)
+        BenchmarkFrame(result, frame, truth, player1, player2, size, repeats, colors)
+        if debug: print(_green + f"Benchmarked synthetic frame [{i + 1}/{frames}]" + _white)
+    return result
+def BenchmarkRecorded(directory: str, player1: Color = Color(35, 85, 120), player2: Color = Color(110, 250, 80), repeats = 3, debug = False) -> BenchmarkResult:
+    """Benchmarks the vision pipeline over recorded frames, see synthetic.LoadRecorded
+
+    The color table is calibrated on the first frame, which is then left out of the lut stage.
+
+    Args:
+        directory (str): Directory with the frames and labels.
+        player1 (Color, optional): Default color of player1 Tiles, overridden by labels. Defaults to Color(35, 85, 120).
+        player2 (Color, optional): Default color of player2 Tiles, overridden by labels. Defaults to Color(110, 250, 80).
+        repeats (int, optional): Runs per stage, the fastest one is kept. Defaults to 3.
+
+    Returns:
+        BenchmarkResult: Measures of every stage
+    """
+    result = BenchmarkResult()
+    table = None
+    for i, (frame, truth, label) in enumerate(LoadRecorded(directory)):
+        if i == 0:
+            table = CalibrateLUT(frame, truth, truth.shape[0])
+        colors = [Color(*label[key]) if key in label else default for key, default in [("player1", player1), ("player2", player2)]]
+        BenchmarkFrame(result, frame, truth, *colors, truth.shape[0], repeats, table if i > 0 else None)
+        if debug: print(_green + f"Benchmarked recorded frame" + _white)
+    return result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmark of the vision pipeline")
+    parser.add_argument("--frames", type=int, default=20)
+    parser.add_argument("--size", type=int, default=6)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--perspective", type=float, default=0.05)
+    parser.add_argument("--brightness", type=float, default=1.0)
+    parser.add_argument("--gradient", type=float, default=0.0)
+    parser.add_argument("--noise", type=float, default=4.0)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--recorded", type=str, default=None, help="Directory of labeled recorded frames")
+    args = parser.parse_args()
+    if args.recorded:
+        print(BenchmarkRecorded(args.recorded, repeats=args.repeats))
+    else:
+        print(BenchmarkSynthetic(
+            args.frames, size=args.size, resolution=(args.height, args.width), perspective=args.perspective,
+            brightness=args.brightness, gradient=args.gradient, noise=args.noise, repeats=args.repeats, seed=args.seed
+        ))
@@ -0,0 +1,195 @@
+from __future__ import annotations
+from .detection import FindMarkers, FindBoardCoords, BoardDestination, ReadBoardWarped, ReadBoardProbabilities, TilesFromArray
+from .colorlut import ColorLUT
+from .color import Color
+from checkersGame.board import Tile
+import numpy
+import cv2
+import os
+
+_red = "\033[31m"
+_blue = "\033[34m"
+_white = "\033[37m"
+_yellow = "\033[33m"
+_green = "\033[32m"
+_cyan = "\033[96m"
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, ".."))
+CALIBRATION_PATH = os.path.join(PROJECT_ROOT, "CALIBRATION", "board.npz")
+COLORS_PATH = os.path.join(PROJECT_ROOT, "CALIBRATION", "colors.npz")
+
+class BoardCalibration:
+    """Caches the board homography and cell coordinates, only recalculating them when the board moves"""
+    def __init__(self, size = 6, path: str = CALIBRATION_PATH, tolerance = 3.0, margin = 30, colorsPath: str = COLORS_PATH, debug = False):
+        """Initializes the calibration, loading it from disk if a file exists
+
+        Args:
+            size (int, optional): Size of the board (N). Defaults to 6.
+            path (str, optional): File to store the calibration in, None to keep it in memory only. Defaults to CALIBRATION_PATH.
+            tolerance (float, optional): Marker displacement in pixels considered as drift. Defaults to 3.0.
+            margin (int, optional): Pixels added around each marker when looking for it again. Defaults to 30.
+            colorsPath (str, optional): File to store the color table in, None to keep it in memory only. Defaults to COLORS_PATH.
+        """
+        assert 0 < tolerance, _red + f"Drift tolerance must be greater than 0" + _white
+        self.size = size
+        self.path = path
+        self.tolerance = tolerance
+        self.margin = margin
+        self.debug = debug
+        self.markers: dict[int, numpy.ndarray] = {}
+        self.coords = None
+        self.corners = None
+        self.M = None
+        self.recalibrations = 0
+        self.colors = ColorLUT(debug=debug)
+        self.colorsPath = colorsPath
+        if path is not None and os.path.exists(path):
+            self.Load(path)
+        if colorsPath is not None and os.path.exists(colorsPath):
+            self.colors.Load(colorsPath)
+    def IsCalibrated(self) -> bool:
+        """Checks if the calibration holds board coordinates
+
+        Returns:
+            bool:
+        """
+        return self.coords is not None
+    def Calibrate(self, frame, debug = False):
+        """Detects the markers on the full frame and recalculates the board coordinates
+
+        Args:
+            frame (numpy.array): Frame to calibrate with.
+        """
+        debug = debug or self.debug
+        markers = FindMarkers(frame, debug=debug)
+        coords, corners = FindBoardCoords(frame, self.size, debug, markers)
+        self.markers = markers
+        self.coords = coords
+        self.corners = numpy.array(corners, dtype=numpy.float32)
+        self.M = cv2.getPerspectiveTransform(self.corners, BoardDestination(self.size))
+        self.recalibrations += 1
+        if debug: print(_green + f"Calibrated board of size [{self.size}] with corners {self.corners.tolist()}" + _white)
+        if self.path is not None:
+            self.Save(self.path)
+    def Drift(self, frame, debug = False) -> float:
+        """Measures how much the markers moved since calibration, searching only around their last known positions
+
+        Args:
+            frame (numpy.array): Frame to check.
+
+        Returns:
+            float: Largest marker displacement in pixels, infinity if a marker could not be found
+        """
+        assert self.IsCalibrated(), _red + f"Calibration {repr(self)} must be calibrated before checking drift" + _white
+        h, w = frame.shape[:2]
+        drift = 0.0
+        for id, corners in self.markers.items():
+            x1, y1 = numpy.floor(corners.min(axis=0)).astype(int) - self.margin
+            x2, y2 = numpy.ceil(corners.max(axis=0)).astype(int) + self.margin
+            x1, y1, x2, y2 = max(0, x1), max(0, y1), min(w, x2), min(h, y2)
+            found = FindMarkers(frame[y1:y2, x1:x2], [id])
+            if id not in found:
+                if debug: print(_yellow + f"Marker [{id}] not found around its calibrated position" + _white)
+                return float("inf")
+            offset = numpy.abs(found[id] + numpy.array([x1, y1], dtype=numpy.float32) - corners).max()
+            drift = max(drift, float(offset))
+        if debug: print(_green + f"Measured board drift of [{drift:.2f}] pixels" + _white)
+        return drift
+    def Update(self, frame, force = False, debug = False):
+        """Returns board coordinates for a frame, recalibrating only if forced, uncalibrated or drifted
+
+        Args:
+            frame (numpy.array): Frame to check.
+            force (bool, optional): If True always recalibrates. Defaults to False.
+
+        Returns:
+            tuple[numpy.array, numpy.array]: Board coordinates and corners, same as FindBoardCoords
+        """
+        debug = debug or self.debug
+        if force or not self.IsCalibrated() or self.Drift(frame, debug) > self.tolerance:
+            if debug: print(_yellow + f"Recalibrating board coordinates" + _white)
+            self.Calibrate(frame, debug)
+        return self.coords, self.corners
+    def CalibrateColors(self, frame, IDs, pixels = 20, debug = False):
+        """Builds the color table from a frame of a board in a known position, usually right after SetBoard
+
+        Once built, Read and ReadProbabilities use the table instead of the player colors.
+
+        Args:
+            frame (numpy.array): Frame of the board.
+            IDs (numpy.array): (N, N+2) tile IDs on the board.
+            pixels (int, optional): Side of each cell block in the warped image. Defaults to 20.
+        """
+        assert self.IsCalibrated(), _red + f"Calibration {repr(self)} must be calibrated before calibrating colors" + _white
+        self.colors.debug = debug or self.debug
+        self.colors.Calibrate(frame, self.M, IDs, self.size, pixels)
+        if self.colorsPath is not None:
+            self.colors.Save(self.colorsPath)
+    def ResetColors(self):
+        """Discards the color table, reads use the player colors until CalibrateColors runs again"""
+        self.colors.table, self.colors.centers = None, None #Cleared in place, watchers keep a reference to the table
+        if self.debug: print(_yellow + f"Discarded color table, reading with player colors" + _white)
+    def Read(self, frame, player1: Color, player2: Color, window = 20, pixels = 20, debug = False) -> list[list[Tile]]:
+        """Reads the board over a warped image of only the board region, with the color table if calibrated or else ReadBoardWarped
+
+        Args:
+            frame (numpy.array): Frame to read.
+            player1 (Color): Color of player1 Tiles (1).
+            player2 (Color): Color of player2 Tiles (-1).
+            window (int, optional): Color range used. Defaults to 20.
+            pixels (int, optional): Side of each cell block in the warped image. Defaults to 20.
+
+        Returns:
+            list[list[Tile]]: Board with ID values of each player's tile positions
+        """
+        assert self.IsCalibrated(), _red + f"Calibration {repr(self)} must be calibrated before reading a board" + _white
+        if self.colors.IsCalibrated():
+            return TilesFromArray(self.colors.Read(frame, self.M, self.size, pixels))
+        IDs = ReadBoardWarped(frame, player1, player2, self.M, self.size, window, pixels, debug or self.debug)
+        return TilesFromArray(IDs)
+    def ReadProbabilities(self, frame, player1: Color, player2: Color, window = 20, pixels = 20, debug = False) -> numpy.ndarray:
+        """Reads per cell probabilities over a warped image of only the board region, with the color table if calibrated or else ReadBoardProbabilities
+
+        Args:
+            frame (numpy.array): Frame to read.
+            player1 (Color): Color of player1 Tiles (1).
+            player2 (Color): Color of player2 Tiles (-1).
+            window (int, optional): Color range used. Defaults to 20.
+            pixels (int, optional): Side of each cell block in the warped image. Defaults to 20.
+
+        Returns:
+            numpy.array: Array of (N, N+2, 3) probabilities for IDs [0, 1, -1]
+        """
+        assert self.IsCalibrated(), _red + f"Calibration {repr(self)} must be calibrated before reading a board" + _white
+        if self.colors.IsCalibrated():
+            return self.colors.ReadProbabilities(frame, self.M, self.size, pixels)
+        return ReadBoardProbabilities(frame, player1, player2, self.M, self.size, window, pixels, debug or self.debug)
+    def Save(self, path: str):
+        """Stores the calibration in a file
+
+        Args:
+            path (str): File to write.
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        ids = sorted(self.markers)
+        with open(path, "wb") as file:
+            numpy.savez(
+                file, size=self.size, coords=self.coords, corners=self.corners, M=self.M,
+                markerIDs=numpy.array(ids, dtype=int),
+                markerCorners=numpy.array([self.markers[id] for id in ids], dtype=numpy.float32),
+            )
+        if self.debug: print(_green + f"Saved board calibration to {path}" + _white)
+    def Load(self, path: str):
+        """Loads the calibration from a file, ignoring files made for a different board size
+
+        Args:
+            path (str): File to read.
+        """
+        data = numpy.load(path)
+        if int(data["size"]) != self.size:
+            if self.debug: print(_yellow + f"Ignoring calibration {path} made for board size [{int(data['size'])}]" + _white)
+            return
+        self.coords, self.corners, self.M = data["coords"], data["corners"], data["M"]
+        self.markers = {int(id): corners for id, corners in zip(data["markerIDs"], data["markerCorners"])}
+        if self.debug: print(_green + f"Loaded board calibration from {path}" + _white)
@@ -1,5 +1,3 @@
-from numpy import array
-
 _red = "\033[31m"
 _blue = "\033[34m"
 _white = "\033[37m"
@@ -28,7 +26,7 @@ class Color:
             list[int]: Values H, S and V as an array.
         """
         return [self.H, self.S, self.V]
-    def AsRange(self, window = 0, isLow = True) -> array:
+    def AsRange(self, window = 0, isLow = True) -> "numpy.ndarray":
         """Returns low or high value around acolor with range "window" as a numpy array
 
         Args:
@@ -39,6 +37,7 @@ class Color:
             numpy.array: Lowest or highest array of values HSV.
         """
         assert 0 <= window <= 255, _red + f"Window range for color {repr(self)} must be bewteen 0 and 255" + _white
+        from numpy import array #Imported on use, so importing Color does not load numpy
         if isLow: return array([self.H - window, self.S - window, self.V - window])
         else: return array([self.H + window, self.S + window, self.V + window])
     def __str__(self) -> str:
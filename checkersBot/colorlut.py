@@ -0,0 +1,160 @@
+from __future__ import annotations
+from .color import Color
+from .detection import WarpBoard, ToHSV
+from checkersGame.telemetry import Traced
+import numpy
+import cv2
+import os
+
+_red = "\033[31m"
+_blue = "\033[34m"
+_white = "\033[37m"
+_yellow = "\033[33m"
+_green = "\033[32m"
+_cyan = "\033[96m"
+
+_IDs = numpy.array([0, 1, -1], dtype=numpy.int8)
+
+class ColorLUT:
+    """Precomputed HSV to tile class table, calibrated from a board in a known position"""
+    def __init__(self, shifts: list[int] = [2, 3, 3], clusters: list[int] = [3, 2, 2], debug = False):
+        """Initializes an empty table, see Calibrate
+
+        Args:
+            shifts (list[int], optional): Bits dropped from H, S and V to index the table. Defaults to [2, 3, 3] (45x32x32 entries).
+            clusters (list[int], optional): Ammount of color clusters for empty cells, player1 and player2. Defaults to [3, 2, 2].
+        """
+        assert len(shifts) == 3 and all(0 <= shift < 8 for shift in shifts), _red + f"Table shifts must be 3 values between 0 and 7" + _white
+        assert len(clusters) == 3 and all(0 < k for k in clusters), _red + f"Clusters must be 3 values greater than 0" + _white
+        self.shifts = numpy.array(shifts)
+        self.clusters = clusters
+        self.table = None
+        self.centers = None
+        self.debug = debug
+    def IsCalibrated(self) -> bool:
+        """Checks if the table has been built
+
+        Returns:
+            bool:
+        """
+        return self.table is not None
+    def Calibrate(self, frame, M, IDs, size = 6, pixels = 20):
+        """Samples every cell of a board in a known position, clusters the colors of each class and builds the table
+
+        Args:
+            frame (numpy.array): BGR frame of the board.
+            M (numpy.array): (3, 3) homography from the frame to warped space.
+            IDs (numpy.array): (N, N+2) tile IDs on the board, usually the starting position right after SetBoard.
+            size (int, optional): Size of the board (N). Defaults to 6.
+            pixels (int, optional): Side of each cell block in the warped image. Defaults to 20.
+        """
+        hsv = cv2.cvtColor(WarpBoard(frame, M, size, pixels), cv2.COLOR_BGR2HSV)
+        samples = self._CellPixels(hsv, size, pixels // 2) #(N, N+2, patch pixels, 3)
+        classes = numpy.sign(numpy.asarray(IDs)).astype(int) % 3 #0 empty, 1 player1, 2 player2
+        centers, labels = [], []
+        for c, k in enumerate(self.clusters):
+            points = samples[classes == c].reshape(-1, 3).astype(numpy.float32)
+            assert len(points) > 0, _red + f"Board used for calibration has no cells with ID {_IDs[c]}" + _white
+            k = min(k, len(points))
+            criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 20, 1.0)
+            _, assigned, means = cv2.kmeans(points, k, None, criteria, 3, cv2.KMEANS_PP_CENTERS)
+            for cluster in range(k):
+                members = points[assigned.flatten() == cluster]
+                if len(members) == 0:
+                    continue
+                spread = numpy.maximum(members.std(axis=0), [3, 8, 8]) #Floor avoids overfitting to very uniform clusters
+                centers.append(numpy.concatenate([means[cluster], spread]))
+                labels.append(c)
+        self.centers = numpy.array(centers)
+        self.labels = numpy.array(labels)
+        self._Build()
+        if self.debug: print(_green + f"Calibrated color table with [{len(centers)}] clusters" + _white)
+    def _Build(self):
+        """Assigns the class of the nearest cluster to every bin of the table"""
+        bins = [(256 >> shift) if i else (180 >> shift) + 1 for i, shift in enumerate(self.shifts)]
+        grid = numpy.stack(numpy.meshgrid(*[(numpy.arange(n) << shift) + (1 << shift) / 2 for n, shift in zip(bins, self.shifts)], indexing="ij"), axis=-1)
+        difference = numpy.abs(grid[..., None, :] - self.centers[:, :3]) #(H, S, V, clusters, 3)
+        difference[..., 0] = numpy.minimum(difference[..., 0], 180 - difference[..., 0]) #Hue is circular
+        distance = ((difference / self.centers[:, 3:]) ** 2).sum(axis=-1)
+        self.table = self.labels[numpy.argmin(distance, axis=-1)].astype(numpy.uint8)
+    def _CellPixels(self, hsv, size, patch) -> numpy.ndarray:
+        """Returns the central patch pixels of every cell block of a warped HSV board"""
+        pixels = hsv.shape[0] // size
+        start = (pixels - patch) // 2
+        blocks = hsv.reshape(size, pixels, size + 2, pixels, 3)[:, start:start + patch, :, start:start + patch]
+        return blocks.transpose(0, 2, 1, 3, 4).reshape(size, size + 2, patch * patch, 3)
+    @Traced("detection.Classify")
+    def ClassifyPixels(self, hsv) -> numpy.ndarray:
+        """Looks up the class of every pixel with a single indexing operation
+
+        Args:
+            hsv (numpy.array): HSV image or array of (..., 3) HSV values.
+
+        Returns:
+            numpy.array: uint8 array of (...) classes, 0 empty, 1 player1 and 2 player2
+        """
+        assert self.IsCalibrated(), _red + f"Color table {repr(self)} must be calibrated before classifying" + _white
+        hsv = numpy.asarray(hsv)
+        return self.table[hsv[..., 0] >> self.shifts[0], hsv[..., 1] >> self.shifts[1], hsv[..., 2] >> self.shifts[2]]
+    @Traced("detection.ReadProbabilities")
+    def ReadProbabilities(self, frame, M, size = 6, pixels = 20, smoothing = 1.0) -> numpy.ndarray:
+        """Reads a board by voting the class of every pixel of each cell's central patch
+
+        Args:
+            frame (numpy.array): BGR frame of the board.
+            M (numpy.array): (3, 3) homography from the frame to warped space.
+            size (int, optional): Size of the board (N). Defaults to 6.
+            pixels (int, optional): Side of each cell block in the warped image. Defaults to 20.
+            smoothing (float, optional): Votes added to every class so no probability is exactly 0. Defaults to 1.0.
+
+        Returns:
+            numpy.array: Array of (N, N+2, 3) probabilities for IDs [0, 1, -1], same as detection.CellProbabilities
+        """
+        hsv = ToHSV(WarpBoard(frame, M, size, pixels))
+        classes = self.ClassifyPixels(self._CellPixels(hsv, size, pixels // 2))
+        votes = (classes[..., None] == numpy.arange(3)).sum(axis=-2) + smoothing
+        return votes / votes.sum(axis=-1, keepdims=True)
+    def Read(self, frame, M, size = 6, pixels = 20) -> numpy.ndarray:
+        """Reads a board with a hard decision per cell
+
+        Args:
+            frame (numpy.array): BGR frame of the board.
+            M (numpy.array): (3, 3) homography from the frame to warped space.
+            size (int, optional): Size of the board (N). Defaults to 6.
+            pixels (int, optional): Side of each cell block in the warped image. Defaults to 20.
+
+        Returns:
+            numpy.array: int8 array of (N, N+2) tile IDs
+        """
+        return _IDs[numpy.argmax(self.ReadProbabilities(frame, M, size, pixels), axis=-1)]
+    def PlayerColors(self) -> tuple[Color, Color]:
+        """Returns the main calibrated color of each player, for code still using Color matching
+
+        Returns:
+            tuple[Color, Color]: Colors of player1 and player2
+        """
+        assert self.IsCalibrated(), _red + f"Color table {repr(self)} must be calibrated first" + _white
+        colors = []
+        for c in [1, 2]:
+            h, s, v = numpy.clip(numpy.round(self.centers[self.labels == c][0, :3]), 0, [179, 255, 255]).astype(int).tolist()
+            colors.append(Color(h, s, v))
+        return tuple(colors)
+    def Save(self, path: str):
+        """Stores the table and its clusters in a file
+
+        Args:
+            path (str): File to write.
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as file:
+            numpy.savez(file, shifts=self.shifts, centers=self.centers, labels=self.labels, table=self.table)
+        if self.debug: print(_green + f"Saved color table to {path}" + _white)
+    def Load(self, path: str):
+        """Loads the table and its clusters from a file
+
+        Args:
+            path (str): File to read.
+        """
+        data = numpy.load(path)
+        self.shifts, self.centers, self.labels, self.table = data["shifts"], data["centers"], data["labels"], data["table"]
+        if self.debug: print(_green + f"Loaded color table from {path}" + _white)
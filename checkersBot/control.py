@@ -1,10 +1,15 @@
 from __future__ import annotations
-from mlf_api import RobotClient
-from time import sleep
+from typing import TYPE_CHECKING
+from contextlib import contextmanager
+from time import sleep, perf_counter
 from checkersGame.board import Tile, TileMovement, Board
-from .detection import Show
+from checkersGame.telemetry import tracer, Traced
+from .planner import PlanRelocation, RelocationPlan
+from .motion import MotionScheduler, SpeedModel
+from .poses import ArmCalibration, TransformMatrix, TransformPoints
 import numpy
-import cv2
+if TYPE_CHECKING:
+    from mlf_api import RobotClient
 
 _red = "\033[31m"
 _blue = "\033[34m"
@@ -18,7 +23,7 @@ _Hover = 50
 _Contact = 25
 
 def Transform(coords, origin: list[int] = [305, 390, 0], scale = 0.942, rotation: list[int] = [180, 0, 270], debug = False) -> list[int]: 
-    """Transforms between camera and robot coordinates
+    """Transforms between camera and robot coordinates, see poses.TransformPoints for many points at once
     Args:
         coords (list[int]): X, Y, Z coordinates to transform.
         origin (list[int]): X, Y, Z coordinates of the target system.
@@ -28,34 +33,9 @@ def Transform(coords, origin: list[int] = [305, 390, 0], scale = 0.942, rotation
         list[int]: Transformed coordinates
     """
     assert len(coords) == 3, _red + f"Coordinates must have 3 values." + _white
-    assert len(rotation) == 3, _red + f"Rotation must have 3 axis." + _white
-    assert 0 < scale, _red + f"Scale must be greater than 0." + _white
     if debug: print(_green + f"Transforming coordinates {coords} to system with origin {origin}, scale {scale} and reltive rotation {rotation}" + _white)
-    coords = [coords[0], coords[1], coords[2]]
-    origin = [origin[0], origin[1], origin[2]]
-    coords = numpy.array(coords, dtype=numpy.float64)
-    origin = numpy.array(origin, dtype=numpy.float64)
-    relativeCoords = coords - origin
-    rx, ry, rz = numpy.deg2rad(rotation)
-    Rx = numpy.array([
-        [1, 0, 0],
-        [0, numpy.cos(rx), -numpy.sin(rx)],
-        [0, numpy.sin(rx),  numpy.cos(rx)]
-    ])
-    Ry = numpy.array([
-        [ numpy.cos(ry), 0, numpy.sin(ry)],
-        [0, 1, 0],
-        [-numpy.sin(ry), 0, numpy.cos(ry)]
-    ])
-    Rz = numpy.array([
-        [numpy.cos(rz), -numpy.sin(rz), 0],
-        [numpy.sin(rz),  numpy.cos(rz), 0],
-        [0, 0, 1]
-    ])
-    R = Rz @ Ry @ Rx #Applies rotation on X, then Y, then Z
-    transformedCoords = scale * (R @ relativeCoords)
-    transformedCoords = numpy.round(transformedCoords).astype(int)
-    transformedCoords = transformedCoords.tolist()
+    A = TransformMatrix(tuple(origin), scale, tuple(rotation))
+    transformedCoords = numpy.round(TransformPoints(coords, A)).astype(int).tolist()
     if debug: print(_green + f"Calculated coordinates as {transformedCoords}" + _white)
     return transformedCoords
 class Tile3D:
@@ -126,172 +106,274 @@ class Tile3DMovement:
         return self.steps == other.steps
     def __str__(self):
         return f"Tile3DMovement({str(self.steps)})"
+    def EstimatedTime(self, model: SpeedModel = None, start: list[int] = None) -> float:
+        """Estimates how long following the movement takes, including relay changes
+
+        Args:
+            model (SpeedModel, optional): Speed model of the arm. Defaults to SpeedModel().
+            start (list[int], optional): Starting coordinates of the hand, None if unknown. Defaults to None.
+
+        Returns:
+            float: Seconds
+        """
+        model = model or SpeedModel()
+        time, position, relay = 0.0, start, None
+        for step in self.steps:
+            time += model.MoveTime(position, [step.x, step.y, step.z])
+            if step.ON != relay:
+                time += model.relay
+                relay = step.ON
+            position = [step.x, step.y, step.z]
+        return time
 class Robot:
     """Controls robot interactions"""
-    def __init__(self, rClient: RobotClient, debug = False):
+    def __init__(self, rClient: RobotClient, model: SpeedModel = None, poses: ArmCalibration = None, debug = False):
         """Initializes the robot class with a provided RobotClient.
 
         Args:
             rClient (RobotClient): The robot client to utilize.
-            relay (int, optional): Relay to connect for controlling actions. Defaults to 1
+            model (SpeedModel, optional): Speed model used to know when commands complete. Defaults to SpeedModel().
+            poses (ArmCalibration, optional): Precomputed cell poses. Defaults to ArmCalibration(), loaded from its file if it exists.
         """
         #assert rClient.connected, _red + f"The client must be connected to initialize a Robot class" + _white
         self.rClient = rClient
+        self.poses = poses or ArmCalibration(hover=_Hover, contact=_Contact, debug=debug)
+        self.motion = MotionScheduler(rClient, model, debug=debug)
+        self.moves = 0
+        self.waypoints = 0
+        self.estimated = 0.0
+        self.frameMaxAge = 2.0 #Seconds a frame can be reused for if the arm has not touched the board since
+        self._frame = None #Last frame with its capture time and motion version
+        self._parkedWindows = 0
+        self.parksSkipped = 0
+        self.framesReused = 0
         if debug: print(_cyan + f"Initialized robot client {repr(self)} with address [{rClient.address}]" + _white)
-    def MoveRobot(self, movement: Tile3DMovement, delay: int = 1, debug = False):
-        """Follows a Tile3DMovement with the robot
+    @Traced("Robot.MoveRobot")
+    def MoveRobot(self, movement: Tile3DMovement, home = True, debug = False):
+        """Follows a Tile3DMovement with the robot, each step starts as soon as the previous one is estimated complete
 
         Args:
             movement (Tile3DMovement): Tile3DMovement to follow with the robot hand
-            delay (int, optional): Movement delay in seconds. Defaults to 1.
+            home (bool, optional): If the RC returns to its home position afterwards. Defaults to True.
         """
         if debug: print(_cyan + f"Following {movement} with RC {self.rClient.address}" + _white)
-        for step in movement.steps:
-            self.rClient.move_xyz(step.x, step.y, step.z)
-            sleep(delay)
-            self.rClient.set_relay_status(step.ON)
-            if debug: print(_cyan + f"Moved RC [{self.rClient.address}] to position {step}" + _white)
-        self.rClient.home()
-        if debug: print(_cyan + f"RC {self.rClient.address} has finished moving and now returned to its home position" + _white)
-        sleep(delay)
-    def MoveAndCapture(self, delay: int = 1, debug = False):
+        self.moves += 1
+        self.waypoints += len(movement.steps)
+        self.estimated += movement.EstimatedTime(self.motion.model, self.motion.xyz)
+        self.motion.Follow(movement.steps)
+        if not home:
+            return
+        self.motion.Home()
+        if debug: print(_cyan + f"RC {self.rClient.address} has finished moving and is returning to its home position" + _white)
+    @Traced("Robot.Park")
+    def Park(self, debug = False):
+        """Moves the RC out of the camera's view and leaves it there, for continuous captures, skipped if already parked"""
+        if self.motion.IsParked():
+            self.parksSkipped += 1
+            if debug: print(_cyan + f"RC [{self.rClient.address}] is already out of the way" + _white)
+        else:
+            if debug: print(_cyan + f"Parking RC [{self.rClient.address}] out of the way" + _white)
+            self.motion.SetJoints(0)
+        self.motion.Wait()
+    @contextmanager
+    def Parked(self, debug = False):
+        """Keeps the RC parked for every capture inside the block, returning home only once at the end
+
+        Usage:
+            with RC.Parked():
+                coords = Calibrate(RC.MoveAndCapture())
+                board = Read(RC.MoveAndCapture())
+        """
+        self.Park(debug)
+        self._parkedWindows += 1
+        try:
+            yield self
+        finally:
+            self._parkedWindows -= 1
+            if self._parkedWindows == 0:
+                self.motion.Home()
+    @Traced("Robot.MoveAndCapture")
+    def MoveAndCapture(self, fresh = False, debug = False):
         """Captures a frame from the RC camera, if debug is ON saves the image as a file.
 
+        The last frame is reused if it is recent and the hand has not touched the board since it was taken,
+        and the RC only parks if it is not already out of the way.
+
         Args:
-            delay (int, optional): Movement delay for robot. Defaults to 1.
+            fresh (bool, optional): If True always captures a new frame. Defaults to False.
 
         Returns:
             numpy.array: Frame captured by the RC camera.
         """
+        if not fresh and self._frame is not None:
+            frame, time, version = self._frame
+            if version == self.motion.version and perf_counter() - time <= self.frameMaxAge:
+                self.framesReused += 1
+                if debug: print(_cyan + f"Reusing frame from RC [{self.rClient.address}] taken [{perf_counter() - time:.2f}]s ago" + _white)
+                return frame
         if debug: print(_cyan + f"Initiating camera capture with RC {self.rClient.address}" + _white)
-        if debug: print(_cyan + f"Moving RC [{self.rClient.address}] out of the way" + _white)
-        self.rClient.set_joints(0)
-        sleep(delay)
+        self.Park(debug)
         if debug: print(_cyan + f"Saving image from RC [{self.rClient.address}] camera" + _white)
-        frame = self.rClient.capture()
-        if debug: Show(frame, f"RAWIMAGE from RC [{self.rClient.address}]")
-        self.rClient.home()
-        print(_cyan + f"RC {self.rClient.address} has saved an image and is returning to its home position" + _white)
-        sleep(delay)
+        with tracer.Span("Robot.capture"):
+            frame = self.rClient.capture()
+        self._frame = (frame, perf_counter(), self.motion.version)
+        if debug:
+            from .detection import Show
+            Show(frame, f"RAWIMAGE from RC [{self.rClient.address}]")
+        if self._parkedWindows == 0:
+            self.motion.Home() #Does not wait, the next command does
+            print(_cyan + f"RC {self.rClient.address} has saved an image and is returning to its home position" + _white)
         return frame
-    def Movement2Dto3D(self, movement: TileMovement, debug = False):
-        """Converts a 2D TileMovement from the checkers module to a Tile3DMovement
+    def Movement2Dto3D(self, movement: TileMovement, debug = False, board: Board = None) -> Tile3DMovement:
+        """Converts a 2D TileMovement from the checkers module to a single Tile3DMovement, looking up the precomputed cell poses
+
+        The piece is picked once, carried at hover height through every jump square and placed once. If the
+        board before the movement is given, the captured pieces are then carried to the cemetery slots that
+        Board.MoveTile assigns them, visiting the nearest remaining piece each time.
 
         Args:
             movement (TileMovement): Movement to convert.
+            board (Board, optional): Board before the movement, needed to remove captured pieces. Defaults to None.
 
         Returns:
             Tile3DMovement: Converted movement.
         """
+        assert self.poses.IsCalibrated(), _red + f"Robot poses must be built from the board coordinates before converting movements" + _white
         if debug: print(_cyan + f"Converting {movement} to {Tile3DMovement}" + _white)
-        steps = []
-        for step in movement.steps:
-            if debug: print(_cyan + f"Converting {step}" + _white)
-            pos = [step.x, step.y, 0]
-            pos = Transform(pos, debug=debug)
-            step1 = Tile3D(pos[0], pos[1], _Hover, True)
-            step2 = Tile3D(pos[0], pos[1], _Contact, False)
-            if next is not None:
-                step3 = Tile3D(pos[0], pos[1], _Contact, True)
-                step4 = Tile3D(pos[0], pos[1], _Hover, True)
-            steps.extend([step1, step2, step3, step4])
+        first, last = movement.steps[0], movement.steps[-1]
+        steps = self._Pick(first.x, first.y)
+        for step in movement.steps[1:-1]:
+            steps.append(Tile3D(*self.poses.hover[step.x, step.y].tolist(), True))
+        steps.extend(self._Place(last.x, last.y))
+        if board is not None:
+            steps.extend(self._RemoveCaptured(movement, board, (last.x, last.y), debug))
         movementConverted = Tile3DMovement(steps, debug)
-        return movementConverted 
+        if debug: print(_cyan + f"Converted {movement} to [{len(steps)}] waypoints, estimated [{movementConverted.EstimatedTime(self.motion.model):.2f}]s" + _white)
+        return movementConverted
+    def _Pick(self, i: int, j: int) -> list[Tile3D]:
+        """Waypoints picking the piece at a cell, the relay turns on once the hand touches it"""
+        hover, contact = self.poses.hover[i, j].tolist(), self.poses.contact[i, j].tolist()
+        return [Tile3D(*hover, False), Tile3D(*contact, True), Tile3D(*hover, True)]
+    def _Place(self, i: int, j: int) -> list[Tile3D]:
+        """Waypoints placing the held piece at a cell, the relay turns off once the piece touches the board"""
+        hover, contact = self.poses.hover[i, j].tolist(), self.poses.contact[i, j].tolist()
+        return [Tile3D(*hover, True), Tile3D(*contact, False), Tile3D(*hover, False)]
+    def _RemoveCaptured(self, movement: TileMovement, board: Board, start: tuple[int, int], debug = False) -> list[Tile3D]:
+        """Waypoints carrying every piece captured by a movement to its cemetery slot, nearest piece first"""
+        boardAfter = board.Clone()
+        boardAfter.MoveTile(movement, validate=False)
+        cemetery = [0, board.width - 1]
+        captured = [(i, j) for i in range(board.height) for j in range(1, board.width - 1) if board.board[i][j].ID != 0 and boardAfter.board[i][j].ID == 0 and (i, j) != (movement.steps[0].x, movement.steps[0].y)]
+        slots = [(i, j) for i in range(board.height) for j in cemetery if board.board[i][j].ID == 0 and boardAfter.board[i][j].ID != 0]
+        if len(captured) != len(slots):
+            print(_yellow + f"Found [{len(captured)}] captured pieces but [{len(slots)}] cemetery slots for {movement}, removing what matches" + _white)
+        distance = lambda a, b: numpy.linalg.norm(self.poses.hover[a][:2] - self.poses.hover[b][:2])
+        steps, position = [], start
+        while captured and slots:
+            piece = min(captured, key=lambda cell: distance(position, cell))
+            ID = board.board[piece[0]][piece[1]].ID
+            matching = [slot for slot in slots if boardAfter.board[slot[0]][slot[1]].ID == ID] or slots
+            slot = min(matching, key=lambda cell: distance(piece, cell))
+            captured.remove(piece)
+            slots.remove(slot)
+            steps.extend(self._Pick(*piece) + self._Place(*slot))
+            position = slot
+            if debug: print(_cyan + f"Removing captured piece at {piece} to cemetery slot {slot}" + _white)
+        return steps
     def TestMovement(self, coords: list[list[list[int]]], debug = False):
-        """Tests RC movement over known coordinates of a board
+        """Rebuilds the cell poses from known coordinates of a board and tests RC movement over them
 
         Args:
             coords (list[list[list[int]]]): Known board coordinates
         """
         assert coords is not None, _red + f"Coordinates for RC {self.rClient.address} cant be null" + _white
         if debug: print(_cyan + f"Testing board movement for RC {self.rClient.address}" + _white)
+        self.poses.Build(coords)
         steps = []
         for i, j in [(x, y) for x in range(0, len(coords)) for y in range(0, len(coords[x]))]:
-            pos = [coords[i][j][0], coords[i][j][1]]#Transform([coords[i][j][0], coords[i][j][1], 0], debug=debug)
-            steps.append(Tile(int(pos[0]), int(pos[1])))
-        movement2d = TileMovement(steps, debug)
-        movement3d = self.Movement2Dto3D(movement2d, debug)
-        self.MoveRobot(movement3d, 1, debug=debug)
+            hover, contact = self.poses.hover[i, j].tolist(), self.poses.contact[i, j].tolist()
+            steps.extend([Tile3D(*hover, False), Tile3D(*contact, False), Tile3D(*hover, False)])
+        self.MoveRobot(Tile3DMovement(steps, debug), debug=debug)
         if debug: print(_cyan + f"Finished testing for RC {self.rClient.address}" + _white)
+    @Traced("Robot.Emote")
     def Emote(self, emote: str = "hi", length = 10, delay = 1, debug = False):
         """Predefined movements for the RC to perform
 
         Args:
             emote (str, optional): String defining the emote to perform. Defaults to "hi".
             length (int, optional): Duration/repetitions of the emote. Defaults to 10.
-            delay (int, optional): Movement delay. Defaults to 1.
+            delay (int, optional): Rhythm of the emote, each pose lasts at least this long. Defaults to 1.
         """
         if emote == "hi":
-            self.rClient.set_joints(0, 30, 60)
+            self.motion.SetJoints(0, 30, 60)
             sleep(delay)
             for i in range(length):
                 if i % 2 == 0:
-                    self.rClient.set_joints(q3=100)
+                    self.motion.SetJoints(q3=100)
                     sleep(delay/2)
                 else:
-                    self.rClient.set_joints(q3=140)
+                    self.motion.SetJoints(q3=140)
                     sleep(delay/2)
-            self.rClient.home()
-            sleep(delay)
+            self.motion.Home()
         if emote == "yes":
             for i in range(length):
                 if i % 2 == 0:
-                    self.rClient.set_joints(q1=70)
+                    self.motion.SetJoints(q1=70)
                     sleep(delay)
                 else:
-                    self.rClient.set_joints(q1=110)
+                    self.motion.SetJoints(q1=110)
                     sleep(delay)
-            self.rClient.home()
-            sleep(delay)
+            self.motion.Home()
         if emote == "no":
             for i in range(length):
                 if i % 2 == 0:
-                    self.rClient.set_joints(q0=70)
+                    self.motion.SetJoints(q0=70)
                     sleep(delay)
                 else:
-                    self.rClient.set_joints(q0=110)
+                    self.motion.SetJoints(q0=110)
                     sleep(delay)
-            self.rClient.home()
-            sleep(delay)
+            self.motion.Home()
         if emote == "dance":
             from random import randint
             for i in range(length):
                 q0, q1, q2, = [randint(45, 135) for _ in range(3)]
-                self.rClient.set_joints(q0, q1, q2)
+                self.motion.SetJoints(q0, q1, q2)
                 sleep(delay)
-            self.rClient.home()
-            sleep(delay)
-    def MoveToBoard(self, prevBoard: Board, targetBoard: Board, debug = False) -> TileMovement:
-        """Generates a movemement that moves all the pieces in the board to match another state.
+            self.motion.Home()
+    @Traced("Robot.PlanToBoard")
+    def PlanToBoard(self, prevBoard: Board, targetBoard: Board, debug = False) -> RelocationPlan:
+        """Plans the pick and place operations that move all the pieces in the board to match another state, see planner.PlanRelocation
 
         Args:
             prevBoard (Board): Board to move from.
             targetBoard (Board): Board to move to.
 
         Returns:
-            TileMovement: Movement generated.
+            RelocationPlan: Operations in travel optimized order with their estimated travel and time.
+        """
+        position = lambda tile: self.poses.hover[tile.x, tile.y, :2].astype(float)
+        plan = PlanRelocation(prevBoard, targetBoard, position=position, debug=debug)
+        print(_cyan + f"RC [{self.rClient.address}] will relocate pieces with {plan}" + _white)
+        return plan
+    def MoveToBoard(self, prevBoard: Board, targetBoard: Board, debug = False) -> list[Tile3DMovement]:
+        """Generates the movemements that move all the pieces in the board to match another state, in travel optimized order.
+
+        Args:
+            prevBoard (Board): Board to move from.
+            targetBoard (Board): Board to move to.
+
+        Returns:
+            list[Tile3DMovement]: Movements generated.
+        """
+        return [self.Movement2Dto3D(movement, debug) for movement in self.PlanToBoard(prevBoard, targetBoard, debug).moves]
+    @Traced("Robot.Relocate")
+    def Relocate(self, prevBoard: Board, targetBoard: Board, debug = False):
+        """Moves all the pieces in the board to match another state, only returning home after the last movement
+
+        Args:
+            prevBoard (Board): Board to move from.
+            targetBoard (Board): Board to move to.
         """
-        changedTiles = []
-        movements = []
-        changeTable = prevBoard.ExtractChangeValues(targetBoard, debug)
-        for i, j in [(x, y) for x in range(0, targetBoard.height) for y in range(0, targetBoard.width)]:
-            if changeTable[i][j] == 1:
-                tileTo = targetBoard.board[i][j]
-            elif changeTable[i][j] == -1:
-                tileFrom = prevBoard.board[i][j]
-            else:
-                continue
-            changedTiles.extend([tileTo, tileFrom])
-        while len(changedTiles) > 0:
-            for tile in changedTiles:
-                if changeTable[tile.x][tile.y] == -1:
-                    tileFrom = tile
-                    changedTiles.remove(tileFrom)
-                    break
-            for tile in changedTiles:
-                if changeTable[tile.x][tile.y] == 1 and tileFrom.ID // abs(tileFrom.ID) == tile.ID // abs(tile.ID):
-                    tileTo = tile
-                    changedTiles.remove(tileTo)
-                    break
-            movements.append(self.Movement2Dto3D(TileMovement(tileFrom, tileTo, debug)))
-        return movements
\ No newline at end of file
+        movements = self.MoveToBoard(prevBoard, targetBoard, debug)
+        for n, movement in enumerate(movements):
+            self.MoveRobot(movement, home=n == len(movements) - 1, debug=debug)
\ No newline at end of file
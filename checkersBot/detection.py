@@ -1,5 +1,8 @@
 from .color import Color
+from .images import GetImageSink
 from checkersGame.board import Tile, Board
+from checkersGame.telemetry import Traced
+from functools import lru_cache
 import cv2
 import numpy
 import math
@@ -11,25 +14,27 @@ _yellow = "\033[33m"
 _green = "\033[32m"
 _cyan = "\033[96m"
 
+_Display = False
+
+def SetDisplay(enabled: bool):
+    """Enables or disables CV2 windows for frames sent to Show, frames are archived either way
+    Args:
+        enabled (bool): If True frames are also displayed, without waiting for input.
+    """
+    global _Display
+    _Display = enabled
 def Show(frame, id = "IMAGE", debug = False):
-    """Opens a CV2 window to display a given frame
+    """Sends a frame to the debug image archive without blocking, also displays it if enabled with SetDisplay
     Args:
-        frame (numpy.array): Frame to be displayed
+        frame (numpy.array): Frame to be archived
         id (str, optional): Display name of the given frame. Defaults to "IMAGE".
     """
     assert isinstance(id, str), _red + f"Display name for frame must be a string" + _white
-    if debug: print(_green + f"Showing frame with id {id}" + _white)
-    cv2.imshow(id, frame) #Shows image
-    cv2.waitKey(0) #Waits for input
-    cv2.destroyAllWindows() #Closes window
-    if debug:
-        from datetime import datetime
-        import os
-        BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-        PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, ".."))
-        IMAGES_DIR = os.path.join(PROJECT_ROOT, "IMAGES")
-        filename = f"CAPTURE_{datetime.now().strftime('%d%m%Y%H%M')}.jpeg"
-        cv2.imwrite(os.path.join(IMAGES_DIR, filename), frame)
+    if debug: print(_green + f"Archiving frame with id {id}" + _white)
+    GetImageSink().Put(frame, id)
+    if _Display:
+        cv2.imshow(id, frame) #Shows image
+        cv2.waitKey(1) #Lets the window refresh without waiting for input
 def AvgHSV(frame, x, y, w):
     h, W, _ = frame.shape
     x1 = max(0, x - w // 2)
@@ -86,36 +91,79 @@ def Centroid(contour, debug = False):
         cX, cY = 0, 0
     if debug: print(_green + f"Found center coordinates [{cX}, {cY}] for a contour" + _white)
     return (cX, cY)
-def FindBoardCoords(frame, size = 6, debug = False) -> list[list[list[int]]]:
-    """Finds the coordinates of a Nx(N+2) board.
+_CellSize = 20
+
+def BoardDestination(size = 6) -> numpy.ndarray:
+    """Returns the corners of the warped (top-down) board space used by the homography
     Args:
-        frame (numpy.array): Image to search in.
-        boardMarkers (Color): Color of the corner markers.
         size (int, optional): Size of the board (N). Defaults to 6.
-        window (int, optional): Color range for corner markers. Defaults to 10.
-        threshold (int, optional): Agressivenes of color filter. Defaults to 100.
     Returns:
-        list[list[list[int]]]: Nx(N+2) Array of lists representing coordinates.
+        numpy.array: (4, 2) corners: top-left, top-right, bottom-right, bottom-left
+    """
+    side = _CellSize * (size + 2)
+    return numpy.array([[0, 0], [side, 0], [side, side], [0, side]], dtype=numpy.float32)
+@lru_cache(maxsize=None)
+def _NormalizedGrid(size: int) -> numpy.ndarray:
+    """Homogeneous warped space centers of every cell of a board size, computed once per size"""
+    #Normalized interpolation parameters inside the warped rectangle, rows skip the marker border
+    a = numpy.arange(1, size + 1) / (size + 1) #vertical fraction (0 to 1)
+    b = numpy.arange(0, size + 2) / (size + 1) #horizontal fraction (0 to 1)
+    side = _CellSize * (size + 2)
+    grid = numpy.ones((size, size + 2, 3))
+    grid[:, :, 0] = b[None, :] * side
+    grid[:, :, 1] = a[:, None] * side
+    grid.setflags(write=False)
+    return grid
+def ProjectGrid(MInv, size = 6) -> numpy.ndarray:
+    """Projects the center of every cell from warped space back to the frame in one operation
+    Args:
+        MInv (numpy.array): (3, 3) inverse homography, warped space to frame.
+        size (int, optional): Size of the board (N). Defaults to 6.
+    Returns:
+        numpy.array: int array of (N, N+2, 2) pixel coordinates
+    """
+    projected = _NormalizedGrid(size) @ numpy.asarray(MInv).T
+    return (projected[..., :2] / projected[..., 2:]).astype(int)
+def FindMarkers(frame, expectedIDs: list[int] = [1, 2, 3, 4], debug = False) -> dict[int, numpy.ndarray]:
+    """Finds the ArUco markers in a frame
+    Args:
+        frame (numpy.array): Image to search in.
+        expectedIDs (list[int], optional): IDs of the markers to keep. Defaults to [1, 2, 3, 4].
+    Returns:
+        dict[int, numpy.array]: Corners (4, 2) of each expected marker found, by ID
     """
-    if debug: print(_green + f"Searching for board coordinates" + _white)
-    coords = [[[] for _ in range(size + 2)] for _ in range(size)]
-    corners = []
     arDict = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_4X4_50)
     arParams = cv2.aruco.DetectorParameters()
     mCorners, mIDs, _ = cv2.aruco.detectMarkers(frame, arDict, parameters=arParams)
-    assert mIDs is not None, _red + "No ArUco markers detected" + _white
-    cv2.aruco.drawDetectedMarkers(frame, mCorners, mIDs)
-    if debug: Show(frame)
-    mIDs = mIDs.flatten()
+    markers = {}
+    if mIDs is None:
+        return markers
+    if debug:
+        annotated = frame.copy() #Frames can be cached by Robot.MoveAndCapture, drawings must not reach later reads
+        cv2.aruco.drawDetectedMarkers(annotated, mCorners, mIDs)
+        Show(annotated)
+    for i, id in enumerate(mIDs.flatten().tolist()):
+        if id in expectedIDs and id not in markers:
+            markers[id] = mCorners[i][0].astype(numpy.float32)
+    if debug: print(_green + f"Found ArUco markers {list(markers)}" + _white)
+    return markers
+def FindBoardCoords(frame, size = 6, debug = False, markers: dict[int, numpy.ndarray] = None) -> list[list[list[int]]]:
+    """Finds the coordinates of a Nx(N+2) board.
+    Args:
+        frame (numpy.array): Image to search in.
+        size (int, optional): Size of the board (N). Defaults to 6.
+        markers (dict[int, numpy.array], optional): Already detected markers, see FindMarkers. Defaults to None (Detects them).
+    Returns:
+        tuple[numpy.array, numpy.array]: (N, N+2, 2) array of cell coordinates and the ordered board corners.
+    """
+    if debug: print(_green + f"Searching for board coordinates" + _white)
     expected_ids = [1, 2, 3, 4]
-    found_ids = set(mIDs.tolist())
-    missing = set(expected_ids) - found_ids
+    if markers is None:
+        markers = FindMarkers(frame, expected_ids, debug)
+    assert markers, _red + "No ArUco markers detected" + _white
+    missing = set(expected_ids) - set(markers)
     assert not missing, _red + f"Missing ArUco markers: {missing}" + _white
-    for i, id in enumerate(mIDs):
-        if id in expected_ids:
-            c = mCorners[i][0]
-            centroid = numpy.mean(c, axis=0)  # average of the 4 corners
-            corners.append(centroid)
+    corners = [numpy.mean(markers[id], axis=0) for id in expected_ids] # average of the 4 corners
     corners = numpy.array(corners, dtype=numpy.float32)
     corners = numpy.round(corners).astype(int)
     #Sort corners: top-left, top-right, bottom-right, bottom-left
@@ -128,38 +176,190 @@ def FindBoardCoords(frame, size = 6, debug = False) -> list[list[list[int]]]:
     ordered[3] = corners[numpy.argmax(diff)] #bottom-left
     corners = ordered
     if debug: print(_green + f"Found corner coordinates {corners}" + _white)
-    numRows, numCols = size + 2, size + 2
-    cellSize = 20
-    boardWidth = cellSize * numCols
-    boardHeight = cellSize * numRows
-    dstCorners = numpy.array([
-        [0, 0], #top-left
-        [boardWidth, 0], #top-right
-        [boardWidth, boardHeight], #bottom-right
-        [0, boardHeight] #bottom-left
-    ], dtype=numpy.float32)
-    M = cv2.getPerspectiveTransform(corners, dstCorners)
+    M = cv2.getPerspectiveTransform(corners, BoardDestination(size))
     MInv = numpy.linalg.inv(M)
-    #This next block is credited to multiple stackoverflow posts and a touch of chatGPT (I have no idea what kind of math is happening here)
-    for i, j in [(x, y) for x in range(numRows - 2) for y in range(numCols)]:
-        #Normalized interpolation parameters inside the warped rectangle
-        a = (i + 1) / (numRows - 1)  #vertical fraction (0 to 1)
-        b = (j) / (numCols - 1)  #horizontal fraction (0 to 1)
-        #Bilinear interpolation of the 4 corners in warped space
-        posWarped = (
-            (1 - a) * (1 - b) * dstCorners[0] +
-            a * (1 - b) * dstCorners[3] + 
-            a * b * dstCorners[2] +
-            (1 - a) * b * dstCorners[1]
-        )
-        posHom = numpy.array([posWarped[0], posWarped[1], 1])
-        posOrigHom = MInv @ posHom
-        posOrigHom /= posOrigHom[2]
-        posOrig = posOrigHom[:2].astype(int)
-        coords[i][j] = posOrig
-        if debug: cv2.circle(frame, tuple(posOrig), 5, (0, 0, 150), -1)
-    if debug: Show(frame)
+    coords = ProjectGrid(MInv, size)
+    if debug:
+        annotated = frame.copy()
+        for pos in coords.reshape(-1, 2):
+            cv2.circle(annotated, tuple(int(c) for c in pos), 5, (0, 0, 150), -1)
+        Show(annotated)
     return coords, corners
+@Traced("detection.HSV")
+def ToHSV(frame) -> numpy.ndarray:
+    """Converts a BGR frame to HSV
+
+    Args:
+        frame (numpy.array): BGR frame.
+
+    Returns:
+        numpy.array: HSV frame
+    """
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+def CellMeans(frame, coords, w = 10) -> numpy.ndarray:
+    """Averages a square patch around every cell center at once
+    Args:
+        frame (numpy.array): Frame to sample, usually in HSV.
+        coords (numpy.array): Array of (..., 2) pixel coordinates of the cell centers.
+        w (int, optional): Side of the sampled patch in pixels. Defaults to 10.
+    Returns:
+        numpy.array: Array of (..., 3) mean values per cell
+    """
+    coords = numpy.asarray(coords, dtype=int)
+    shape = coords.shape[:-1]
+    coords = coords.reshape(-1, 2)
+    h, W = frame.shape[:2]
+    offsets = numpy.arange(-(w // 2), w - w // 2)
+    xs = numpy.clip(coords[:, 0, None] + offsets, 0, W - 1)
+    ys = numpy.clip(coords[:, 1, None] + offsets, 0, h - 1)
+    patches = frame[ys[:, :, None], xs[:, None, :]] #(cells, w, w, 3) in a single indexing operation
+    means = patches.reshape(len(coords), -1, frame.shape[2]).mean(axis=1)
+    return means.astype(int).reshape(*shape, frame.shape[2])
+@Traced("detection.Classify")
+def ClassifyCells(means, colors: list[Color], window = 20) -> numpy.ndarray:
+    """Classifies cell colors against player colors with broadcasting, first matching color wins
+    Args:
+        means (numpy.array): Array of (..., 3) mean HSV values per cell.
+        colors (list[Color]): Player colors, in order of IDs 1 and -1.
+        window (int, optional): Color range used. Defaults to 20.
+    Returns:
+        numpy.array: int8 array of (...) IDs, 1 for the first color, -1 for the second and 0 for none
+    """
+    means = numpy.asarray(means, dtype=int)
+    references = numpy.array([color.AsArray() for color in colors], dtype=int)
+    matches = numpy.all(numpy.abs(means[..., None, :] - references) <= window, axis=-1) #(..., colors)
+    IDs = numpy.array([1, -1], dtype=numpy.int8)[:len(colors)]
+    return numpy.where(matches.any(axis=-1), IDs[matches.argmax(axis=-1)], 0).astype(numpy.int8)
+@Traced("detection.Classify")
+def CellProbabilities(means, colors: list[Color], window = 20, sharpness = 4.0) -> numpy.ndarray:
+    """Soft version of ClassifyCells, returns how likely each cell is to be empty or hold each player's tile
+    Args:
+        means (numpy.array): Array of (..., 3) mean HSV values per cell.
+        colors (list[Color]): Player colors, in order of IDs 1 and -1.
+        window (int, optional): Color range used, a color exactly at this distance is as likely as an empty cell. Defaults to 20.
+        sharpness (float, optional): How fast certainty grows away from the window's edge. Defaults to 4.0.
+    Returns:
+        numpy.array: Array of (..., 3) probabilities for IDs [0, 1, -1]
+    """
+    means = numpy.asarray(means, dtype=float)
+    references = numpy.array([color.AsArray() for color in colors], dtype=float)
+    distances = numpy.abs(means[..., None, :] - references).max(axis=-1) / window #(..., colors), 1 at the window's edge
+    logits = sharpness * numpy.concatenate([-numpy.ones(distances.shape[:-1] + (1,)), -distances ** 2], axis=-1)
+    logits -= logits.max(axis=-1, keepdims=True)
+    probabilities = numpy.exp(logits)
+    return probabilities / probabilities.sum(axis=-1, keepdims=True)
+def IDsFromProbabilities(probabilities) -> numpy.ndarray:
+    """Hard decision over the output of CellProbabilities
+    Args:
+        probabilities (numpy.array): Array of (..., 3) probabilities for IDs [0, 1, -1].
+    Returns:
+        numpy.array: int8 array of (...) most likely IDs
+    """
+    return numpy.array([0, 1, -1], dtype=numpy.int8)[numpy.argmax(probabilities, axis=-1)]
+def TilesFromArray(IDs) -> list[list[Tile]]:
+    """Builds a Tile grid from an array of IDs, for use with Board
+    Args:
+        IDs (numpy.array): Array of (size, size + 2) tile IDs.
+    Returns:
+        list[list[Tile]]: Tile grid with matching IDs
+    """
+    return [[Tile(i, j, int(ID)) for j, ID in enumerate(row)] for i, row in enumerate(numpy.asarray(IDs).tolist())]
+def ReadBoardArray(frame, player1: Color, player2: Color, coords, size = 6, window = 20, debug = False) -> numpy.ndarray:
+    """Classifies every cell of a board at once using known board coordinates
+    Args:
+        frame (numpy.array): Frame to search in.
+        player1 (Color): Color of player1 Tiles (1).
+        player2 (Color): Color of player2 Tiles (-1).
+        coords (numpy.array): Known board coordinates.
+        size (int, optional): Size of the board (N). Defaults to 6.
+    Returns:
+        numpy.array: int8 array of (N, N+2) tile IDs
+    """
+    coords = numpy.asarray(coords[0] if isinstance(coords, tuple) else coords, dtype=int)
+    assert coords.shape == (size, size + 2, 2), _red + f"Board coordinates must have shape {(size, size + 2, 2)}" + _white
+    hsv = ToHSV(frame)
+    if debug: print(_green + f"Reading board for players with color codes {player1} and {player2}" + _white)
+    IDs = ClassifyCells(CellMeans(hsv, coords), [player1, player2], window)
+    if debug:
+        annotated = frame.copy() #Frames can be cached by Robot.MoveAndCapture, drawings must not reach later reads
+        for i, j in [(x, y) for x in range(0, size) for y in range(0, size + 2)]:
+            color = (0, 255, 255) if IDs[i][j] == 1 else (255, 0, 0) if IDs[i][j] == -1 else (0, 0, 150)
+            cv2.circle(annotated, tuple(int(c) for c in coords[i][j]), 5, color, -1)
+        Show(annotated, "BOARD READING", debug)
+        print(_green + f"Found IDs:\n{IDs}" + _white)
+    return IDs
+@Traced("detection.WarpBoard")
+def WarpBoard(frame, M, size = 6, pixels = 20) -> numpy.ndarray:
+    """Warps only the board region of a frame into a small top-down image with one square block per cell
+    Args:
+        frame (numpy.array): Frame to warp.
+        M (numpy.array): (3, 3) homography from the frame to warped space, see BoardCalibration.
+        size (int, optional): Size of the board (N). Defaults to 6.
+        pixels (int, optional): Side of each cell block in the warped image. Defaults to 20.
+    Returns:
+        numpy.array: Image of (N * pixels, (N+2) * pixels) where cell [i][j] is the block [i * pixels:(i + 1) * pixels, j * pixels:(j + 1) * pixels]
+    """
+    #Maps block centers onto the cell centers used by ProjectGrid, then composes with the inverse homography
+    k = _CellSize * (size + 2) / ((size + 1) * pixels)
+    A = numpy.array([
+        [k, 0, -k * pixels / 2],
+        [0, k, k * pixels / 2],
+        [0, 0, 1]
+    ])
+    T = numpy.linalg.inv(M) @ A
+    return cv2.warpPerspective(frame, T, ((size + 2) * pixels, size * pixels), flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP)
+@Traced("detection.CellMeans")
+def WarpedCellMeans(warped, size = 6, patch = 10) -> numpy.ndarray:
+    """Averages the central patch of every cell block of a warped board with array slicing
+    Args:
+        warped (numpy.array): Image produced by WarpBoard.
+        size (int, optional): Size of the board (N). Defaults to 6.
+        patch (int, optional): Side of the sampled central patch in warped pixels. Defaults to 10.
+    Returns:
+        numpy.array: Array of (N, N+2, channels) mean values per cell
+    """
+    pixels = warped.shape[0] // size
+    assert 0 < patch <= pixels, _red + f"Patch size must be between 1 and {pixels}" + _white
+    blocks = warped.reshape(size, pixels, size + 2, pixels, -1)
+    start = (pixels - patch) // 2
+    return blocks[:, start:start + patch, :, start:start + patch].mean(axis=(1, 3)).astype(int)
+@Traced("detection.ReadBoard")
+def ReadBoardWarped(frame, player1: Color, player2: Color, M, size = 6, window = 20, pixels = 20, debug = False) -> numpy.ndarray:
+    """Classifies every cell of a board over a small warped image of the board, the cost does not depend on camera resolution
+    Args:
+        frame (numpy.array): Frame to search in.
+        player1 (Color): Color of player1 Tiles (1).
+        player2 (Color): Color of player2 Tiles (-1).
+        M (numpy.array): (3, 3) homography from the frame to warped space.
+        size (int, optional): Size of the board (N). Defaults to 6.
+        pixels (int, optional): Side of each cell block in the warped image. Defaults to 20.
+    Returns:
+        numpy.array: int8 array of (N, N+2) tile IDs
+    """
+    warped = WarpBoard(frame, M, size, pixels)
+    hsv = ToHSV(warped)
+    IDs = ClassifyCells(WarpedCellMeans(hsv, size, pixels // 2), [player1, player2], window)
+    if debug:
+        print(_green + f"Found IDs:\n{IDs}" + _white)
+        Show(warped, "WARPED BOARD", debug)
+    return IDs
+@Traced("detection.ReadProbabilities")
+def ReadBoardProbabilities(frame, player1: Color, player2: Color, M, size = 6, window = 20, pixels = 20, debug = False) -> numpy.ndarray:
+    """Same as ReadBoardWarped but returns per cell probabilities instead of a hard decision
+    Args:
+        frame (numpy.array): Frame to search in.
+        player1 (Color): Color of player1 Tiles (1).
+        player2 (Color): Color of player2 Tiles (-1).
+        M (numpy.array): (3, 3) homography from the frame to warped space.
+        size (int, optional): Size of the board (N). Defaults to 6.
+        pixels (int, optional): Side of each cell block in the warped image. Defaults to 20.
+    Returns:
+        numpy.array: Array of (N, N+2, 3) probabilities for IDs [0, 1, -1]
+    """
+    hsv = ToHSV(WarpBoard(frame, M, size, pixels))
+    probabilities = CellProbabilities(WarpedCellMeans(hsv, size, pixels // 2), [player1, player2], window)
+    if debug: print(_green + f"Lowest cell certainty [{probabilities.max(axis=-1).min():.2f}]" + _white)
+    return probabilities
 def ReadBoard(frame, player1: Color, player2: Color, coords: list[list[list[int]]], size = 6, window = 20, debug = False) -> list[list[Tile]]:
     """Finds tiles in a frame using known board coordinates to construct a board of size Nx(N+2)
     Args:
@@ -171,35 +371,8 @@ def ReadBoard(frame, player1: Color, player2: Color, coords: list[list[list[int]
     Returns:
         list[list[Tile]]: Board with ID values of each player's tile positions
     """
-    coords = coords[0]
-    frame = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-    if debug: print(_green + f"Reading board for players with color codes {player1} and {player2}" + _white)
-    board = Board(0, size, debug)
-    for i, j in [(x, y) for x in range(0, size) for y in range(0, size + 2)]:
-        target = numpy.array([coords[i][j][0], coords[i][j][1]])
-        if debug: print(_green + f"Searching at coordinates [{target}]" + _white)
-        (h, s, v) = AvgHSV(frame, target[0], target[1], 10)
-        targetColor = Color(h, s, v)
-        if debug: print(_green + f"Fpound color {targetColor}" + _white)
-        targetColorUpper = targetColor.AsRange(window, False)
-        targetColorLower = targetColor.AsRange(window, True)
-        isPlayer1 = numpy.all((targetColorLower <= player1.AsArray()) & (player1.AsArray() <= targetColorUpper))
-        isPlayer2 = numpy.all((targetColorLower <= player2.AsArray()) & (player2.AsArray() <= targetColorUpper))
-        if isPlayer1:
-            tile = Tile(i, j, 1)
-            board.board[tile.x][tile.y] = tile
-            cv2.circle(frame, tuple(coords[i][j]), 5, (0, 255, 255), -1)
-            if debug: print(_green + f"Assigned {tile}" + _white)
-        elif isPlayer2:
-            tile = Tile(i, j, -1)
-            board.board[tile.x][tile.y] = tile
-            cv2.circle(frame, tuple(coords[i][j]), 5, (255, 0, 0), -1)
-            if debug: print(_green + f"Assigned {tile}" + _white)
-        else:
-            tile = Tile(i, j, 0)
-            board.board[tile.x][tile.y] = tile
-            cv2.circle(frame, tuple(coords[i][j]), 5, (0, 0, 150), -1)
-            if debug: print(_green + f"Assigned {tile}" + _white)
+    board = Board(0, size, debug=debug)
+    board.board = TilesFromArray(ReadBoardArray(frame, player1, player2, coords, size, window, debug))
     #player1Tiles = Contours(frame, player1, window=40)
     #player2Tiles = Contours(frame, player2)
     #if debug: print(_green + f"Found [{len(player1Tiles) + 1}] tiles for player1 and [{len(player2Tiles) + 1}] tiles for player 2" + _white)
@@ -231,9 +404,7 @@ def ReadBoard(frame, player1: Color, player2: Color, coords: list[list[list[int]
     #    board[tile.x][tile.y] = tile
     #    if debug: print(_green + f"Assigned {tile}" + _white)
     if debug:
-        foundBoard = Board(turn = 0, size = size, debug = debug)
-        foundBoard.board = board.board
         print(_green + f"Board detected, printing simulated board:" + _white)
-        print(foundBoard)
+        print(board)
         Show(frame, debug=debug)
     return board.board
\ No newline at end of file
@@ -0,0 +1,135 @@
+from __future__ import annotations
+from datetime import datetime
+from itertools import count
+from threading import Thread, Lock
+from queue import Queue, Full
+from re import sub
+import atexit
+import cv2
+import os
+
+_red = "\033[31m"
+_blue = "\033[34m"
+_white = "\033[37m"
+_yellow = "\033[33m"
+_green = "\033[32m"
+_cyan = "\033[96m"
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, ".."))
+IMAGES_DIR = os.path.join(PROJECT_ROOT, "IMAGES")
+
+class ImageSink:
+    """Writes debug images from a background thread into a size capped rotating archive"""
+    def __init__(self, directory: str = IMAGES_DIR, maxQueue = 32, maxSide: int = None, quality = 85, maxBytes = 500 * 1024 * 1024, debug = False):
+        """Initializes the sink and starts its writer thread
+
+        Args:
+            directory (str, optional): Directory of the archive, created if missing. Defaults to IMAGES_DIR.
+            maxQueue (int, optional): Ammount of images waiting to be written before new ones are dropped. Defaults to 32.
+            maxSide (int, optional): Images are downscaled so their longest side is at most this value. Defaults to None (Full size).
+            quality (int, optional): JPEG quality, 0 to 100. Defaults to 85.
+            maxBytes (int, optional): Size of the archive after which the oldest images are deleted. Defaults to 500MB.
+        """
+        assert 0 < maxQueue, _red + f"Image queue must hold at least one image" + _white
+        assert 0 <= quality <= 100, _red + f"JPEG quality must be between 0 and 100" + _white
+        assert maxSide is None or 0 < maxSide, _red + f"Maximum image side must be greater than 0" + _white
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.maxSide = maxSide
+        self.quality = quality
+        self.maxBytes = maxBytes
+        self.debug = debug
+        self.written = 0
+        self.dropped = 0
+        self._queue = Queue(maxQueue)
+        self._ids = count()
+        self._lock = Lock()
+        self._archive = self._ScanArchive()
+        self._bytes = sum(size for _, size in self._archive)
+        self._thread = Thread(target=self._Run, daemon=True)
+        self._thread.start()
+    def Put(self, frame, id = "IMAGE") -> bool:
+        """Queues a copy of a frame to be written, never blocks
+
+        Args:
+            frame (numpy.array): Frame to write.
+            id (str, optional): Name included in the file name. Defaults to "IMAGE".
+
+        Returns:
+            bool: False if the queue was full and the frame was dropped
+        """
+        name = f"CAPTURE_{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}_{next(self._ids):06d}_{sub(r'[^A-Za-z0-9]+', '-', id).strip('-')}.jpeg"
+        try:
+            self._queue.put_nowait((name, frame.copy()))
+            return True
+        except Full:
+            with self._lock:
+                self.dropped += 1
+            if self.debug: print(_yellow + f"Image sink queue full, dropped {name}" + _white)
+            return False
+    def Flush(self):
+        """Waits until every queued image has been written"""
+        self._queue.join()
+    def _Run(self):
+        """Writer loop"""
+        while True:
+            name, frame = self._queue.get()
+            try:
+                self._Write(name, frame)
+            except Exception as e:
+                print(_red + f"Could not write debug image {name}: {e}" + _white)
+            finally:
+                self._queue.task_done()
+    def _Write(self, name: str, frame):
+        """Downscales, compresses and stores a frame, then rotates the archive"""
+        if self.maxSide is not None and max(frame.shape[:2]) > self.maxSide:
+            scale = self.maxSide / max(frame.shape[:2])
+            frame = cv2.resize(frame, (int(frame.shape[1] * scale), int(frame.shape[0] * scale)), interpolation=cv2.INTER_AREA)
+        path = os.path.join(self.directory, name)
+        cv2.imwrite(path, frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        size = os.path.getsize(path)
+        with self._lock:
+            self.written += 1
+            self._archive.append((path, size))
+            self._bytes += size
+            while self._bytes > self.maxBytes and len(self._archive) > 1:
+                oldPath, oldSize = self._archive.pop(0)
+                self._bytes -= oldSize
+                try:
+                    os.remove(oldPath)
+                except OSError:
+                    pass
+        if self.debug: print(_green + f"Saved debug image {name}" + _white)
+    def _ScanArchive(self) -> list[tuple[str, int]]:
+        """Lists images already in the archive, oldest first"""
+        paths = [os.path.join(self.directory, name) for name in os.listdir(self.directory) if name.startswith("CAPTURE_")]
+        paths.sort(key=os.path.getmtime)
+        return [(path, os.path.getsize(path)) for path in paths]
+
+_Sink = None
+_SinkLock = Lock() #Show is reached from the main, watcher and robot worker threads
+
+def GetImageSink() -> ImageSink:
+    """Returns the shared image sink, created on first use and flushed on exit
+
+    Returns:
+        ImageSink: Shared sink
+    """
+    global _Sink
+    with _SinkLock:
+        if _Sink is None:
+            _Sink = ImageSink()
+            atexit.register(_Sink.Flush)
+        return _Sink
+def SetImageSink(sink: ImageSink):
+    """Replaces the shared image sink, for example to change its directory or limits
+
+    Args:
+        sink (ImageSink): Sink to use from now on.
+    """
+    global _Sink
+    with _SinkLock:
+        if sink is not _Sink:
+            atexit.register(sink.Flush)
+        _Sink = sink
@@ -0,0 +1,198 @@
+from __future__ import annotations
+from importlib.util import find_spec
+from threading import Lock
+from queue import Queue, Empty
+from time import perf_counter
+import speech_recognition as sr
+
+_red = "\033[31m"
+_blue = "\033[34m"
+_white = "\033[37m"
+_yellow = "\033[33m"
+_green = "\033[32m"
+_cyan = "\033[96m"
+
+"""
+    Persistent keyword listener, the microphone is opened and calibrated once per session
+
+    Audio is captured on a background thread and every phrase goes through a recognizer backend, any
+    object with a Recognize(recognizer, audio, keywords) method returning the recognized text:
+        SphinxKeywordSpotter    Offline, only listens for the keywords, needs pocketsphinx installed.
+        GoogleRecognizer        Online transcription, needs network access.
+    Matched keywords are queued as events and passed to the registered callbacks, so the game loop can
+    react to them without polling the microphone.
+
+    Usage:
+        listener = KeywordListener(["done", "ready"])
+        listener.OnKeyword(lambda keyword, text: watcher.Trigger())
+        listener.Start()
+"""
+
+class GoogleRecognizer:
+    """Online backend, transcribes every phrase with the Google Web Speech API"""
+    def __init__(self, lang = "en-US"):
+        self.lang = lang
+    def __repr__(self):
+        return f"GoogleRecognizer({self.lang})"
+    def Recognize(self, recognizer: sr.Recognizer, audio: sr.AudioData, keywords: list[str]) -> str:
+        return recognizer.recognize_google(audio, language=self.lang)
+class SphinxKeywordSpotter:
+    """Offline backend, spots only the given keywords with CMU PocketSphinx"""
+    def __init__(self, sensitivity = 0.8):
+        """Initializes the spotter
+
+        Args:
+            sensitivity (float, optional): Keyword sensitivity between 0 and 1, higher finds more keywords and more false positives. Defaults to 0.8.
+        """
+        assert 0 <= sensitivity <= 1, _red + f"Sensitivity must be between 0 and 1" + _white
+        self.sensitivity = sensitivity
+    def __repr__(self):
+        return f"SphinxKeywordSpotter({self.sensitivity})"
+    def Recognize(self, recognizer: sr.Recognizer, audio: sr.AudioData, keywords: list[str]) -> str:
+        return recognizer.recognize_sphinx(audio, keyword_entries=[(keyword, self.sensitivity) for keyword in keywords])
+def DefaultBackend(lang = "en-US"):
+    """Returns the offline spotter if pocketsphinx is installed, else the online recognizer
+
+    Args:
+        lang (str, optional): Language of the online recognizer. Defaults to "en-US".
+    """
+    return SphinxKeywordSpotter() if find_spec("pocketsphinx") is not None else GoogleRecognizer(lang)
+class KeywordListener:
+    """Listens to the microphone in the background and reports every keyword heard"""
+    def __init__(self, keywords: list[str] = [], backend = None, micID: int = 9, phraseLimit = 2.0, calibration = 1.0, events = 32, debug = False):
+        """Initializes the listener, the microphone is opened with Start()
+
+        Args:
+            keywords (list[str], optional): Keywords to report, more can be added with AddKeywords. Defaults to [].
+            backend (object, optional): Recognizer backend. Defaults to DefaultBackend().
+            micID (int, optional): Microphone ID to be used. Defaults to 9.
+            phraseLimit (float, optional): Longest phrase in seconds sent to the backend. Defaults to 2.0.
+            calibration (float, optional): Seconds of ambient noise sampled on the first Start. Defaults to 1.0.
+            events (int, optional): Ammount of unread keywords kept, older ones are dropped. Defaults to 32.
+        """
+        assert 0 < phraseLimit, _red + f"Phrase limit must be greater than 0" + _white
+        assert 0 < events, _red + f"At least one event must be kept" + _white
+        self.keywords = [keyword.lower() for keyword in keywords]
+        self.backend = backend or DefaultBackend()
+        self.micID = micID
+        self.phraseLimit = phraseLimit
+        self.calibration = calibration
+        self.debug = debug
+        self.callbacks = []
+        self.events = Queue(maxsize=events)
+        self.recognizer = sr.Recognizer()
+        self.microphone = None
+        self.calibrated = False
+        self.heard = 0
+        self.matched = 0
+        self._stop = None
+        self._lock = Lock()
+    def OnKeyword(self, callback):
+        """Registers a function called from the listening thread every time a keyword is heard
+
+        Args:
+            callback (callable): Function receiving the keyword and the recognized text.
+        """
+        self.callbacks.append(callback)
+    def AddKeywords(self, keywords: list[str]):
+        """Adds keywords to report, keywords already present are ignored
+
+        Args:
+            keywords (list[str]): Keywords to add.
+        """
+        with self._lock:
+            self.keywords += [keyword.lower() for keyword in keywords if keyword.lower() not in self.keywords]
+    def IsListening(self) -> bool:
+        """Checks if the background thread is running
+
+        Returns:
+            bool:
+        """
+        return self._stop is not None
+    def Start(self):
+        """Opens the microphone and starts listening, ambient noise is only sampled the first time"""
+        if self.IsListening():
+            return
+        if self.microphone is None:
+            self.microphone = sr.Microphone(device_index=self.micID)
+        if not self.calibrated:
+            if self.debug: print(_yellow + f"Sampling ambient noise for [{self.calibration}]s" + _white)
+            with self.microphone as source:
+                self.recognizer.adjust_for_ambient_noise(source, duration=self.calibration)
+            self.calibrated = True
+        self._stop = self.recognizer.listen_in_background(self.microphone, self._Heard, phrase_time_limit=self.phraseLimit)
+        if self.debug: print(_green + f"Listening for keywords {self.keywords} with {self.backend}" + _white)
+    def Stop(self):
+        """Stops listening, the calibration is kept for the next Start"""
+        if self._stop is None:
+            return
+        self._stop(wait_for_stop=True)
+        self._stop = None
+        if self.debug: print(_green + f"Stopped listening" + _white)
+    def Clear(self):
+        """Discards every unread keyword"""
+        while not self.events.empty():
+            self.events.get_nowait()
+    def Wait(self, keywords: list[str] = None, timeout: float = None) -> str:
+        """Waits for the next keyword heard, skipping the ones not asked for
+
+        Args:
+            keywords (list[str], optional): Keywords to wait for. Defaults to None (Any keyword).
+            timeout (float, optional): Seconds to wait. Defaults to None (Waits forever).
+
+        Returns:
+            str: Keyword heard, None if the timeout was reached
+        """
+        keywords = None if keywords is None else [keyword.lower() for keyword in keywords]
+        deadline = None if timeout is None else perf_counter() + timeout
+        while True:
+            try:
+                keyword = self.events.get(timeout=None if deadline is None else max(0.0, deadline - perf_counter()))
+            except Empty:
+                return None
+            if keywords is None or keyword in keywords:
+                return keyword
+    def _Heard(self, recognizer: sr.Recognizer, audio: sr.AudioData):
+        """Runs on the listening thread for every phrase, sends it to the backend and reports the keywords in it"""
+        self.heard += 1
+        with self._lock:
+            keywords = list(self.keywords)
+        try:
+            text = self.backend.Recognize(recognizer, audio, keywords).lower()
+        except sr.UnknownValueError:
+            if self.debug: print(_yellow + f"Keyword not detected" + _white)
+            return
+        except sr.RequestError as e:
+            if self.debug: print(_red + f"Audio recognition error: {e}" + _white)
+            return
+        if self.debug: print(_yellow + f"Microphone recognized audio '{text}'" + _white)
+        for keyword in keywords:
+            if keyword not in text:
+                continue
+            if self.debug: print(_yellow + f"Keyword '{keyword}' detected succesfully" + _white)
+            self.matched += 1
+            if self.events.full(): #Only this thread adds events, so after dropping the oldest one there is room
+                try:
+                    self.events.get_nowait()
+                except Empty:
+                    pass
+            self.events.put_nowait(keyword)
+            for callback in self.callbacks:
+                callback(keyword, text)
+
+_Shared: dict[int, KeywordListener] = {}
+
+def SharedListener(micID: int = 9, lang = "en-US", debug = False) -> KeywordListener:
+    """Returns the listener of a microphone, created and started on first use so it is only calibrated once per session
+
+    Args:
+        micID (int, optional): Microphone ID to be used. Defaults to 9.
+        lang (str, optional): Language of the online recognizer, if used. Defaults to "en-US".
+
+    Returns:
+        KeywordListener: Listener shared by every caller
+    """
+    if micID not in _Shared:
+        _Shared[micID] = KeywordListener(backend=DefaultBackend(lang), micID=micID, debug=debug)
+    _Shared[micID].Start()
+    return _Shared[micID]
@@ -0,0 +1,178 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+from time import sleep, perf_counter
+from checkersGame.telemetry import Traced
+import numpy
+if TYPE_CHECKING:
+    from mlf_api import RobotClient
+
+_red = "\033[31m"
+_blue = "\033[34m"
+_white = "\033[37m"
+_yellow = "\033[33m"
+_green = "\033[32m"
+_cyan = "\033[96m"
+
+class SpeedModel:
+    """Estimates how long each RC command takes to complete"""
+    def __init__(self, linear = 150.0, angular = 90.0, settle = 0.15, relay = 0.2, unknown = 1.0, homeJoints: list[float] = [90, 90, 90, 90], homeXYZ: list[float] = None):
+        """Initializes the model, all times in seconds
+
+        Args:
+            linear (float, optional): Cartesian speed of the hand for move_xyz, in coordinate units per second. Defaults to 150.0.
+            angular (float, optional): Speed of the slowest joint for set_joints, in degrees per second. Defaults to 90.0.
+            settle (float, optional): Time added to every motion for acceleration and settling. Defaults to 0.15.
+            relay (float, optional): Time for the relay to switch. Defaults to 0.2.
+            unknown (float, optional): Time used when the starting pose is unknown. Defaults to 1.0.
+            homeJoints (list[float], optional): Joint angles of the home position. Defaults to [90, 90, 90, 90].
+            homeXYZ (list[float], optional): Hand coordinates of the home position, None if unknown. Defaults to None.
+        """
+        assert 0 < linear and 0 < angular, _red + f"Speeds must be greater than 0" + _white
+        assert 0 <= settle and 0 <= relay and 0 <= unknown, _red + f"Times cannot be negative" + _white
+        self.linear = linear
+        self.angular = angular
+        self.settle = settle
+        self.relay = relay
+        self.unknown = unknown
+        self.homeJoints = list(homeJoints)
+        self.homeXYZ = None if homeXYZ is None else list(homeXYZ)
+    def MoveTime(self, start: list[float], end: list[float]) -> float:
+        """Estimates a cartesian move
+
+        Args:
+            start (list[float]): Starting coordinates, None if unknown.
+            end (list[float]): Target coordinates.
+
+        Returns:
+            float: Seconds
+        """
+        if start is None:
+            return max(self.unknown, self.settle)
+        return self.settle + float(numpy.linalg.norm(numpy.subtract(end, start))) / self.linear
+    def JointTime(self, start: list[float], end: list[float]) -> float:
+        """Estimates a joint move, joints with unknown (None) angles count as the unknown time
+
+        Args:
+            start (list[float]): Starting joint angles.
+            end (list[float]): Target joint angles, None for joints that do not move.
+
+        Returns:
+            float: Seconds
+        """
+        time = 0.0
+        for a, b in zip(start, end):
+            if b is None:
+                continue
+            time = max(time, self.unknown if a is None else abs(b - a) / self.angular)
+        return self.settle + time
+class MotionScheduler:
+    """Sends RC commands and only waits for them when the next command needs the arm, instead of sleeping a fixed time after each one"""
+    def __init__(self, rClient: RobotClient, model: SpeedModel = None, relayLead = 0.1, interval = 0.02, debug = False):
+        """Initializes the scheduler
+
+        If the client has an is_moving() method it is polled to know when a motion finished, the estimate
+        of the speed model is then only used as a timeout and relay changes wait for the move to finish.
+
+        Args:
+            rClient (RobotClient): Client to command.
+            model (SpeedModel, optional): Speed model used to estimate completion. Defaults to SpeedModel().
+            relayLead (float, optional): Seconds before the end of a move at which the relay may be turned on. Defaults to 0.1.
+            interval (float, optional): Polling interval in seconds. Defaults to 0.02.
+        """
+        assert 0 <= relayLead, _red + f"Relay lead cannot be negative" + _white
+        self.rClient = rClient
+        self.model = model or SpeedModel()
+        self.relayLead = relayLead
+        self.interval = interval
+        self.debug = debug
+        self.poll = getattr(rClient, "is_moving", None)
+        self.xyz = self.model.homeXYZ
+        self.joints = list(self.model.homeJoints)
+        self.relayStatus = None
+        self.version = 0 #Changes every time the hand may have touched the board
+        self.busyUntil = perf_counter()
+        self.estimated = 0.0 #Total estimated arm time
+        self.waited = 0.0 #Total time spent waiting for the arm
+    def _Busy(self, seconds: float):
+        """Marks the arm busy for an estimated ammount of time starting now"""
+        self.busyUntil = max(self.busyUntil, perf_counter() + seconds)
+        self.estimated += seconds
+    @Traced("motion.Wait")
+    def Wait(self, lead = 0.0):
+        """Blocks until the last command is complete
+
+        Args:
+            lead (float, optional): Seconds before the estimated completion at which to return. Defaults to 0.0.
+        """
+        start = perf_counter()
+        if self.poll is not None:
+            timeout = self.busyUntil + self.model.unknown
+            while perf_counter() < timeout and self.poll():
+                sleep(self.interval)
+        else:
+            remaining = self.busyUntil - lead - perf_counter()
+            if remaining > 0:
+                sleep(remaining)
+        self.waited += perf_counter() - start
+    def MoveXYZ(self, x, y, z):
+        """Moves the hand to cartesian coordinates once the arm is free"""
+        self.Wait()
+        seconds = self.model.MoveTime(self.xyz, [x, y, z])
+        self.rClient.move_xyz(x, y, z)
+        self.version += 1
+        self.xyz = [x, y, z]
+        self.joints = [None] * len(self.joints) #Joint angles of a cartesian pose are not tracked
+        self._Busy(seconds)
+        if self.debug: print(_cyan + f"Moving to {[x, y, z]}, estimated [{seconds:.2f}]s" + _white)
+    def SetJoints(self, q0 = None, q1 = None, q2 = None, q3 = None):
+        """Moves the given joints once the arm is free, the others keep their angle"""
+        self.Wait()
+        target = [q0, q1, q2, q3]
+        seconds = self.model.JointTime(self.joints, target)
+        self.rClient.set_joints(**{f"q{i}": q for i, q in enumerate(target) if q is not None})
+        self.joints = [a if b is None else b for a, b in zip(self.joints, target)]
+        self.xyz = None
+        self._Busy(seconds)
+        if self.debug: print(_cyan + f"Moving joints to {target}, estimated [{seconds:.2f}]s" + _white)
+    def Home(self):
+        """Returns to the home position once the arm is free"""
+        self.Wait()
+        seconds = self.model.JointTime(self.joints, self.model.homeJoints)
+        if self.xyz is not None and self.model.homeXYZ is not None:
+            seconds = self.model.MoveTime(self.xyz, self.model.homeXYZ)
+        self.rClient.home()
+        self.joints = list(self.model.homeJoints)
+        self.xyz = self.model.homeXYZ
+        self._Busy(seconds)
+        if self.debug: print(_cyan + f"Returning home, estimated [{seconds:.2f}]s" + _white)
+    def Relay(self, ON: bool):
+        """Switches the relay, turning it on may overlap the end of the current move, turning it off never does"""
+        self.Wait(self.relayLead if ON else 0.0)
+        self.rClient.set_relay_status(ON)
+        self.version += 1
+        self.relayStatus = ON
+        self._Busy(self.model.relay)
+    def IsParked(self) -> bool:
+        """Checks if the arm is known to be out of the camera's view, parked by SetJoints(0)
+
+        Returns:
+            bool:
+        """
+        return self.xyz is None and self.joints[0] == 0
+    def Follow(self, steps: list):
+        """Queues every waypoint of a movement, each one a Tile3D with x, y, z and relay status ON
+
+        Args:
+            steps (list[Tile3D]): Waypoints in order.
+        """
+        for step in steps:
+            self.MoveXYZ(step.x, step.y, step.z)
+            if step.ON != self.relayStatus:
+                self.Relay(step.ON)
+    def Report(self) -> str:
+        """Returns the estimated arm time and the time spent waiting for it
+
+        Returns:
+            str: Report
+        """
+        return f"Estimated arm time [{self.estimated:.2f}]s, waited [{self.waited:.2f}]s"
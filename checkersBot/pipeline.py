@@ -0,0 +1,132 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future
+from time import perf_counter
+from checkersGame.board import Board, TileMovement
+from checkersGame.minimax import MiniMax, SearchLimits
+import multiprocessing
+from checkersGame.telemetry import Traced
+if TYPE_CHECKING:
+    from .control import Robot
+
+_red = "\033[31m"
+_blue = "\033[34m"
+_white = "\033[37m"
+_yellow = "\033[33m"
+_green = "\033[32m"
+_cyan = "\033[96m"
+
+"""
+    Overlaps the stages of a turn that do not depend on each other
+
+    Robot commands are queued on their own worker and run in order, so the caller can keep reading the
+    board or searching while the arm moves, and the engine search runs in another process as soon as the
+    position to search is known, so it does not compete with vision for the interpreter. Nothing inside
+    a stage changes, only when each one starts. Starting or cancelling a search stops the previous one
+    even if it is already running, so the worker is never busy with a stale position.
+
+    Usage:
+        pipeline.StartSearch(virtualBoard)          #Search starts now
+        pipeline.Robot(RC.Emote, "yes")             #Emote runs while searching
+        frame = pipeline.Capture().result()         #Waits for the emote, not for the search
+        movement, score = pipeline.Search(virtualBoard)
+"""
+
+_Generation = None #Number of the latest search, shared with the worker
+
+def _InitWorker(generation):
+    global _Generation
+    _Generation = generation
+class _Superseded:
+    """Stop flag of a background search, set once a newer search was started or it was cancelled"""
+    def __init__(self, generation: int):
+        self.generation = generation
+    def is_set(self) -> bool:
+        return _Generation.value != self.generation
+def _Search(engine, board: Board, depth: int, generation: int, debug = False) -> tuple[TileMovement, int]:
+    """Worker entry point, runs the engine until it finishes or is superseded"""
+    return engine(board, depth, limits=SearchLimits(stop=_Superseded(generation)), debug=debug)
+class TurnPipeline:
+    """Runs robot commands and engine searches on background workers"""
+    def __init__(self, robot: Robot, executor = ProcessPoolExecutor, engine = MiniMax, debug = False):
+        """Initializes the pipeline and its workers
+
+        Args:
+            robot (Robot): Robot whose commands are queued.
+            executor (type, optional): Executor class running the search. Defaults to ProcessPoolExecutor.
+            engine (callable, optional): Search called as engine(board, budget, limits=limits, debug=debug), MiniMax or mcts.MCTS. Defaults to MiniMax.
+        """
+        self.robot = robot
+        self.engine = engine
+        self.debug = debug
+        self._robotWorker = ThreadPoolExecutor(1, thread_name_prefix="robot")
+        self._generation = multiprocessing.RawValue("i", 0)
+        self._searchWorker = executor(1, initializer=_InitWorker, initargs=(self._generation,))
+        self._search: tuple[tuple, Future] = None
+        self.searchReused = 0
+        self.searchWaited = 0.0
+    def Robot(self, function, *args, **kwargs) -> Future:
+        """Queues a robot command, commands run one at a time in the order they were queued
+
+        Args:
+            function (callable): Robot method to call, for example RC.Emote.
+
+        Returns:
+            Future: Result of the command
+        """
+        return self._robotWorker.submit(function, *args, **kwargs)
+    def Sync(self):
+        """Blocks until every queued robot command has finished, needed before using the robot directly"""
+        self.Robot(lambda: None).result()
+    def Capture(self, debug = False) -> Future:
+        """Queues a capture after the commands already queued
+
+        Returns:
+            Future: Frame captured by the RC camera
+        """
+        return self.Robot(self.robot.MoveAndCapture, debug=debug)
+    def StartSearch(self, board: Board, depth: int = None, debug = False):
+        """Starts searching a position in the background, replacing any previous search
+
+        Args:
+            board (Board): Position to search, copied so it can keep changing.
+            depth (int, optional): Depth of search, or iterations for MCTS. Defaults to board's difficulty value.
+        """
+        self.CancelSearch()
+        boardClone = board.Clone()
+        future = self._searchWorker.submit(_Search, self.engine, boardClone, depth, self._generation.value, debug=debug)
+        self._search = (boardClone.Key(), future)
+        if debug or self.debug: print(_cyan + f"Started background search for board {repr(board)}" + _white)
+    def CancelSearch(self):
+        """Discards the background search, if any, it is cancelled if it has not started yet or else stopped"""
+        if self._search is not None:
+            self._search[1].cancel()
+            self._generation.value += 1
+            self._search = None
+    @Traced("pipeline.Search")
+    def Search(self, board: Board, depth: int = None, debug = False) -> tuple[TileMovement, int]:
+        """Returns the best movement for a position, reusing the background search if it was for the same position
+
+        Args:
+            board (Board): Position to search.
+            depth (int, optional): Depth of search, only used if no background search matches. Defaults to board's difficulty value.
+
+        Returns:
+            tuple[TileMovement, int]: Movement found and its score
+        """
+        if self._search is not None and self._search[0] == board.Key():
+            _, future = self._search
+            self._search = None
+            start = perf_counter()
+            result = future.result()
+            self.searchWaited += perf_counter() - start
+            self.searchReused += 1
+            if debug or self.debug: print(_cyan + f"Reused background search, waited [{perf_counter() - start:.3f}]s for it" + _white)
+            return result
+        self.CancelSearch()
+        return self.engine(board, depth, debug=debug)
+    def Shutdown(self):
+        """Discards the background search and waits for the queued robot commands"""
+        self.CancelSearch()
+        self._robotWorker.shutdown(wait=True)
+        self._searchWorker.shutdown(wait=True)
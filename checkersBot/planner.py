@@ -0,0 +1,208 @@
+from __future__ import annotations
+from checkersGame.board import Board, Tile, TileMovement
+import numpy
+
+_red = "\033[31m"
+_blue = "\033[34m"
+_white = "\033[37m"
+_yellow = "\033[33m"
+_green = "\033[32m"
+_cyan = "\033[96m"
+
+"""
+    Plans the pick and place operations needed to turn one physical board into another
+
+    Stage 1 pairs pieces that must move with the squares they must end on, as a minimum cost matching
+    per color. Kings prefer kings, pieces in the cemetery columns can be brought back when a color is
+    missing pieces and surplus pieces are sent to their color's cemetery column (player1 kills go to
+    the last column, player2 kills to the first one, same as Board.MoveTile).
+    Stage 2 orders the operations so the arm travels as little as possible, never placing a piece on an
+    occupied square. Cycles of pieces blocking each other are broken by parking one of them on a free cell.
+"""
+
+_Forbidden = 1e6
+_KingPenalty = 1e3
+
+def _Assignment(cost) -> list[tuple[int, int]]:
+    """Solves a square minimum cost assignment problem (Hungarian algorithm with potentials)
+
+    Args:
+        cost (numpy.array): (n, n) costs.
+
+    Returns:
+        list[tuple[int, int]]: Row and column of every assigned pair
+    """
+    cost = numpy.asarray(cost, dtype=numpy.float64)
+    n = cost.shape[0]
+    u, v = numpy.zeros(n + 1), numpy.zeros(n + 1)
+    match = numpy.zeros(n + 1, dtype=int) #Row matched to each column, 1 indexed, 0 is the virtual column
+    for row in range(1, n + 1):
+        match[0] = row
+        column = 0
+        minimum = numpy.full(n + 1, numpy.inf)
+        previous = numpy.zeros(n + 1, dtype=int)
+        used = numpy.zeros(n + 1, dtype=bool)
+        while True:
+            used[column] = True
+            current = match[column]
+            reduced = cost[current - 1] - u[current] - v[1:]
+            free = ~used[1:]
+            better = free & (reduced < minimum[1:])
+            minimum[1:][better] = reduced[better]
+            previous[1:][better] = column
+            candidates = numpy.where(free, minimum[1:], numpy.inf)
+            nearest = int(numpy.argmin(candidates)) + 1
+            delta = candidates[nearest - 1]
+            u[match[used]] += delta
+            v[used] -= delta
+            minimum[1:][free] -= delta
+            column = nearest
+            if match[column] == 0:
+                break
+        while column:
+            match[column] = match[previous[column]]
+            column = previous[column]
+    return [(int(match[column]) - 1, column - 1) for column in range(1, n + 1)]
+def _BoardPosition(tile: Tile) -> numpy.ndarray:
+    """Default position of a tile, its board indexes through control.Transform"""
+    from .control import Transform
+    return numpy.array(Transform([tile.x, tile.y, 0])[:2], dtype=numpy.float64)
+class RelocationPlan:
+    """Ordered pick and place operations with their estimated cost"""
+    def __init__(self, moves: list[TileMovement], travel: float, unfilled: list[Tile], buffered: int):
+        """Initializes the plan
+
+        Args:
+            moves (list[TileMovement]): Operations in order, each one a TileMovement from a piece to its new square.
+            travel (float): Total horizontal distance the arm covers, including moving between operations.
+            unfilled (list[Tile]): Target squares that could not be filled because no piece of their color was left.
+            buffered (int): Ammount of pieces temporarily parked to break blocking cycles.
+        """
+        self.moves = moves
+        self.travel = travel
+        self.unfilled = unfilled
+        self.buffered = buffered
+    def EstimatedTime(self, speed = 100.0, handling = 2.0) -> float:
+        """Estimates how long the plan takes to execute
+
+        Args:
+            speed (float, optional): Horizontal speed of the arm, in position units per second. Defaults to 100.0.
+            handling (float, optional): Seconds spent per operation lowering, raising and switching the relay. Defaults to 2.0.
+
+        Returns:
+            float: Estimated seconds
+        """
+        assert 0 < speed, _red + f"Arm speed must be greater than 0" + _white
+        return self.travel / speed + handling * len(self.moves)
+    def __str__(self):
+        string = f"RelocationPlan([{len(self.moves)}] moves, travel [{self.travel:.1f}], estimated [{self.EstimatedTime():.1f}]s"
+        if self.buffered: string += f", [{self.buffered}] buffered"
+        if self.unfilled: string += f", [{len(self.unfilled)}] unfilled"
+        return string + ")"
+def _MatchColor(prevIDs, targetIDs, sign: int, position, debug = False) -> tuple[list[tuple[tuple[int, int], tuple[int, int]]], list[tuple[int, int]]]:
+    """Stage 1, pairs pieces of one color with the squares they must end on
+
+    Returns:
+        tuple[list, list]: (source, target) cell pairs and target cells left unfilled
+    """
+    height, width = prevIDs.shape
+    cemetery = [0, width - 1]
+    playable = [(i, j) for i in range(height) for j in range(1, width - 1)]
+    sources = [cell for cell in playable if numpy.sign(prevIDs[cell]) == sign and numpy.sign(targetIDs[cell]) != sign]
+    targets = [cell for cell in playable if numpy.sign(targetIDs[cell]) == sign and numpy.sign(prevIDs[cell]) != sign]
+    spares = [(i, j) for i in range(height) for j in cemetery if numpy.sign(prevIDs[i, j]) == sign]
+    column = width - 1 if sign < 0 else 0
+    graves = [(i, column) for i in range(height) if prevIDs[i, column] == 0]
+    if not sources and not targets:
+        return [], []
+    size = max(len(sources) + len(spares), len(targets)) + len(graves) + len(spares)
+    rows = sources + spares + [None] * (size - len(sources) - len(spares)) #None rows and columns are dummies
+    columns = targets + graves + [None] * (size - len(targets) - len(graves))
+    cost = numpy.zeros((len(rows), len(columns)))
+    for r, source in enumerate(rows):
+        for c, target in enumerate(columns):
+            if source is None:
+                cost[r, c] = _Forbidden if c < len(targets) else 0 #Targets must be filled
+            elif target is None:
+                cost[r, c] = _Forbidden if r < len(sources) else 0 #Sources must be cleared, spares may stay
+            elif r >= len(sources) and c >= len(targets):
+                cost[r, c] = _Forbidden #Moving a spare between graves is pointless
+            else:
+                cost[r, c] = numpy.linalg.norm(position(Tile(*source)) - position(Tile(*target)))
+                if c < len(targets) and abs(prevIDs[source]) != abs(targetIDs[target]):
+                    cost[r, c] += _KingPenalty
+    pairs, unfilled = [], []
+    for r, c in _Assignment(cost):
+        source, target = rows[r], columns[c]
+        if source is not None and target is not None and cost[r, c] < _Forbidden:
+            pairs.append((source, target))
+        elif source is None and c < len(targets):
+            unfilled.append(target)
+        elif target is None and r < len(sources):
+            if debug: print(_yellow + f"No free cemetery cell for piece at {source}, leaving it in place" + _white)
+    return pairs, unfilled
+def _Order(pairs, pieces: dict, shape: tuple[int, int], start, position, debug = False) -> tuple[list[tuple[tuple[int, int], tuple[int, int], int]], float, int]:
+    """Stage 2, orders the operations nearest first, never placing on an occupied square
+
+    Returns:
+        tuple[list, float, int]: (source, target, ID) operations in order, travel and ammount of buffered pieces
+    """
+    pending = list(pairs)
+    pieces = dict(pieces)
+    arm = start
+    ordered, travel, buffered = [], 0.0, 0
+    distance = lambda a, b: 0.0 if a is None else float(numpy.linalg.norm(position(Tile(*a)) - position(Tile(*b))))
+    while pending:
+        ready = [pair for pair in pending if pair[1] not in pieces]
+        if ready:
+            source, target = min(ready, key=lambda pair: distance(arm, pair[0]) + distance(pair[0], pair[1]))
+            pending.remove((source, target))
+        else:
+            #Every target is blocked, park the nearest piece that blocks another operation on the nearest free cell
+            targets = {pair[1] for pair in pending}
+            blockers = [pair for pair in pending if pair[0] in targets]
+            free = [(i, j) for i in range(shape[0]) for j in range(shape[1]) if (i, j) not in pieces and (i, j) not in targets]
+            if not blockers or not free:
+                print(_yellow + f"Could not order operations {pending}, their targets stay blocked" + _white)
+                break
+            blocked = min(blockers, key=lambda pair: distance(arm, pair[0]))
+            source = blocked[0]
+            target = min(free, key=lambda cell: distance(source, cell))
+            pending[pending.index(blocked)] = (target, blocked[1])
+            buffered += 1
+            if debug: print(_yellow + f"Parking piece at {source} on {target} to break a blocking cycle" + _white)
+        travel += distance(arm, source) + distance(source, target)
+        pieces[target] = pieces.pop(source)
+        ordered.append((source, target, pieces[target]))
+        arm = target
+    if start is not None:
+        travel += distance(arm, start)
+    return ordered, travel, buffered
+def PlanRelocation(prevBoard: Board, targetBoard: Board, start: Tile = None, position = _BoardPosition, debug = False) -> RelocationPlan:
+    """Plans the pick and place operations that turn a physical board into another one
+
+    Args:
+        prevBoard (Board): Board on the table.
+        targetBoard (Board): Board to reach.
+        start (Tile, optional): Cell the arm starts and ends at, None to ignore travel to and from the board. Defaults to None.
+        position (function, optional): Maps a Tile to its (x, y) position, travel is measured between positions. Defaults to the board indexes through control.Transform.
+
+    Returns:
+        RelocationPlan: Ordered operations with their estimated cost
+    """
+    assert prevBoard.height == targetBoard.height, _red + f"Cannot plan a relocation between different sized boards" + _white
+    prevIDs = numpy.array([[tile.ID for tile in row] for row in prevBoard.board])
+    targetIDs = numpy.array([[tile.ID for tile in row] for row in targetBoard.board])
+    pairs, unfilled = [], []
+    for sign in [1, -1]:
+        colorPairs, colorUnfilled = _MatchColor(prevIDs, targetIDs, sign, position, debug)
+        pairs += colorPairs
+        unfilled += colorUnfilled
+    pieces = {(int(i), int(j)): int(prevIDs[i, j]) for i, j in zip(*numpy.nonzero(prevIDs))}
+    ordered, travel, buffered = _Order(pairs, pieces, prevIDs.shape, None if start is None else (start.x, start.y), position, debug)
+    moves = [TileMovement([Tile(*source, ID), Tile(*target)], debug) for source, target, ID in ordered]
+    unfilled = [Tile(i, j, int(targetIDs[i, j])) for i, j in unfilled]
+    if unfilled: print(_yellow + f"Not enough pieces to fill {unfilled}" + _white)
+    plan = RelocationPlan(moves, travel, unfilled, buffered)
+    if debug: print(_green + f"Planned {plan} from board {repr(prevBoard)} to board {repr(targetBoard)}" + _white)
+    return plan
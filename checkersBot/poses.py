@@ -0,0 +1,138 @@
+from __future__ import annotations
+from functools import lru_cache
+import numpy
+import os
+
+_red = "\033[31m"
+_blue = "\033[34m"
+_white = "\033[37m"
+_yellow = "\033[33m"
+_green = "\033[32m"
+_cyan = "\033[96m"
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, ".."))
+POSES_PATH = os.path.join(PROJECT_ROOT, "CALIBRATION", "poses.npz")
+
+@lru_cache(maxsize=16)
+def TransformMatrix(origin: tuple[float, float, float] = (305, 390, 0), scale = 0.942, rotation: tuple[float, float, float] = (180, 0, 270)) -> numpy.ndarray:
+    """Builds the (4, 4) affine matrix from camera to robot coordinates, only once per set of parameters
+
+    Args:
+        origin (tuple[float, float, float], optional): X, Y, Z coordinates of the target system. Defaults to (305, 390, 0).
+        scale (float, optional): Scale constant between systems. Defaults to 0.942.
+        rotation (tuple[float, float, float], optional): X, Y, Z rotations to apply between systems. Defaults to (180, 0, 270).
+
+    Returns:
+        numpy.array: Matrix applying scale * R @ (coords - origin), rotating on X, then Y, then Z
+    """
+    assert len(origin) == 3, _red + f"Origin must have 3 values." + _white
+    assert len(rotation) == 3, _red + f"Rotation must have 3 axis." + _white
+    assert 0 < scale, _red + f"Scale must be greater than 0." + _white
+    rx, ry, rz = numpy.deg2rad(rotation)
+    Rx = numpy.array([[1, 0, 0], [0, numpy.cos(rx), -numpy.sin(rx)], [0, numpy.sin(rx), numpy.cos(rx)]])
+    Ry = numpy.array([[numpy.cos(ry), 0, numpy.sin(ry)], [0, 1, 0], [-numpy.sin(ry), 0, numpy.cos(ry)]])
+    Rz = numpy.array([[numpy.cos(rz), -numpy.sin(rz), 0], [numpy.sin(rz), numpy.cos(rz), 0], [0, 0, 1]])
+    A = numpy.eye(4)
+    A[:3, :3] = scale * (Rz @ Ry @ Rx)
+    A[:3, 3] = -A[:3, :3] @ numpy.array(origin, dtype=numpy.float64)
+    A.setflags(write=False)
+    return A
+def TransformPoints(points, A: numpy.ndarray = None) -> numpy.ndarray:
+    """Transforms any ammount of points at once
+
+    Args:
+        points (numpy.array): (..., 2) or (..., 3) coordinates, missing Z is taken as 0.
+        A (numpy.array, optional): (4, 4) affine matrix. Defaults to TransformMatrix().
+
+    Returns:
+        numpy.array: float array of (..., 3) transformed coordinates
+    """
+    A = TransformMatrix() if A is None else A
+    points = numpy.asarray(points, dtype=numpy.float64)
+    assert points.shape[-1] in [2, 3], _red + f"Points must have 2 or 3 coordinates" + _white
+    if points.shape[-1] == 2:
+        points = numpy.concatenate([points, numpy.zeros(points.shape[:-1] + (1,))], axis=-1)
+    return points @ A[:3, :3].T + A[:3, 3]
+class ArmCalibration:
+    """Robot poses of every board and cemetery cell, composed once from the board coordinates and the camera to robot transform"""
+    def __init__(self, size = 6, origin: list[float] = [305, 390, 0], scale = 0.942, rotation: list[float] = [180, 0, 270], hover = 50, contact = 25, path: str = POSES_PATH, debug = False):
+        """Initializes the calibration, loading it from disk if a file exists
+
+        Args:
+            size (int, optional): Size of the board (N). Defaults to 6.
+            origin (list[float], optional): X, Y, Z coordinates of the robot system in the camera. Defaults to [305, 390, 0].
+            scale (float, optional): Scale constant between systems. Defaults to 0.942.
+            rotation (list[float], optional): X, Y, Z rotations between systems. Defaults to [180, 0, 270].
+            hover (int, optional): Z coordinate above the pieces. Defaults to 50.
+            contact (int, optional): Z coordinate touching the pieces. Defaults to 25.
+            path (str, optional): File to store the poses in, None to keep them in memory only. Defaults to POSES_PATH.
+        """
+        assert contact < hover, _red + f"Hover height must be above contact height" + _white
+        self.size = size
+        self.A = TransformMatrix(tuple(origin), scale, tuple(rotation))
+        self.hoverZ = hover
+        self.contactZ = contact
+        self.path = path
+        self.debug = debug
+        self.hover = None
+        self.contact = None
+        if path is not None and os.path.exists(path):
+            self.Load(path)
+    def IsCalibrated(self) -> bool:
+        """Checks if the poses have been built
+
+        Returns:
+            bool:
+        """
+        return self.hover is not None
+    def Build(self, coords):
+        """Precomputes the hover and contact poses of every cell from its camera coordinates
+
+        Args:
+            coords (numpy.array): (N, N+2, 2) camera coordinates of every cell, see FindBoardCoords.
+        """
+        coords = numpy.asarray(coords, dtype=numpy.float64)
+        assert coords.shape == (self.size, self.size + 2, 2), _red + f"Coordinates must have shape {(self.size, self.size + 2, 2)}" + _white
+        xy = numpy.round(TransformPoints(coords, self.A)[..., :2]).astype(int)
+        z = numpy.ones(xy.shape[:-1] + (1,), dtype=int)
+        self.hover = numpy.concatenate([xy, z * self.hoverZ], axis=-1)
+        self.contact = numpy.concatenate([xy, z * self.contactZ], axis=-1)
+        if self.debug: print(_green + f"Built robot poses for board of size [{self.size}]" + _white)
+        if self.path is not None:
+            self.Save(self.path)
+    def Pose(self, i: int, j: int, hover = True) -> list[int]:
+        """Looks up the pose of a cell
+
+        Args:
+            i (int): Row of the cell.
+            j (int): Column of the cell, 0 and N+1 are the cemetery.
+            hover (bool, optional): If True returns the hover pose, else the contact pose. Defaults to True.
+
+        Returns:
+            list[int]: X, Y, Z robot coordinates
+        """
+        assert self.IsCalibrated(), _red + f"Arm calibration {repr(self)} must be built before looking up poses" + _white
+        return (self.hover if hover else self.contact)[i, j].tolist()
+    def Save(self, path: str):
+        """Stores the poses in a file
+
+        Args:
+            path (str): File to write.
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as file:
+            numpy.savez(file, size=self.size, A=self.A, hover=self.hover, contact=self.contact)
+        if self.debug: print(_green + f"Saved robot poses to {path}" + _white)
+    def Load(self, path: str):
+        """Loads the poses from a file, ignoring files made for a different board size
+
+        Args:
+            path (str): File to read.
+        """
+        data = numpy.load(path)
+        if int(data["size"]) != self.size:
+            if self.debug: print(_yellow + f"Ignoring robot poses {path} made for board size [{int(data['size'])}]" + _white)
+            return
+        self.A, self.hover, self.contact = data["A"], data["hover"], data["contact"]
+        if self.debug: print(_green + f"Loaded robot poses from {path}" + _white)
@@ -0,0 +1,96 @@
+from __future__ import annotations
+from checkersGame.board import Board, TileMovement
+from checkersGame.telemetry import Traced
+import numpy
+
+_red = "\033[31m"
+_blue = "\033[34m"
+_white = "\033[37m"
+_yellow = "\033[33m"
+_green = "\033[32m"
+_cyan = "\033[96m"
+
+"""
+    Fuses soft board readings (see detection.CellProbabilities) with the rules of the game
+
+    Instead of trusting every cell of a reading, each candidate position (the legal successors of the
+    known board) is scored by how likely the reading is under it, and the most likely one is kept
+    along with its posterior probability, used as a confidence score.
+"""
+
+def BoardClasses(board: Board) -> numpy.ndarray:
+    """Converts a board to the class indexes used by CellProbabilities, kings are read as regular tiles
+
+    Args:
+        board (Board): Board to convert.
+
+    Returns:
+        numpy.array: int array of (N, N+2) indexes, 0 for empty, 1 for player1 and 2 for player2
+    """
+    IDs = numpy.array([[tile.ID for tile in row] for row in board.board])
+    return numpy.where(IDs > 0, 1, numpy.where(IDs < 0, 2, 0))
+def LogLikelihood(board: Board, probabilities, cemetery = False) -> float:
+    """Returns the log probability of a reading if the real board was the given one
+
+    Args:
+        board (Board): Candidate board.
+        probabilities (numpy.array): Array of (N, N+2, 3) cell probabilities.
+        cemetery (bool, optional): If True also scores the cemetery columns. Defaults to False.
+
+    Returns:
+        float: Sum of the log probabilities of every scored cell
+    """
+    probabilities = numpy.asarray(probabilities)
+    assert probabilities.shape == (board.height, board.width, 3), _red + f"Probabilities must have shape {(board.height, board.width, 3)}" + _white
+    classes = BoardClasses(board)
+    cellProbabilities = numpy.take_along_axis(probabilities, classes[..., None], axis=-1)[..., 0]
+    if not cemetery:
+        cellProbabilities = cellProbabilities[:, 1:-1]
+    return float(numpy.log(numpy.clip(cellProbabilities, 1e-9, 1)).sum())
+@Traced("resolver.ResolveBoard")
+def ResolveBoard(candidates: list[Board], probabilities, cemetery = False, debug = False) -> tuple[int, float]:
+    """Picks the candidate board that best explains a reading
+
+    Args:
+        candidates (list[Board]): Boards that could be on the table.
+        probabilities (numpy.array): Array of (N, N+2, 3) cell probabilities.
+        cemetery (bool, optional): If True also scores the cemetery columns. Defaults to False.
+
+    Returns:
+        tuple[int, float]: Index of the most likely candidate and its posterior probability (confidence)
+    """
+    assert len(candidates) > 0, _red + f"At least one candidate board is needed" + _white
+    scores = numpy.array([LogLikelihood(candidate, probabilities, cemetery) for candidate in candidates])
+    posterior = numpy.exp(scores - scores.max())
+    posterior /= posterior.sum()
+    index = int(numpy.argmax(posterior))
+    if debug: print(_green + f"Resolved candidate [{index}] of [{len(candidates)}] with confidence [{posterior[index]:.3f}]" + _white)
+    return index, float(posterior[index])
+@Traced("resolver.ResolveMove")
+def ResolveMove(board: Board, probabilities, debug = False) -> tuple[TileMovement, float]:
+    """Finds the legal movement that best explains a reading taken after the current player moved
+
+    Args:
+        board (Board): Board before the movement, at the turn of the player that moved.
+        probabilities (numpy.array): Array of (N, N+2, 3) cell probabilities.
+
+    Returns:
+        tuple[TileMovement, float]: Most likely movement (False if the board most likely did not change) and its confidence
+    """
+    movements = [False]
+    candidates = [board]
+    seen = {board.Key()}
+    movesTable = board.BuildMovementsTable(debug)
+    for i, j in [(x, y) for x in range(0, board.height) for y in range(0, board.width)]:
+        for movement in movesTable[i][j]:
+            boardClone = Board(board.turn, board.height)
+            boardClone.board = board.CreateClone(debug)
+            boardClone.MoveTile(movement, validate=False, debug=debug)
+            if boardClone.Key() in seen: #Different paths to the same position would split the confidence
+                continue
+            seen.add(boardClone.Key())
+            movements.append(movement)
+            candidates.append(boardClone)
+    index, confidence = ResolveBoard(candidates, probabilities, debug=debug)
+    if debug: print(_green + f"Most likely movement {movements[index]} for board {repr(board)}" + _white)
+    return movements[index], confidence
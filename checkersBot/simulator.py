@@ -0,0 +1,175 @@
+from __future__ import annotations
+from .color import Color
+from .motion import SpeedModel
+from .poses import ArmCalibration
+from .synthetic import RenderBoard, RandomPosition
+from checkersGame.board import Board, TileMovement
+from time import perf_counter
+import numpy
+import cv2
+
+_red = "\033[31m"
+_blue = "\033[34m"
+_white = "\033[37m"
+_yellow = "\033[33m"
+_green = "\033[32m"
+_cyan = "\033[96m"
+
+"""
+    Local stand in for mlf_api.RobotClient, to run and profile full games without a station
+
+    The simulated arm keeps a physical board that pick and place actually change: turning the relay on
+    at contact height over a piece picks it up, turning it off while holding a piece drops it on the cell
+    below. capture() renders that board with synthetic.RenderBoard, with the arm drawn over the board
+    unless it is parked (joint 0 at 0 degrees). Every command advances a simulated clock using a
+    SpeedModel, and is_moving() lets the MotionScheduler skip its own waits when not running in real time.
+
+    Usage:
+        RC = Robot(SimulatedRobotClient())
+        RC.rClient.PlayMove(movement) #Plays the human side
+"""
+
+class SimulatedRobotClient:
+    """Simulated RobotClient with a physical board and a motion time model"""
+    def __init__(self, board = None, player1: Color = Color(35, 85, 120), player2: Color = Color(110, 250, 80), model: SpeedModel = None, realtime = False, resolution = (480, 640), perspective = 0.03, noise = 2.0, seed = 0, debug = False):
+        """Initializes the simulated arm at its home position
+
+        Args:
+            board (Board | numpy.array, optional): Board or (N, N+2) tile IDs on the table. Defaults to a random position of size 6.
+            player1 (Color, optional): Color of player1 Tiles (1). Defaults to Color(35, 85, 120).
+            player2 (Color, optional): Color of player2 Tiles (-1). Defaults to Color(110, 250, 80).
+            model (SpeedModel, optional): Time model of the arm. Defaults to SpeedModel().
+            realtime (bool, optional): If True commands take their simulated time in wall time too. Defaults to False.
+            resolution (tuple[int, int], optional): Frame height and width. Defaults to (480, 640).
+            perspective (float, optional): Camera perspective, see RenderBoard. Defaults to 0.03.
+            noise (float, optional): Pixel noise, see RenderBoard. Defaults to 2.0.
+            seed (int, optional): Seed of the camera placement and noise. Defaults to 0.
+        """
+        if board is None:
+            board = RandomPosition(6, 10, seed)
+        self.IDs = numpy.array([[tile.ID for tile in row] for row in board.board] if isinstance(board, Board) else board, dtype=numpy.int8)
+        self.size = self.IDs.shape[0]
+        self.player1 = player1
+        self.player2 = player2
+        self.model = model or SpeedModel()
+        self.realtime = realtime
+        self.resolution = resolution
+        self.perspective = perspective
+        self.noise = noise
+        self.seed = seed
+        self.debug = debug
+        self.address = "simulated"
+        self.xyz = self.model.homeXYZ
+        self.joints = list(self.model.homeJoints)
+        self.relay = False
+        self.held = 0
+        self.clock = 0.0 #Simulated arm seconds
+        self.commands = 0
+        self.captures = 0
+        self._busyUntil = perf_counter()
+        _, _, self.coords = self._Render()
+        self.poses = ArmCalibration(self.size, path=None)
+        self.poses.Build(self.coords)
+        spacing = numpy.linalg.norm(self.poses.hover[0, 1, :2] - self.poses.hover[0, 0, :2])
+        self.tolerance = spacing / 2
+    def _Advance(self, seconds: float):
+        """Adds the time of a command to the simulated clock"""
+        self.clock += seconds
+        self.commands += 1
+        self._busyUntil = perf_counter() + (seconds if self.realtime else 0)
+    def is_moving(self) -> bool:
+        """Returns True while the last command is still running, only in real time
+
+        Returns:
+            bool:
+        """
+        return perf_counter() < self._busyUntil
+    def move_xyz(self, x, y, z):
+        self._Advance(self.model.MoveTime(self.xyz, [x, y, z]))
+        self.xyz = [x, y, z]
+        self.joints = [None] * len(self.joints)
+    def set_joints(self, q0 = None, q1 = None, q2 = None, q3 = None):
+        target = [q0, q1, q2, q3]
+        self._Advance(self.model.JointTime(self.joints, target))
+        self.joints = [a if b is None else b for a, b in zip(self.joints, target)]
+        self.xyz = None
+    def home(self):
+        self._Advance(self.model.JointTime(self.joints, self.model.homeJoints))
+        self.joints = list(self.model.homeJoints)
+        self.xyz = self.model.homeXYZ
+    def set_relay_status(self, ON: bool):
+        self._Advance(self.model.relay)
+        if ON == self.relay:
+            return
+        self.relay = ON
+        cell = self.Cell()
+        touching = self.xyz is not None and self.xyz[2] <= self.poses.contactZ
+        if ON and not self.held and cell is not None and touching and self.IDs[cell] != 0:
+            self.held, self.IDs[cell] = int(self.IDs[cell]), 0
+            if self.debug: print(_cyan + f"Simulated arm picked [{self.held}] at {cell}" + _white)
+        elif not ON and self.held:
+            if cell is None or self.IDs[cell] != 0:
+                print(_red + f"Simulated arm dropped [{self.held}] outside of a free cell at {self.xyz}" + _white)
+            else:
+                self.IDs[cell] = self.held
+                if self.debug: print(_cyan + f"Simulated arm placed [{self.held}] at {cell}" + _white)
+            self.held = 0
+    def capture(self) -> numpy.ndarray:
+        """Renders the physical board, with the arm covering the cell below it unless parked
+
+        Returns:
+            numpy.array: BGR frame
+        """
+        self._Advance(0.05)
+        self.captures += 1
+        frame, _, _ = self._Render()
+        cell = self.Cell()
+        if self.joints[0] != 0 and cell is not None:
+            x, y = self.coords[cell].astype(int)
+            radius = int(numpy.linalg.norm(self.coords[0, 1] - self.coords[0, 0]) * 0.6)
+            cv2.circle(frame, (int(x), int(y)), radius, (60, 60, 60), -1)
+        return frame
+    def _Render(self):
+        return RenderBoard(self.IDs, self.player1, self.player2, self.resolution, perspective=self.perspective, noise=self.noise, seed=self.seed)
+    def Cell(self) -> tuple[int, int]:
+        """Returns the cell below the hand
+
+        Returns:
+            tuple[int, int]: Row and column, None if the hand is not over a cell or its pose is unknown
+        """
+        if self.xyz is None:
+            return None
+        distance = numpy.linalg.norm(self.poses.hover[..., :2] - numpy.array(self.xyz[:2]), axis=-1)
+        i, j = numpy.unravel_index(numpy.argmin(distance), distance.shape)
+        return (int(i), int(j)) if distance[i, j] <= self.tolerance else None
+    def PlayMove(self, movement: TileMovement, turn = 1, debug = False):
+        """Plays a movement on the physical board as a person would, moving captured pieces to the cemetery
+
+        Args:
+            movement (TileMovement): Movement to play.
+            turn (int, optional): Player moving. Defaults to 1.
+        """
+        board = self.PhysicalBoard(turn)
+        board.MoveTile(movement, validate=False, debug=debug)
+        self.IDs = numpy.array([[tile.ID for tile in row] for row in board.board], dtype=numpy.int8)
+    def PhysicalBoard(self, turn = 1) -> Board:
+        """Returns the physical board
+
+        Args:
+            turn (int, optional): Turn of the board returned. Defaults to 1.
+
+        Returns:
+            Board: Copy of the board on the table
+        """
+        board = Board(turn, self.size)
+        for row, IDs in zip(board.board, self.IDs):
+            for tile, ID in zip(row, IDs):
+                tile.ID = int(ID)
+        return board
+    def Report(self) -> str:
+        """Returns the simulated arm time
+
+        Returns:
+            str: Report
+        """
+        return f"Simulated arm time [{self.clock:.2f}]s over [{self.commands}] commands and [{self.captures}] captures"
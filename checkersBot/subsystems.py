@@ -0,0 +1,148 @@
+from __future__ import annotations
+from importlib import import_module
+from importlib.util import find_spec
+from time import perf_counter
+
+_red = "\033[31m"
+_blue = "\033[34m"
+_white = "\033[37m"
+_yellow = "\033[33m"
+_green = "\033[32m"
+_cyan = "\033[96m"
+
+_Modules = {
+    "robot": ["mlf_api", "checkersBot.motion", "checkersBot.planner", "checkersBot.control"],
+    "vision": ["numpy", "cv2", "checkersBot.detection", "checkersBot.colorlut", "checkersBot.calibration", "checkersBot.watcher", "checkersBot.resolver"],
+    "speech": ["speech_recognition", "checkersBot.listener", "checkersBot.input"],
+    "simulator": ["numpy", "cv2", "checkersBot.motion", "checkersBot.planner", "checkersBot.control", "checkersBot.synthetic", "checkersBot.simulator"],
+}
+
+class Subsystems:
+    """Loads the robot, vision and speech subsystems on first use and records how long each one took"""
+    def __init__(self, debug = False):
+        """Initializes the facade, nothing is imported until a subsystem is requested"""
+        self.started = perf_counter()
+        self.timings = {}
+        self.loaded = {}
+        self.calibration = None
+        self.debug = debug
+    def Load(self, name: str) -> dict:
+        """Imports every module of a subsystem, only the first call pays the import cost
+
+        Args:
+            name (str): Subsystem to load, one of "robot", "vision", "speech" or "simulator".
+
+        Returns:
+            dict[str, module]: Modules of the subsystem by name
+        """
+        assert name in _Modules, _red + f"Unknown subsystem '{name}', must be one of {list(_Modules)}" + _white
+        if name not in self.loaded:
+            if self.debug: print(_yellow + f"Loading subsystem '{name}'" + _white)
+            start = perf_counter()
+            self.loaded[name] = {module: import_module(module) for module in _Modules[name]}
+            self.timings[name] = perf_counter() - start
+            if self.debug: print(_yellow + f"Loaded subsystem '{name}' in [{self.timings[name]:.3f}]s" + _white)
+        return self.loaded[name]
+    def Available(self, name: str) -> bool:
+        """Checks if the dependencies of a subsystem are installed, without importing them
+
+        Args:
+            name (str): Subsystem to check.
+
+        Returns:
+            bool:
+        """
+        assert name in _Modules, _red + f"Unknown subsystem '{name}', must be one of {list(_Modules)}" + _white
+        return all(find_spec(module.split(".")[0]) is not None for module in _Modules[name])
+    def Robot(self, address: str):
+        """Connects to a robot, loading the robot subsystem if needed
+
+        Args:
+            address (str): Address of the robot client.
+
+        Returns:
+            Robot: Robot controller for the client
+        """
+        modules = self.Load("robot")
+        return modules["checkersBot.control"].Robot(modules["mlf_api"].RobotClient(address), debug=self.debug)
+    def SimulatedRobot(self, **kwargs):
+        """Creates a robot over a simulated client, no station needed, see simulator.SimulatedRobotClient
+
+        Returns:
+            Robot: Robot controller for the simulated client
+        """
+        modules = self.Load("simulator")
+        return modules["checkersBot.control"].Robot(modules["checkersBot.simulator"].SimulatedRobotClient(debug=self.debug, **kwargs), debug=self.debug)
+    def Vision(self):
+        """Returns the vision module, loading it if needed
+
+        Returns:
+            module: checkersBot.detection
+        """
+        return self.Load("vision")["checkersBot.detection"]
+    def Calibration(self, size = 6):
+        """Returns the board calibration cache, loading the vision subsystem and any stored calibration if needed
+
+        Args:
+            size (int, optional): Size of the board (N). Defaults to 6.
+
+        Returns:
+            BoardCalibration: Calibration shared by every caller
+        """
+        if self.calibration is None:
+            self.calibration = self.Load("vision")["checkersBot.calibration"].BoardCalibration(size, debug=self.debug)
+        return self.calibration
+    def Watcher(self, capture, player1, player2, size = 6):
+        """Creates a move watcher over the calibrated board, loading the vision subsystem if needed
+
+        Args:
+            capture (callable): Function returning a new camera frame.
+            player1 (Color): Color of player1 Tiles (1).
+            player2 (Color): Color of player2 Tiles (-1).
+            size (int, optional): Size of the board (N). Defaults to 6.
+
+        Returns:
+            MoveWatcher: Watcher using the shared calibration and its color table
+        """
+        calibration = self.Calibration(size)
+        assert calibration.IsCalibrated(), _red + f"The board must be calibrated before watching it" + _white
+        return self.Load("vision")["checkersBot.watcher"].MoveWatcher(capture, calibration.M, player1, player2, size, colors=calibration.colors, debug=self.debug)
+    def Resolver(self):
+        """Returns the module fusing board readings with legal movements, loading it if needed
+
+        Returns:
+            module: checkersBot.resolver
+        """
+        return self.Load("vision")["checkersBot.resolver"]
+    def Speech(self):
+        """Returns the speech module, loading it if needed
+
+        Returns:
+            module: checkersBot.input
+        """
+        return self.Load("speech")["checkersBot.input"]
+    def Listener(self, micID: int = 9):
+        """Returns the persistent keyword listener of a microphone, loading the speech subsystem if needed
+
+        Args:
+            micID (int, optional): Microphone ID to be used. Defaults to 9.
+
+        Returns:
+            KeywordListener: Started listener shared by every caller
+        """
+        return self.Load("speech")["checkersBot.listener"].SharedListener(micID, debug=self.debug)
+    def Report(self) -> str:
+        """Returns a startup time report broken down per subsystem
+
+        Returns:
+            str: One line per subsystem with its load time, or its status if not loaded
+        """
+        report = f"Startup report ({perf_counter() - self.started:.3f}s since start):\n"
+        for name in _Modules:
+            if name in self.timings:
+                report += f"  {name}: loaded in {self.timings[name]:.3f}s\n"
+            elif self.Available(name):
+                report += f"  {name}: not loaded\n"
+            else:
+                report += f"  {name}: unavailable\n"
+        return report
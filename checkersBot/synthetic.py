@@ -0,0 +1,144 @@
+from __future__ import annotations
+from .color import Color
+from checkersGame.board import Board
+from random import Random
+import numpy
+import cv2
+import json
+import os
+
+_red = "\033[31m"
+_blue = "\033[34m"
+_white = "\033[37m"
+_yellow = "\033[33m"
+_green = "\033[32m"
+_cyan = "\033[96m"
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, ".."))
+ARUCO_DIR = os.path.join(PROJECT_ROOT, "ArUco")
+
+_Markers = {}
+
+def _Marker(id: int, side: int) -> numpy.ndarray:
+    """Loads an ArUco marker image with a white quiet zone, resized to a given side"""
+    if id not in _Markers:
+        path = os.path.join(ARUCO_DIR, f"aruco_marker_{id}.png")
+        image = cv2.imread(path)
+        assert image is not None, _red + f"Could not load marker image {path}" + _white
+        _Markers[id] = image
+    marker = cv2.resize(_Markers[id], (side, side), interpolation=cv2.INTER_AREA)
+    border = max(2, side // 6)
+    return cv2.copyMakeBorder(marker, border, border, border, border, cv2.BORDER_CONSTANT, value=(255, 255, 255))
+def RandomPosition(size = 6, moves = 10, seed: int = None) -> Board:
+    """Plays random legal movements from the starting position
+
+    Args:
+        size (int, optional): Size of the board (N). Defaults to 6.
+        moves (int, optional): Ammount of movements to play. Defaults to 10.
+        seed (int, optional): Seed of the random generator. Defaults to None.
+
+    Returns:
+        Board: Board reached
+    """
+    rng = Random(seed)
+    board = Board(1, size)
+    board.SetBoard()
+    for _ in range(moves):
+        movements = [movement for row in board.BuildMovementsTable() for cell in row for movement in cell]
+        if not movements:
+            break
+        board.MoveTile(rng.choice(movements), validate=False)
+        board.ChangeTurn()
+    return board
+def RenderBoard(board, player1: Color, player2: Color, resolution = (480, 640), cell = 48, perspective = 0.05, brightness = 1.0, gradient = 0.0, noise = 4.0, seed: int = None) -> tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+    """Renders a synthetic camera frame of a board with its ArUco corner markers
+
+    Args:
+        board (Board | numpy.array): Board or (N, N+2) array of tile IDs to draw.
+        player1 (Color): Color of player1 Tiles (1).
+        player2 (Color): Color of player2 Tiles (-1).
+        resolution (tuple[int, int], optional): Frame height and width. Defaults to (480, 640).
+        cell (int, optional): Distance between cell centers before warping, in pixels. Defaults to 48.
+        perspective (float, optional): Random corner displacement, as a fraction of the frame size. Defaults to 0.05.
+        brightness (float, optional): Multiplier of the V channel. Defaults to 1.0.
+        gradient (float, optional): Strength of a left to right lighting gradient, 0 to 1. Defaults to 0.0.
+        noise (float, optional): Standard deviation of gaussian pixel noise. Defaults to 4.0.
+        seed (int, optional): Seed of the random generator. Defaults to None.
+
+    Returns:
+        tuple[numpy.array, numpy.array, numpy.array]: BGR frame, (N, N+2) tile IDs drawn and (N, N+2, 2) true cell centers in the frame
+    """
+    IDs = numpy.array([[tile.ID for tile in row] for row in board.board] if isinstance(board, Board) else board, dtype=numpy.int8)
+    size = IDs.shape[0]
+    rng = numpy.random.default_rng(seed)
+    #Top-down canvas, marker centers sit one cell outside the first and last rows and on the cemetery columns
+    span = cell * (size + 1)
+    margin = cell
+    side = span + 2 * margin
+    canvas = numpy.full((side, side, 3), 210, dtype=numpy.uint8)
+    xs = margin + numpy.arange(size + 2) * cell
+    ys = margin + numpy.arange(1, size + 1) * cell
+    for i, j in [(x, y) for x in range(size) for y in range(size + 2)]:
+        x, y = xs[j], ys[i]
+        shade = 150 if (i + j) % 2 == 0 and 0 < j < size + 1 else 235
+        cv2.rectangle(canvas, (x - cell // 2, y - cell // 2), (x + cell // 2, y + cell // 2), (shade, shade, shade), -1)
+    hsv = cv2.cvtColor(canvas, cv2.COLOR_BGR2HSV)
+    for i, j in [(x, y) for x in range(size) for y in range(size + 2)]:
+        if IDs[i][j] == 0:
+            continue
+        color = (player1 if IDs[i][j] > 0 else player2).AsArray()
+        cv2.circle(hsv, (int(xs[j]), int(ys[i])), int(cell * 0.4), color, -1)
+        if abs(IDs[i][j]) == 2:
+            cv2.circle(hsv, (int(xs[j]), int(ys[i])), int(cell * 0.2), (color[0], color[1], min(255, color[2] + 60)), 2)
+    canvas = cv2.cvtColor(hsv, cv2.COLOR_HSV2BGR)
+    markerCenters = numpy.array([[margin, margin], [margin + span, margin], [margin + span, margin + span], [margin, margin + span]])
+    for id, (x, y) in zip([1, 2, 3, 4], markerCenters):
+        marker = _Marker(id, int(cell * 0.8))
+        h = marker.shape[0]
+        x1, y1 = x - h // 2, y - h // 2
+        canvas[max(0, y1):y1 + h, max(0, x1):x1 + h] = marker[max(0, -y1):, max(0, -x1):][:side - max(0, y1), :side - max(0, x1)]
+    #Perspective warp into the camera frame
+    height, width = resolution
+    scale = 0.8 * min(height, width) / side
+    offset = numpy.array([(width - side * scale) / 2, (height - side * scale) / 2])
+    source = numpy.array([[0, 0], [side, 0], [side, side], [0, side]], dtype=numpy.float32)
+    target = source * scale + offset + rng.uniform(-1, 1, (4, 2)) * perspective * numpy.array([width, height])
+    H = cv2.getPerspectiveTransform(source, target.astype(numpy.float32))
+    frame = cv2.warpPerspective(canvas, H, (width, height), flags=cv2.INTER_LINEAR, borderValue=(90, 90, 90))
+    #Lighting and noise
+    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV).astype(numpy.float32)
+    light = brightness * (1 - gradient / 2 + gradient * numpy.linspace(0, 1, width))[None, :]
+    hsv[..., 2] = numpy.clip(hsv[..., 2] * light, 0, 255)
+    frame = cv2.cvtColor(hsv.astype(numpy.uint8), cv2.COLOR_HSV2BGR).astype(numpy.float32)
+    frame = numpy.clip(frame + rng.normal(0, noise, frame.shape), 0, 255).astype(numpy.uint8)
+    centers = numpy.stack(numpy.meshgrid(xs, ys), axis=-1).reshape(-1, 1, 2).astype(numpy.float32)
+    coords = cv2.perspectiveTransform(centers, H).reshape(size, size + 2, 2)
+    return frame, IDs, coords
+def LoadRecorded(directory: str) -> list[tuple[numpy.ndarray, numpy.ndarray, dict]]:
+    """Loads recorded frames labeled with their true board
+
+    Every image (.png, .jpg or .jpeg) needs a .json file with the same name containing at least
+    {"board": [[IDs]]}, and optionally "player1" and "player2" as [H, S, V] lists.
+
+    Args:
+        directory (str): Directory with the frames and labels.
+
+    Returns:
+        list[tuple[numpy.array, numpy.array, dict]]: BGR frame, (N, N+2) true tile IDs and the full label of every frame
+    """
+    assert os.path.isdir(directory), _red + f"Could not find recorded frames directory {directory}" + _white
+    cases = []
+    for name in sorted(os.listdir(directory)):
+        stem, extension = os.path.splitext(name)
+        if extension.lower() not in [".png", ".jpg", ".jpeg"]:
+            continue
+        labelPath = os.path.join(directory, stem + ".json")
+        if not os.path.exists(labelPath):
+            print(_yellow + f"Skipping recorded frame {name} without label" + _white)
+            continue
+        with open(labelPath) as file:
+            label = json.load(file)
+        frame = cv2.imread(os.path.join(directory, name))
+        cases.append((frame, numpy.array(label["board"], dtype=numpy.int8), label))
+    return cases
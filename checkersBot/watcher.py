@@ -0,0 +1,133 @@
+from __future__ import annotations
+from .detection import WarpBoard, ReadBoardWarped
+from .color import Color
+from .colorlut import ColorLUT
+from threading import Thread, Event
+from queue import Queue, Empty
+from time import sleep
+import numpy
+import cv2
+
+_red = "\033[31m"
+_blue = "\033[34m"
+_white = "\033[37m"
+_yellow = "\033[33m"
+_green = "\033[32m"
+_cyan = "\033[96m"
+
+class MoveWatcher:
+    """Samples camera frames in the background while the arm is parked and reports when the human's move has settled"""
+    def __init__(self, capture, M, player1: Color, player2: Color, size = 6, stableFrames = 5, motionThreshold = 6.0, interval = 0.1, colors: ColorLUT = None, debug = False):
+        """Initializes the watcher, sampling starts with Start()
+
+        Args:
+            capture (callable): Function returning a new camera frame, such as RobotClient.capture.
+            M (numpy.array): (3, 3) homography from the frame to warped space, see BoardCalibration.
+            player1 (Color): Color of player1 Tiles (1).
+            player2 (Color): Color of player2 Tiles (-1).
+            size (int, optional): Size of the board (N). Defaults to 6.
+            stableFrames (int, optional): Ammount of consecutive still frames with the same reading before a move is reported. Defaults to 5.
+            motionThreshold (float, optional): Mean gray level difference between frames considered as motion. Defaults to 6.0.
+            interval (float, optional): Seconds between samples. Defaults to 0.1.
+            colors (ColorLUT, optional): Color table used instead of the player colors while it is calibrated. Defaults to None.
+        """
+        assert 0 < stableFrames, _red + f"Watcher needs at least one stable frame" + _white
+        assert 0 < motionThreshold, _red + f"Motion threshold must be greater than 0" + _white
+        self.capture = capture
+        self.M = M
+        self.players = (player1, player2)
+        self.size = size
+        self.stableFrames = stableFrames
+        self.motionThreshold = motionThreshold
+        self.interval = interval
+        self.colors = colors
+        self.debug = debug
+        self.callbacks = []
+        self.events = Queue()
+        self.baseline = None
+        self.motion = False
+        self._running = Event()
+        self._thread = None
+    def OnMove(self, callback):
+        """Registers a function called with the classified board every time a move is completed
+
+        Args:
+            callback (callable): Function receiving a (N, N+2) array of tile IDs.
+        """
+        self.callbacks.append(callback)
+    def Start(self, baseline):
+        """Starts sampling frames, a move is reported once a stable reading differs from the baseline
+
+        Args:
+            baseline (numpy.array): (N, N+2) tile IDs of the board before the move, kings are compared as regular tiles.
+        """
+        self.Stop()
+        self.baseline = numpy.sign(numpy.asarray(baseline)).astype(numpy.int8) #Readings never contain kings
+        self.motion = False
+        while not self.events.empty():
+            self.events.get_nowait()
+        self.Resume()
+    def Resume(self):
+        """Starts sampling frames again after Stop, keeping the baseline so the same reading is not reported twice"""
+        if self._thread is not None:
+            return
+        self._running.set()
+        self._thread = Thread(target=self._Run, daemon=True)
+        self._thread.start()
+        if self.debug: print(_green + f"Started watching board for a completed move" + _white)
+    def Stop(self):
+        """Stops sampling frames, no capture is in progress once it returns"""
+        if self._thread is None:
+            return
+        self._running.clear()
+        self._thread.join()
+        self._thread = None
+        if self.debug: print(_green + f"Stopped watching board" + _white)
+    def Wait(self, timeout: float = None):
+        """Waits for the next completed move
+
+        Args:
+            timeout (float, optional): Seconds to wait. Defaults to None (Waits forever).
+
+        Returns:
+            numpy.array: (N, N+2) tile IDs after the move, None if the timeout was reached or the move was triggered
+        """
+        try:
+            return self.events.get(timeout=timeout)
+        except Empty:
+            return None
+    def Trigger(self):
+        """Reports a move now without waiting for the board to settle, for confirmations from other inputs such as voice"""
+        self.events.put(None)
+    def _Run(self):
+        """Sampling loop, detects motion over the board and waits for the reading to settle"""
+        previous, reading, still = None, None, 0
+        while self._running.is_set():
+            try:
+                frame = self.capture()
+            except Exception as e:
+                if self.debug: print(_red + f"Watcher could not capture a frame: {e}" + _white)
+                sleep(self.interval)
+                continue
+            gray = cv2.cvtColor(WarpBoard(frame, self.M, self.size, 8), cv2.COLOR_BGR2GRAY).astype(numpy.int16)
+            moving = previous is not None and numpy.abs(gray - previous).mean() > self.motionThreshold
+            previous = gray
+            if moving:
+                if self.debug and not self.motion: print(_yellow + f"Motion detected over the board" + _white)
+                self.motion, reading, still = True, None, 0
+            else:
+                if self.colors is not None and self.colors.IsCalibrated():
+                    IDs = self.colors.Read(frame, self.M, self.size)
+                else:
+                    IDs = ReadBoardWarped(frame, *self.players, self.M, self.size)
+                if reading is not None and numpy.array_equal(IDs, reading):
+                    still += 1
+                else:
+                    reading, still = IDs, 1
+                if still >= self.stableFrames and not numpy.array_equal(reading, self.baseline):
+                    if self.debug: print(_green + f"Move completed, board settled for [{still}] frames" + _white)
+                    self.baseline, self.motion, still = reading, False, 0
+                    self.events.put(reading)
+                    for callback in self.callbacks:
+                        callback(reading)
+            sleep(self.interval)
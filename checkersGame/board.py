@@ -1,5 +1,6 @@
 from __future__ import annotations
 from copy import deepcopy
+from .telemetry import Traced
 
 _red = "\033[31m"
 _blue = "\033[34m"
@@ -398,6 +399,7 @@ class Board:
                 value = value // abs(value)
             values[i][j] = value
         return values
+    @Traced("Board.FindMovement")
     def FindMovement(self, other: Board, debug = False) -> TileMovement: #TODO testing
         """Searches for a possible movement that connects to another board
 
@@ -452,6 +454,23 @@ class Board:
         if debug: print(_green + f"Created deep copy of board {repr(self)}" + _white)
         boardCopy = deepcopy(self.board)
         return boardCopy
+    def Clone(self, debug = False) -> Board:
+        """Creates an independent copy of the board, including its turn counters
+
+        Returns:
+            Board: Copied board
+        """
+        boardClone = Board(self.turn, self.height, self.difficulty)
+        boardClone.board = self.CreateClone(debug)
+        boardClone.turnCount, boardClone.staleTurns = self.turnCount, self.staleTurns
+        return boardClone
+    def Key(self) -> tuple:
+        """Returns a hashable representation of the position, for use in tables and caches
+
+        Returns:
+            tuple: Turn followed by the IDs of every tile, row by row
+        """
+        return (self.turn,) + tuple(tile.ID for row in self.board for tile in row)
     def ChangeTurn(self, debug = False):
         """Changes the current turn of the board and sums one to the turnCount"""
         self.staleTurns += 1
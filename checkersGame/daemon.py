@@ -0,0 +1,375 @@
+from __future__ import annotations
+from .board import Board, TileMovement, Tile
+from .minimax import MiniMax, SearchLimits
+from collections import OrderedDict
+from threading import Thread, Lock
+from time import monotonic
+import socketserver
+import sys
+
+_red = "\033[31m"
+_blue = "\033[34m"
+_white = "\033[37m"
+_yellow = "\033[33m"
+_green = "\033[32m"
+_cyan = "\033[96m"
+
+"""
+    Long running engine process, keeps its caches warm between games and clients
+
+    Line protocol (one command per line, replies are single lines):
+        isready                                     -> readyok
+        position startpos [size]                    -> ok
+        position <turn> <row>/<row>/...             -> ok        (rows of comma separated tile IDs)
+        move <x>,<y> <x>,<y> ...                    -> ok | illegal
+        go [depth <n>] [time <seconds>] [nodes <n>] -> bestmove <x>,<y> ... score <s> depth <d> nodes <n>
+        ponder                                      -> (searches until stop, fills the cache)
+        stop                                        -> bestmove ... (result of the running search)
+        stats                                       -> stats searches <n> nodes <n> cachehits <n> cachesize <n> uptime <s>
+        quit
+
+    Usage:
+        python -m checkersGame.daemon               (stdin/stdout)
+        python -m checkersGame.daemon 8766          (local TCP socket, shared caches for every client)
+"""
+
+_MaxDepth = 20
+
+def _FormatMovement(movement: TileMovement) -> str:
+    """Converts a movement to its protocol representation
+
+    Args:
+        movement (TileMovement): Movement to convert.
+
+    Returns:
+        str: Steps as "x,y" separated by spaces, "none" if there is no movement
+    """
+    if movement == TileMovement([Tile(-1, -1)]):
+        return "none"
+    return " ".join(f"{step.x},{step.y}" for step in movement.steps)
+def _ParseMovement(tokens: list[str]) -> TileMovement:
+    """Converts the protocol representation of a movement to a TileMovement
+
+    Args:
+        tokens (list[str]): Steps as "x,y".
+
+    Returns:
+        TileMovement: Movement parsed
+    """
+    steps = []
+    for token in tokens:
+        x, y = token.split(",")
+        steps.append(Tile(int(x), int(y)))
+    return TileMovement(steps)
+class EngineDaemon:
+    """Engine shared between every client, stores the caches and statistics"""
+    def __init__(self, cacheSize = 1000000, debug = False):
+        """Initializes the daemon with empty caches
+
+        Args:
+            cacheSize (int, optional): Maximum ammount of positions kept in cache. Defaults to 1000000.
+        """
+        assert 0 < cacheSize, _red + f"Cache size must be greater than 0" + _white
+        self.cache = _BoundedCache(cacheSize)
+        self.statsLock = Lock()
+        self.searches = 0
+        self.nodes = 0
+        self.cacheHits = 0
+        self.started = monotonic()
+        self.debug = debug
+        if debug: print(_green + f"Created engine daemon {repr(self)} with cache size [{cacheSize}]" + _white)
+    def Search(self, board: Board, depth: int = None, limits: SearchLimits = None) -> tuple[TileMovement, int, int]:
+        """Iterative deepening search, keeps the result of the deepest finished depth
+
+        Args:
+            board (Board): Board to search.
+            depth (int, optional): Maximum depth. Defaults to the board's difficulty, or no limit if a time or node limit is set.
+            limits (SearchLimits, optional): Limits of the search. Defaults to None.
+
+        Returns:
+            tuple[TileMovement, int, int]: Movement found, its score and the depth reached
+        """
+        if limits is None:
+            limits = SearchLimits()
+        if depth is None:
+            unbounded = limits.deadline is not None or limits.maxNodes is not None
+            depth = _MaxDepth if unbounded else board.difficulty
+        movement, score, reached = TileMovement([Tile(-1, -1)]), 0, 0
+        for d in range(1, depth + 1):
+            result = MiniMax(board, d, limits=limits, cache=self.cache, debug=self.debug)
+            if limits.Expired() and reached > 0:
+                break
+            movement, score = result
+            reached = d
+            if limits.Expired():
+                break
+        with self.statsLock:
+            self.searches += 1
+            self.nodes += limits.nodes
+            self.cacheHits += limits.cacheHits
+        if self.debug: print(_green + f"Daemon search reached depth [{reached}] with movement {movement} and score [{score}]" + _white)
+        return movement, score, reached
+    def Stats(self) -> str:
+        """Returns the statistics line of the protocol
+
+        Returns:
+            str: Statistics of every search performed by the daemon
+        """
+        return f"stats searches {self.searches} nodes {self.nodes} cachehits {self.cacheHits} cachesize {len(self.cache)} uptime {monotonic() - self.started:.1f}"
+class _BoundedCache(OrderedDict):
+    """Dictionary that drops its least recently used entries over a maximum size
+
+    Every read and write holds a lock, so searches of different clients run at the same time and only
+    wait for each other on single cache accesses.
+    """
+    def __init__(self, maxSize: int):
+        super().__init__()
+        self.maxSize = maxSize
+        self._lock = Lock()
+    def __getitem__(self, key):
+        with self._lock:
+            value = super().__getitem__(key)
+            self.move_to_end(key)
+            return value
+    def get(self, key, default = None):
+        with self._lock:
+            if not super().__contains__(key):
+                return default
+            value = super().__getitem__(key)
+            self.move_to_end(key)
+            return value
+    def __setitem__(self, key, value):
+        with self._lock:
+            super().__setitem__(key, value)
+            self.move_to_end(key)
+            while len(self) > self.maxSize:
+                self.popitem(last=False)
+class EngineSession:
+    """Protocol state of a single client: its position and running search"""
+    def __init__(self, daemon: EngineDaemon, write):
+        """Initializes the session on the starting position
+
+        Args:
+            daemon (EngineDaemon): Shared engine.
+            write (callable): Function used to send a reply line.
+        """
+        self.daemon = daemon
+        self.write = write
+        self.board = Board(1)
+        self.board.SetBoard()
+        self.limits = None
+        self.report = False
+        self.thread = None
+    def Handle(self, line: str) -> bool:
+        """Performs a single protocol command
+
+        Args:
+            line (str): Command line received.
+
+        Returns:
+            bool: False if the client asked to quit
+        """
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+        try:
+            if command == "quit":
+                self.Stop()
+                return False
+            elif command == "isready":
+                self.write("readyok")
+            elif command == "stop":
+                self.Stop()
+            elif command == "stats":
+                self.write(self.daemon.Stats())
+            elif command == "position":
+                self.Wait()
+                self.board = self.ParsePosition(args)
+                self.write("ok")
+            elif command == "move":
+                self.Wait()
+                movement = _ParseMovement(args)
+                if self.board.ValidateMovement(movement):
+                    self.board.MoveTile(movement, validate=False)
+                    self.board.ChangeTurn()
+                    self.write("ok")
+                else:
+                    self.write("illegal")
+            elif command == "go":
+                self.Wait()
+                options = dict(zip(args[::2], args[1::2]))
+                depth = int(options["depth"]) if "depth" in options else None
+                time = float(options["time"]) if "time" in options else None
+                nodes = int(options["nodes"]) if "nodes" in options else None
+                self.Start(depth, SearchLimits(time, nodes), True)
+            elif command == "ponder":
+                self.Wait()
+                self.Start(_MaxDepth, SearchLimits(), False)
+            else:
+                self.write(f"error unknown command '{command}'")
+        except (AssertionError, ValueError, KeyError, IndexError) as e:
+            self.write(f"error {e}")
+        return True
+    def ParsePosition(self, args: list[str]) -> Board:
+        """Builds a board from the arguments of a position command
+
+        Args:
+            args (list[str]): "startpos [size]" or "<turn> <rows>".
+
+        Returns:
+            Board: Board built
+        """
+        if args[0] == "startpos":
+            board = Board(1, int(args[1]) if len(args) > 1 else 6)
+            board.SetBoard()
+            return board
+        rows = [[int(ID) for ID in row.split(",")] for row in args[1].split("/")]
+        board = Board(int(args[0]), len(rows))
+        for i, j in [(x, y) for x in range(0, board.height) for y in range(0, board.width)]:
+            board.board[i][j].ID = rows[i][j]
+        return board
+    def Start(self, depth: int, limits: SearchLimits, report: bool):
+        """Starts a search on a background thread so stop can interrupt it
+
+        Args:
+            depth (int): Maximum depth.
+            limits (SearchLimits): Limits of the search.
+            report (bool): If the result is sent when the search finishes on its own.
+        """
+        self.limits, self.report = limits, report
+        board = self.board.Clone()
+        def Run():
+            movement, score, reached = self.daemon.Search(board, depth, limits)
+            if report or limits.stopped:
+                self.write(f"bestmove {_FormatMovement(movement)} score {score} depth {reached} nodes {limits.nodes}")
+        self.thread = Thread(target=Run, daemon=True)
+        self.thread.start()
+    def Wait(self):
+        """Waits for a running search to report its result, a running ponder is stopped silently"""
+        if self.thread is None:
+            return
+        if self.report:
+            self.thread.join()
+            self.thread, self.limits = None, None
+        else:
+            self.Stop(False)
+    def Stop(self, report = True):
+        """Stops the running search, if any, and waits for it
+
+        Args:
+            report (bool, optional): If the result of the search is sent. Defaults to True.
+        """
+        if self.thread is None:
+            return
+        if not report:
+            write, self.write = self.write, lambda line: None
+        self.limits.Stop()
+        self.thread.join()
+        if not report:
+            self.write = write
+        self.thread, self.limits = None, None
+class _Handler(socketserver.StreamRequestHandler):
+    """Serves a single socket client"""
+    def handle(self):
+        def Write(line: str):
+            self.wfile.write((line + "\n").encode())
+            self.wfile.flush()
+        session = EngineSession(self.server.daemon, Write)
+        for line in self.rfile:
+            if not session.Handle(line.decode()):
+                break
+        session.Stop(False)
+class _Server(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+def ServeStdin(daemon: EngineDaemon = None):
+    """Runs the protocol over stdin and stdout
+
+    Args:
+        daemon (EngineDaemon, optional): Engine to use. Defaults to a new one.
+    """
+    daemon = daemon if daemon is not None else EngineDaemon()
+    writeLock = Lock()
+    def Write(line: str):
+        with writeLock:
+            sys.stdout.write(line + "\n")
+            sys.stdout.flush()
+    session = EngineSession(daemon, Write)
+    for line in sys.stdin:
+        if not session.Handle(line):
+            break
+    session.Stop(False)
+def ServeSocket(port = 8766, host = "127.0.0.1", daemon: EngineDaemon = None):
+    """Runs the protocol over a local TCP socket, every client shares the same engine
+
+    Args:
+        port (int, optional): Port to listen on. Defaults to 8766.
+        host (str, optional): Address to listen on. Defaults to "127.0.0.1".
+        daemon (EngineDaemon, optional): Engine to use. Defaults to a new one.
+    """
+    server = _Server((host, port), _Handler)
+    server.daemon = daemon if daemon is not None else EngineDaemon()
+    print(_yellow + f"Engine daemon listening on [{host}:{port}]" + _white)
+    with server:
+        server.serve_forever()
+class EngineClient:
+    """Connects to a running daemon over its local socket"""
+    def __init__(self, port = 8766, host = "127.0.0.1"):
+        """Opens the connection
+
+        Args:
+            port (int, optional): Port of the daemon. Defaults to 8766.
+            host (str, optional): Address of the daemon. Defaults to "127.0.0.1".
+        """
+        import socket
+        self.socket = socket.create_connection((host, port))
+        self.file = self.socket.makefile("rw")
+    def Send(self, line: str, reply = True) -> str:
+        """Sends a command and optionally waits for its reply
+
+        Args:
+            line (str): Command to send.
+            reply (bool, optional): If a reply line is awaited. Defaults to True.
+
+        Returns:
+            str: Reply line, None if not awaited
+        """
+        self.file.write(line + "\n")
+        self.file.flush()
+        return self.file.readline().strip() if reply else None
+    def Search(self, board: Board, depth: int = None, time: float = None, nodes: int = None) -> tuple[TileMovement, int]:
+        """Sends a board and searches it on the daemon, same return values as MiniMax
+
+        Args:
+            board (Board): Board to search.
+            depth (int, optional): Depth limit. Defaults to the board's difficulty, or no limit if a time or node limit is set.
+            time (float, optional): Time limit in seconds. Defaults to None.
+            nodes (int, optional): Node limit. Defaults to None.
+
+        Returns:
+            tuple[TileMovement, int]: Movement found and its score
+        """
+        if depth is None and time is None and nodes is None:
+            depth = board.difficulty #The protocol has no difficulty, the daemon would use its own default
+        rows = "/".join(",".join(str(tile.ID) for tile in row) for row in board.board)
+        self.Send(f"position {board.turn} {rows}")
+        command = "go"
+        for name, value in [("depth", depth), ("time", time), ("nodes", nodes)]:
+            if value is not None:
+                command += f" {name} {value}"
+        tokens = self.Send(command).split()
+        assert tokens and tokens[0] == "bestmove", _red + f"Unexpected reply from daemon {tokens}" + _white
+        end = tokens.index("score")
+        movement = TileMovement([Tile(-1, -1)]) if tokens[1] == "none" else _ParseMovement(tokens[1:end])
+        return movement, int(tokens[end + 1])
+    def Close(self):
+        """Closes the connection"""
+        self.Send("quit", False)
+        self.socket.close()
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        ServeSocket(int(sys.argv[1]))
+    else:
+        ServeStdin()
@@ -0,0 +1,138 @@
+from __future__ import annotations
+from collections import deque
+from contextlib import nullcontext
+from time import perf_counter
+
+_red = "\033[31m"
+_blue = "\033[34m"
+_white = "\033[37m"
+_yellow = "\033[33m"
+_green = "\033[32m"
+_cyan = "\033[96m"
+
+"""
+    Event driven turn loop, replaces advancing the game by calling Main() again on every turn
+
+    Each state has a handler that does the work of that state once and returns an event, the transition
+    table maps the event to the next state. The loop itself is a single while, so the stack and the
+    retained frames stay the same size however long a session runs, and only the last transitions are
+    kept for debugging. A handler returning GAMEOVER counts a finished game and the loop starts the
+    next one, so a station can play many games back to back.
+
+    States:
+        setup       -> ready                            (board set and calibrated)
+        verify      -> human | ai | mismatch            (start of turn board check)
+        correction  -> corrected | retry                (physical board fixed, or the human must fix it)
+        human       -> moved | gameover
+        ai          -> moved | rejected | gameover
+
+    Usage:
+        loop = GameLoop({SETUP: Setup, VERIFY: Verify, ...}, Transitions)
+        loop.Run(games=10)
+"""
+
+SETUP = "setup"
+HUMAN = "human"
+VERIFY = "verify"
+AI = "ai"
+CORRECTION = "correction"
+GAMEOVER = "gameover" #Event ending a game, always leads back to SETUP
+QUIT = "quit" #Event ending the session
+
+Transitions = {
+    SETUP: {"ready": VERIFY},
+    VERIFY: {"human": HUMAN, "ai": AI, "mismatch": CORRECTION},
+    CORRECTION: {"corrected": VERIFY, "retry": VERIFY},
+    HUMAN: {"moved": VERIFY},
+    AI: {"moved": VERIFY, "rejected": VERIFY},
+}
+
+class GameLoop:
+    """Runs the handler of the current state and moves to the state its event leads to, until the session ends"""
+    def __init__(self, handlers: dict, transitions: dict = Transitions, history = 32, tracer = None, debug = False):
+        """Initializes the loop, nothing runs until Run is called
+
+        Args:
+            handlers (dict[str, callable]): Function of each state, called with the loop and returning an event.
+            transitions (dict[str, dict[str, str]], optional): Next state of each state and event. Defaults to Transitions.
+            history (int, optional): Ammount of transitions kept for debugging. Defaults to 32.
+            tracer (Tracer, optional): Tracer timing every state as a turn, see telemetry.Tracer. Defaults to None.
+        """
+        assert SETUP in handlers, _red + f"A handler for the '{SETUP}' state is required" + _white
+        for state, events in transitions.items():
+            for event, target in events.items():
+                assert target in handlers, _red + f"Event '{event}' of state '{state}' leads to '{target}', which has no handler" + _white
+        self.handlers = handlers
+        self.transitions = transitions
+        self.history = deque(maxlen=history)
+        self.tracer = tracer
+        self.debug = debug
+        self.state = SETUP
+        self.games = 0
+        self.steps = 0
+        self.running = False
+    def Next(self, event: str) -> str:
+        """Returns the state an event leads to from the current state
+
+        Args:
+            event (str): Event returned by the handler of the current state.
+
+        Returns:
+            str: Next state, None if the session ends
+        """
+        if event == QUIT:
+            return None
+        if event == GAMEOVER:
+            return SETUP
+        events = self.transitions.get(self.state, {})
+        assert event in events, _red + f"Unknown event '{event}' for state '{self.state}', must be one of {list(events) + [GAMEOVER, QUIT]}" + _white
+        return events[event]
+    def Stop(self):
+        """Ends the session once the handler running finishes, safe to call from other threads or handlers"""
+        self.running = False
+    def Run(self, state: str = SETUP, games: int = None) -> int:
+        """Runs the loop until a handler returns QUIT, Stop is called, enough games are played or the user interrupts it
+
+        Args:
+            state (str, optional): State to start in, for example VERIFY to resume a game. Defaults to SETUP.
+            games (int, optional): Ammount of games to play, None to play until stopped. Defaults to None.
+
+        Returns:
+            int: Ammount of games finished in this run
+        """
+        assert state in self.handlers, _red + f"Unknown state '{state}', must be one of {list(self.handlers)}" + _white
+        self.state = state
+        self.running = True
+        finished = 0
+        try:
+            while self.running:
+                start = perf_counter()
+                with self.tracer.Turn(self.state, game=self.games + 1) if self.tracer is not None else nullcontext():
+                    event = self.handlers[self.state](self)
+                target = self.Next(event)
+                self.history.append((self.state, event, target, perf_counter() - start))
+                self.steps += 1
+                if self.debug: print(_cyan + f"State '{self.state}' -> '{event}' -> '{target}' in [{perf_counter() - start:.3f}]s" + _white)
+                if event == GAMEOVER:
+                    self.games += 1
+                    finished += 1
+                    if self.debug: print(_green + f"Finished game [{self.games}]" + _white)
+                    if games is not None and finished >= games:
+                        target = None
+                if target is None:
+                    break
+                self.state = target
+        except KeyboardInterrupt:
+            print(_yellow + f"Session interrupted in state '{self.state}'" + _white)
+        self.running = False
+        return finished
+    def Report(self) -> str:
+        """Returns the games played and the last transitions
+
+        Returns:
+            str: Report
+        """
+        report = f"Played [{self.games}] games over [{self.steps}] states, last transitions:\n"
+        for state, event, target, seconds in self.history:
+            report += f"  {state} -> {event} -> {target} [{seconds:.3f}]s\n"
+        return report
@@ -0,0 +1,192 @@
+from __future__ import annotations
+from .board import Board, TileMovement, Tile
+from .minimax import SearchLimits
+from .telemetry import Traced
+from random import Random
+import math
+
+_red = "\033[31m"
+_blue = "\033[34m"
+_white = "\033[37m"
+_yellow = "\033[33m"
+_green = "\033[32m"
+_cyan = "\033[96m"
+
+"""
+    Monte Carlo tree search (UCT) engine, an anytime alternative to MiniMax
+
+    Every iteration walks down the tree picking the child with the best upper confidence bound, adds one
+    new movement, plays the game out with fast random or capture first movements and backs the result
+    up. The strength grows smoothly with the ammount of iterations, so the search can be given exactly
+    the time the turn allows. The tree below the position played can be kept between turns.
+
+    Usage:
+        movement, score = MCTS(board)                                   #Iterations from the board's difficulty
+        movement, score = MCTS(board, limits=SearchLimits(time=2))      #Time budget
+        tree = SearchTree()
+        movement, score = MCTS(board, tree=tree)                        #Reuses the tree on the next call
+"""
+
+_StaleLimit = 40 #Same as Board.IsStalemate
+
+def _Movements(board: Board) -> list[TileMovement]:
+    """Returns every movement of the player to move as a flat list"""
+    return [movement for row in board.BuildMovementsTable() for moves in row for movement in moves]
+def _IsCapture(movement: TileMovement) -> bool:
+    return abs(movement.steps[1].x - movement.steps[0].x) > 1
+def _Play(board: Board, movement: TileMovement):
+    board.MoveTile(movement, validate=False)
+    board.ChangeTurn()
+def _Material(board: Board) -> float:
+    """Scores a position by material, from -1 (only player -1 left) to 1 (only player 1 left), kings count double"""
+    player1 = board.GetAmmountOf(1) + 2 * board.GetAmmountOf(2)
+    player2 = board.GetAmmountOf(-1) + 2 * board.GetAmmountOf(-2)
+    return 0.0 if player1 + player2 == 0 else (player1 - player2) / (player1 + player2)
+class Node:
+    """Position of the search tree, reached by a movement from its parent"""
+    __slots__ = ("key", "turn", "movement", "parent", "children", "untried", "visits", "value")
+    def __init__(self, board: Board, movement: TileMovement = None, parent: Node = None):
+        self.key = board.Key()
+        self.turn = board.turn
+        self.movement = movement
+        self.parent = parent
+        self.children: list[Node] = []
+        self.untried: list[TileMovement] = None #Movements not expanded yet, None until the node is first reached
+        self.visits = 0
+        self.value = 0.0 #Sum of results for the player who moved into this node
+    def __repr__(self):
+        return f"Node({self.movement}, [{self.visits}] visits, value [{self.Mean():.3f}])"
+    def Mean(self) -> float:
+        return self.value / self.visits if self.visits else 0.0
+    def Select(self, exploration: float) -> Node:
+        """Returns the child with the highest upper confidence bound"""
+        logVisits = math.log(self.visits)
+        return max(self.children, key=lambda child: child.value / child.visits + exploration * math.sqrt(logVisits / child.visits))
+    def Find(self, key: tuple, depth = 2) -> Node:
+        """Searches this node's descendants for a position, up to a depth
+
+        Args:
+            key (tuple): Board.Key() of the position.
+            depth (int, optional): Levels to search, 2 finds the position after one movement of each player. Defaults to 2.
+
+        Returns:
+            Node: Node of the position, None if not found
+        """
+        if self.key == key:
+            return self
+        if depth == 0:
+            return None
+        for child in self.children:
+            node = child.Find(key, depth - 1)
+            if node is not None:
+                return node
+        return None
+    def Size(self) -> int:
+        return 1 + sum(child.Size() for child in self.children)
+class SearchTree:
+    """Keeps the search tree between calls to MCTS, only the subtree of the position searched survives"""
+    def __init__(self, depth = 2, debug = False):
+        """Initializes an empty tree
+
+        Args:
+            depth (int, optional): Levels below the last root in which the next position is looked for. Defaults to 2.
+        """
+        self.root: Node = None
+        self.depth = depth
+        self.debug = debug
+        self.reused = 0
+    def Root(self, board: Board) -> Node:
+        """Returns the node of a position, reusing its subtree if it was already searched
+
+        Args:
+            board (Board): Position to search.
+
+        Returns:
+            Node: Root of the search, detached from the rest of the previous tree
+        """
+        node = None if self.root is None else self.root.Find(board.Key(), self.depth)
+        if node is None:
+            node = Node(board)
+        else:
+            self.reused += 1
+            if self.debug: print(_green + f"Reusing search tree with [{node.visits}] visits for board {repr(board)}" + _white)
+        node.parent, node.movement = None, None
+        self.root = node
+        return node
+@Traced("MCTS")
+def MCTS(board: Board, iterations: int = None, limits: SearchLimits = None, tree: SearchTree = None, exploration = 1.4, playout = "heuristic", playoutDepth = 60, seed: int = None, debug = False) -> tuple[TileMovement, int]:
+    """Searches for the best movement in a board with Monte Carlo tree search, same call and result as MiniMax
+
+    Args:
+        board (Board): Board to evaluate.
+        iterations (int, optional): Ammount of playouts. Defaults to 200 times the board's difficulty value, unless a time or node limit is given.
+        limits (SearchLimits, optional): Time and iteration (nodes) limits, the search returns its best result so far once reached. Defaults to None.
+        tree (SearchTree, optional): Tree kept between searches, its subtree for this board is reused. Defaults to None.
+        exploration (float, optional): UCT exploration constant. Defaults to 1.4.
+        playout (str, optional): "random", or "heuristic" to always capture when possible. Defaults to "heuristic".
+        playoutDepth (int, optional): Movements after which a playout is scored by material. Defaults to 60.
+        seed (int, optional): Seed of the playouts. Defaults to None.
+
+    Returns:
+        tuple[TileMovement, int]: Most visited movement, TileMovement([Tile(-1, -1)]) if there is none, and the expected result for player 1 from -100 to 100
+    """
+    assert playout in ["random", "heuristic"], _red + f"Unknown playout '{playout}', must be 'random' or 'heuristic'" + _white
+    assert 0 < exploration, _red + f"Exploration constant must be greater than 0" + _white
+    if iterations is None and (limits is None or (limits.deadline is None and limits.maxNodes is None)):
+        iterations = 200 * board.difficulty
+    if debug: print(_green + f"Initiating MCTS for board {repr(board)} with [{iterations}] iterations" + _white)
+    random = Random(seed)
+    root = Node(board) if tree is None else tree.Root(board)
+    done = 0
+    while iterations is None or done < iterations:
+        if limits is not None:
+            if limits.Expired():
+                break
+            limits.nodes += 1
+        boardClone = board.Clone()
+        node = root
+        # Selection, down to a node with untried movements or a terminal one
+        while node.untried == [] and node.children:
+            node = node.Select(exploration)
+            _Play(boardClone, node.movement)
+        # Expansion, adds one untried movement
+        if node.untried is None:
+            node.untried = _Movements(boardClone) if boardClone.staleTurns <= _StaleLimit else []
+            random.shuffle(node.untried)
+        if node.untried:
+            movement = node.untried.pop()
+            _Play(boardClone, movement)
+            child = Node(boardClone, movement, node)
+            node.children.append(child)
+            node = child
+        # Playout, result for player 1
+        result = _Playout(boardClone, random, playout, playoutDepth)
+        # Backpropagation, each node keeps the result of the player who moved into it
+        while node is not None:
+            node.visits += 1
+            node.value += result * -node.turn
+            node = node.parent
+        done += 1
+    if not root.children:
+        if debug: print(_yellow + f"MCTS found no movements for board {repr(board)}" + _white)
+        return TileMovement([Tile(-1, -1)]), 0
+    best = max(root.children, key=lambda child: child.visits)
+    score = round(100 * best.Mean() * board.turn)
+    if debug: print(_green + f"MCTS has found movement {best.movement} with score [{score}] after [{done}] iterations and [{root.visits}] visits for board {repr(board)}" + _white)
+    return best.movement, score
+def _Playout(board: Board, random: Random, playout = "heuristic", depth = 60) -> float:
+    """Plays a game out from a board, changing it
+
+    Returns:
+        float: 1 if player 1 wins, -1 if player -1 wins, 0 for a stalemate, or the material balance if the depth is reached
+    """
+    for _ in range(depth):
+        if board.staleTurns > _StaleLimit:
+            return 0.0
+        movements = _Movements(board)
+        if not movements:
+            return float(-board.turn) #The player to move cannot move and loses
+        if playout == "heuristic":
+            movements = [movement for movement in movements if _IsCapture(movement)] or movements
+        _Play(board, random.choice(movements))
+    return _Material(board)
@@ -1,5 +1,11 @@
+from __future__ import annotations
 from .board import Board, TileMovement, Tile
 from random import randint
+from time import monotonic
+from .telemetry import Traced
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from .value import ValueNetwork
 
 _red = "\033[31m"
 _blue = "\033[34m"
@@ -8,7 +14,44 @@ _yellow = "\033[33m"
 _green = "\033[32m"
 _cyan = "\033[96m"
 
-def MiniMax(board: Board, depth: int = None, bestMove: TileMovement = None, bestScore: int = None, mults = [10, 20], debug = False) -> tuple[TileMovement, int]:
+class SearchLimits:
+    """Stores the limits of a search and the statistics shared by all of its depth levels"""
+    def __init__(self, time: float = None, nodes: int = None, stop = None, debug = False):
+        """Initializes the limits, the clock starts on creation
+
+        Args:
+            time (float, optional): Time limit in seconds. Defaults to None (No limit).
+            nodes (int, optional): Ammount of movements that can be expanded. Defaults to None (No limit).
+            stop (object, optional): Flag with an is_set() method that stops the search once set, usable across processes. Defaults to None.
+        """
+        assert time is None or 0 < time, _red + f"Time limit must be greater than 0" + _white
+        assert nodes is None or 0 < nodes, _red + f"Node limit must be greater than 0" + _white
+        self.deadline = None if time is None else monotonic() + time
+        self.maxNodes = nodes
+        self.stop = stop
+        self.nodes = 0
+        self.cacheHits = 0
+        self.stopped = False
+        if debug: print(_green + f"Created search limits with time [{time}] and nodes [{nodes}]" + _white)
+    def Stop(self):
+        """Requests the search to stop as soon as possible"""
+        self.stopped = True
+    def Expired(self) -> bool:
+        """Checks if any of the limits has been reached
+
+        Returns:
+            bool:
+        """
+        if not self.stopped:
+            if self.stop is not None and self.stop.is_set():
+                self.stopped = True
+            elif self.maxNodes is not None and self.nodes >= self.maxNodes:
+                self.stopped = True
+            elif self.deadline is not None and monotonic() >= self.deadline:
+                self.stopped = True
+        return self.stopped
+@Traced("MiniMax")
+def MiniMax(board: Board, depth: int = None, bestMove: TileMovement = None, bestScore: int = None, mults = [10, 20], limits: SearchLimits = None, cache: dict = None, network: ValueNetwork = None, debug = False) -> tuple[TileMovement, int]:
     """Searches for the optimal movement(s) in a board and returns it (Random if multiple) along with it's assigned score
     Args:
         board (Board): Board to evaluate.
@@ -16,6 +59,9 @@ def MiniMax(board: Board, depth: int = None, bestMove: TileMovement = None, best
         bestMove (TileMovement, optional): Highest scoring move found. Defaults to None.
         bestScore (int, optional): Highest scoring move's score value. Defaults to None.
         mults (list[int]): List of multipliers for score addition [movement, killing]. Defaults to [10, 20]
+        limits (SearchLimits, optional): Time and node limits, the search returns its best result so far once reached. Defaults to None.
+        cache (dict, optional): Table of finished results by position and depth, reused across searches. Defaults to None.
+        network (ValueNetwork, optional): Evaluation added to the score of the last movement, all the leaves of a node are evaluated in one batch. Defaults to None.
     Returns:
         tuple[TileMovement, int]: Tuple containing the optimal movement and its associated score
     """
@@ -28,41 +74,65 @@ def MiniMax(board: Board, depth: int = None, bestMove: TileMovement = None, best
     # Last depth level, returns values found
     if depth == 0:
         return [bestMove, 0]
+    if cache is not None:
+        key = (board.Key(), depth) if network is None else (board.Key(), depth, id(network))
+        cached = cache.get(key) #Single lookup, a shared cache may drop the entry between a check and a read
+        if cached is not None:
+            if limits is not None: limits.cacheHits += 1
+            return cached
     # Algorithm
     if depth > 0:
         movesTable = board.BuildMovementsTable(debug)
         bestMoves = []
+        candidates, leaves = [], []
         # Check all movements of every tile that can move on the board
         for i, j in [(x, y) for x in range(0, board.height) for y in range(0, board.width - 2)]:
             j += 1
             if movesTable[i][j] == []:
                 continue
+            if limits is not None and limits.Expired():
+                break
             for movement in movesTable[i][j]:
+                if limits is not None:
+                    if limits.Expired():
+                        break
+                    limits.nodes += 1
                 # Adds score and iterates
                 score = AssignScore(movement, board, mults, debug)
                 boardClone = Board(board.turn, board.height)
                 boardClone.board = board.CreateClone(debug)
                 boardClone.MoveTile(movement, debug=debug)
                 boardClone.ChangeTurn(debug)
-                score += MiniMax(boardClone, depth - 1, debug=debug)[1]
-                # Maximize for ID 1, minimize for ID -1
-                if board.turn == 1:
-                    if bestScore == None or score > bestScore:
-                        bestScore = score
-                        bestMoves = [movement]
-                    elif score == bestScore:
-                        bestMoves.append(movement) 
+                if network is not None and depth == 1:
+                    leaves.append(boardClone)
                 else:
-                    if bestScore == None or score < bestScore:
-                        bestScore = score
-                        bestMoves = [movement]
-                    elif score == bestScore:
-                        bestMoves.append(movement)
-            # Chooses a random movement from the list of highest scoring movements
-            if bestMoves:
-                bestMove = bestMoves[randint(0, len(bestMoves) - 1)]
+                    score += MiniMax(boardClone, depth - 1, mults=mults, limits=limits, cache=cache, network=network, debug=debug)[1]
+                candidates.append([movement, score])
+        # Leaves are evaluated together so the network runs once per node
+        if leaves:
+            for candidate, value in zip(candidates, network.EvaluateBoards(leaves)):
+                candidate[1] += round(network.scale * float(value))
+        for movement, score in candidates:
+            # Maximize for ID 1, minimize for ID -1
+            if board.turn == 1:
+                if bestScore == None or score > bestScore:
+                    bestScore = score
+                    bestMoves = [movement]
+                elif score == bestScore:
+                    bestMoves.append(movement) 
+            else:
+                if bestScore == None or score < bestScore:
+                    bestScore = score
+                    bestMoves = [movement]
+                elif score == bestScore:
+                    bestMoves.append(movement)
+        # Chooses a random movement from the list of highest scoring movements
+        if bestMoves:
+            bestMove = bestMoves[randint(0, len(bestMoves) - 1)]
         if bestScore == None:
             bestScore = 0
+        if cache is not None and (limits is None or not limits.Expired()):
+            cache[key] = (bestMove, bestScore)
         if debug: print(_green + f"Minimax has found movement {bestMove} with score [{bestScore}] for board {repr(board)}" + _white)
         return bestMove, bestScore
 def AssignScore(movement: TileMovement, board: Board, mults = [10, 20], debug = False) -> int:
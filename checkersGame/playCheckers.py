@@ -1,5 +1,6 @@
-from board import Board, Tile
-from minimax import MiniMax
+from .board import Board, Tile
+from .minimax import MiniMax
+from .gameloop import GameLoop, SETUP, HUMAN, AI, GAMEOVER
 from re import findall
 
 _red = "\033[31m"
@@ -12,7 +13,7 @@ _cyan = "\033[96m"
 """
     Example script of checkers.py usage, plays out a game of checkers in the IDE's console
 
-    Main game loop:                                             
+    Main game loop (see gameloop.GameLoop, one state per turn): 
         - Machine's turn:                                       
             - Identify best movements through minimax algorithm 
             - If no movements are possible, accept defeat       
@@ -30,6 +31,9 @@ _cyan = "\033[96m"
         - Difficulty can be controlled via depth of minimax     
             - Higher depth implies harsher AI (Better movements selection)                   
             - Higher depth increases computing time exp
+
+    Usage (from the project root):
+        python -m checkersGame.playCheckers
 """
 
 debug = True # Debug mode
@@ -48,80 +52,83 @@ def GetInput(type: str, message: str):
     Returns:
         any: Input returned
     """
-    userInput = input(message)
-    if type == "int":
-        if userInput.isnumeric():
-            return int(userInput)
-        else:
-            input(_yellow + "Invalid input, press enter to try again" + _white)
-            return GetInput(type, message)
-    elif type == "str":
-        return userInput
-    elif type == "list":
-        inputPos = findall(r'\d+', userInput)
-        inputPos = [int(x) for x in inputPos]
-        if len(inputPos) != 2:
-            input(_yellow + "Invalid input, press enter to try again" + _white)
-            return GetInput(type, message)
-        inputPos[0] -= 1
-        return inputPos
+    while True:
+        userInput = input(message)
+        if type == "int":
+            if userInput.isnumeric():
+                return int(userInput)
+        elif type == "str":
+            return userInput
+        elif type == "list":
+            inputPos = findall(r'\d+', userInput)
+            inputPos = [int(x) for x in inputPos]
+            if len(inputPos) == 2:
+                inputPos[0] -= 1
+                return inputPos
+        input(_yellow + "Invalid input, press enter to try again" + _white)
+
+def NextTurn() -> str:
+    """Returns the event of the side moving next
 
-def Main():
-    """Main game loop"""
-    if gameBoard.turn == 0:
-        gameBoard.SetBoard(debug)
-        print("Welcome to PythonCheckers:")
-        gameBoard.difficulty = GetInput("int", "Please select your difficulty (1 to 5): \n")
-        Main()
-    else:
-        if gameBoard.turn == 1 and not auto:
-            if gameBoard.IsCheckmate(debug) or gameBoard.IsStalemate(debug=debug):
-                print("Game has ended, the AI wins")
-                gameBoard.turn = 0
-                Main()
-            print(gameBoard)
-            inputPos = GetInput("list", "Which tile do you want to move? <[↓, →]> \n")
-            if not gameBoard.InsideBounds(inputPos, debug=debug):
-                input(_yellow + "Invalid selection, press enter to try again" + _white)
-                print(gameBoard)
-                Main() 
-            inputPos = Tile(inputPos[0], inputPos[1])
-            posMoves = gameBoard.PossibleMovements(inputPos, debug)
-            if len(posMoves[1]) == 0:
-                input(_yellow + "Invalid selection, press enter to try again" + _white)
-                print(gameBoard)
-                Main() 
-            print(posMoves[0])
-            inputTarget = GetInput("int", "Which movement do you want to make? <Number> \n")
-            inputTarget -= 1
-            if inputTarget not in range(len(posMoves[1])):
-                input(_yellow + "Invalid selection, press enter to try again" + _white)
-                print(gameBoard)
-                Main()
-            movement = posMoves[1][inputTarget] 
-            if gameBoard.ValidateMovement(movement, debug):
-                gameBoard.MoveTile(movement, debug=debug)
-                gameBoard.ChangeTurn(debug)
-                print(gameBoard)
-                Main() 
-            else:
-                input(_yellow + "Internal error, press enter to try again" + _white)
-                print(gameBoard)
-                Main() 
+    Returns:
+        str: "human" if the player moves next, else "ai"
+    """
+    return "human" if gameBoard.turn == 1 and not auto else "ai"
+def Setup(loop: GameLoop) -> str:
+    """Sets the board and difficulty of a new game"""
+    gameBoard.SetBoard(debug)
+    print("Welcome to PythonCheckers:")
+    gameBoard.difficulty = GetInput("int", "Please select your difficulty (1 to 5): \n")
+    return NextTurn()
+def HumanTurn(loop: GameLoop) -> str:
+    """Asks the player for a movement and plays it, invalid selections ask again"""
+    if gameBoard.IsCheckmate(debug) or gameBoard.IsStalemate(debug=debug):
+        print("Game has ended, the AI wins")
+        gameBoard.turn = 0
+        return GAMEOVER
+    print(gameBoard)
+    inputPos = GetInput("list", "Which tile do you want to move? <[↓, →]> \n")
+    if not gameBoard.InsideBounds(inputPos, debug=debug):
+        input(_yellow + "Invalid selection, press enter to try again" + _white)
+        return "human"
+    inputPos = Tile(inputPos[0], inputPos[1])
+    posMoves = gameBoard.PossibleMovements(inputPos, debug)
+    if len(posMoves[1]) == 0:
+        input(_yellow + "Invalid selection, press enter to try again" + _white)
+        return "human"
+    print(posMoves[0])
+    inputTarget = GetInput("int", "Which movement do you want to make? <Number> \n")
+    inputTarget -= 1
+    if inputTarget not in range(len(posMoves[1])):
+        input(_yellow + "Invalid selection, press enter to try again" + _white)
+        return "human"
+    movement = posMoves[1][inputTarget]
+    if not gameBoard.ValidateMovement(movement, debug):
+        input(_yellow + "Internal error, press enter to try again" + _white)
+        return "human"
+    gameBoard.MoveTile(movement, debug=debug)
+    gameBoard.ChangeTurn(debug)
+    print(gameBoard)
+    return NextTurn()
+def AITurn(loop: GameLoop) -> str:
+    """Plays the best movement found by MiniMax"""
+    if gameBoard.IsCheckmate(debug) or gameBoard.IsStalemate(debug=debug):
+        if auto:
+            print(f"Game has ended, player {gameBoard.turn} wins")
         else:
-            if gameBoard.IsCheckmate(debug) or gameBoard.IsStalemate(debug=debug):
-                if auto:
-                    print(f"Game has ended, player {gameBoard.turn} wins")
-                else:
-                    print("Game has ended, the player wins")
-                gameBoard.turn = 0
-                Main()
-            movement = MiniMax(gameBoard, debug=debug)
-            gameBoard.MoveTile(movement[0], debug=debug)
-            gameBoard.ChangeTurn(debug)
-            print(gameBoard)
-            if auto:
-                input("Press enter to advance to the next turn.")
-                print("Calculating...")
-            Main()
-Main()
\ No newline at end of file
+            print("Game has ended, the player wins")
+        gameBoard.turn = 0
+        return GAMEOVER
+    movement = MiniMax(gameBoard, debug=debug)
+    gameBoard.MoveTile(movement[0], debug=debug)
+    gameBoard.ChangeTurn(debug)
+    print(gameBoard)
+    if auto:
+        input("Press enter to advance to the next turn.")
+        print("Calculating...")
+    return NextTurn()
+
+#Every state can hand the turn to either side, in auto mode both sides are played by the AI
+Transitions = {state: {"human": HUMAN, "ai": AI} for state in [SETUP, HUMAN, AI]}
+loop = GameLoop({SETUP: Setup, HUMAN: HumanTurn, AI: AITurn}, Transitions, debug=debug)
+loop.Run()
@@ -0,0 +1,220 @@
+from __future__ import annotations
+from .board import Board, TileMovement
+from .minimax import MiniMax
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from time import perf_counter
+import argparse
+import random
+import json
+import math
+import numpy
+import os
+
+_red = "\033[31m"
+_blue = "\033[34m"
+_white = "\033[37m"
+_yellow = "\033[33m"
+_green = "\033[32m"
+_cyan = "\033[96m"
+
+"""
+    Self-play data generator, plays engine games on a process pool and writes them as compressed shards
+
+    Every game starts with a few random movements, and for a few more movements each root movement is
+    scored and sampled with a softmax over score / temperature, so games do not repeat. Finished games
+    are streamed back from the workers and written as soon as a shard is full, only a bounded ammount of
+    games is ever in flight, so memory stays flat however long the run is.
+
+    Shard arrays (one row per position):
+        boards      int8 (P, N, N+2)    Tile IDs, cemetery columns included
+        turns       int8 (P)            Player to move
+        moves       int8 (P, S, 2)      Steps of the movement played, padded with -1
+        scores      int32 (P)           Score of the movement returned by the engine
+        results     int8 (P)            Final result of the game for player 1, 0 for a stalemate
+        games       int32 (P)           Game index
+        plies       int16 (P)           Movement number inside the game
+    manifest.json lists the settings and every shard, and is rewritten after each shard.
+
+    Usage:
+        python -m checkersGame.selfplay --games 2000 --workers 4 --out SELFPLAY
+        X, y = train.LoadShards("SELFPLAY")
+"""
+
+def _Movements(board: Board) -> list[TileMovement]:
+    return [movement for row in board.BuildMovementsTable() for moves in row for movement in moves]
+def _IDs(board: Board) -> numpy.ndarray:
+    return numpy.array([[tile.ID for tile in row] for row in board.board], dtype=numpy.int8)
+def _Child(board: Board, movement: TileMovement) -> Board:
+    """Returns the board after a movement, the board itself does not change"""
+    boardClone = board.Clone()
+    boardClone.MoveTile(movement, validate=False)
+    boardClone.ChangeTurn()
+    return boardClone
+def _Sample(board: Board, engine, depth: int, temperature: float, rng: random.Random) -> tuple[TileMovement, int]:
+    """Scores every movement with the engine one level shallower and samples one, better movements being more likely"""
+    movements = _Movements(board)
+    scores = [engine(_Child(board, movement), depth - 1)[1] if depth > 1 else 0 for movement in movements]
+    best = max(board.turn * score for score in scores)
+    weights = [math.exp((board.turn * score - best) / temperature) for score in scores]
+    index = rng.choices(range(len(movements)), weights)[0]
+    return movements[index], scores[index]
+def PlayGame(game: int, engine = MiniMax, depth = 2, size = 6, randomMoves = 4, temperatureMoves = 8, temperature = 10.0, seed = 0) -> dict:
+    """Plays one self-play game, the same game and seed always give the same record
+
+    Args:
+        game (int): Index of the game, combined with the seed.
+        engine (callable, optional): Search called as engine(board, depth), returning a movement and its score. Defaults to MiniMax.
+        depth (int, optional): Depth (or budget) of the engine. Defaults to 2.
+        size (int, optional): Size of the board (N). Defaults to 6.
+        randomMoves (int, optional): Uniformly random movements at the start. Defaults to 4.
+        temperatureMoves (int, optional): Movements after those sampled by score. Defaults to 8.
+        temperature (float, optional): Score difference that makes a movement e times less likely, 0 to disable sampling. Defaults to 10.0.
+        seed (int, optional): Seed of the run. Defaults to 0.
+
+    Returns:
+        dict[str, numpy.array]: Arrays of the game, see the shard arrays
+    """
+    rng = random.Random(seed * 1000003 + game)
+    random.seed(rng.random()) #Ties inside MiniMax use the global generator
+    board = Board(1, size)
+    board.SetBoard()
+    boards, turns, moves, scores = [], [], [], []
+    while not board.IsCheckmate() and not board.IsStalemate():
+        ply = len(boards)
+        if ply < randomMoves:
+            movement, score = rng.choice(_Movements(board)), 0
+        elif ply < randomMoves + temperatureMoves and temperature > 0:
+            movement, score = _Sample(board, engine, depth, temperature, rng)
+        else:
+            movement, score = engine(board, depth)
+        boards.append(_IDs(board))
+        turns.append(board.turn)
+        moves.append([[step.x, step.y] for step in movement.steps])
+        scores.append(score)
+        board = _Child(board, movement)
+    result = 0 if board.staleTurns > 40 else -board.turn
+    steps = max((len(move) for move in moves), default=2)
+    movesArray = numpy.full((len(moves), steps, 2), -1, dtype=numpy.int8)
+    for i, move in enumerate(moves):
+        movesArray[i, :len(move)] = move
+    return {
+        "boards": numpy.array(boards, dtype=numpy.int8).reshape(-1, size, size + 2),
+        "turns": numpy.array(turns, dtype=numpy.int8),
+        "moves": movesArray,
+        "scores": numpy.array(scores, dtype=numpy.int32),
+        "results": numpy.full(len(boards), result, dtype=numpy.int8),
+        "games": numpy.full(len(boards), game, dtype=numpy.int32),
+        "plies": numpy.arange(len(boards), dtype=numpy.int16),
+    }
+class ShardWriter:
+    """Buffers game records and writes them as compressed shards with a manifest"""
+    def __init__(self, directory: str, positions = 50000, settings: dict = None, debug = False):
+        """Initializes the writer, the directory is created if needed
+
+        Args:
+            directory (str): Directory of the shards and manifest.
+            positions (int, optional): Positions per shard. Defaults to 50000.
+            settings (dict, optional): Generation settings stored in the manifest. Defaults to None.
+        """
+        assert 0 < positions, _red + f"Shards must hold at least one position" + _white
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.positions = positions
+        self.debug = debug
+        self.manifest = {"settings": settings or {}, "shards": [], "games": 0, "positions": 0, "results": {"1": 0, "-1": 0, "0": 0}}
+        self._buffer: list[dict] = []
+        self._buffered = 0
+    def Add(self, record: dict):
+        """Adds a game, writing a shard once enough positions are buffered
+
+        Args:
+            record (dict[str, numpy.array]): Game record, see PlayGame.
+        """
+        self._buffer.append(record)
+        self._buffered += len(record["turns"])
+        self.manifest["games"] += 1
+        self.manifest["positions"] += len(record["turns"])
+        if len(record["turns"]):
+            self.manifest["results"][str(int(record["results"][0]))] += 1
+        if self._buffered >= self.positions:
+            self.Flush()
+    def Flush(self):
+        """Writes the buffered games as a shard and rewrites the manifest"""
+        if not self._buffer:
+            return
+        steps = max(record["moves"].shape[1] for record in self._buffer)
+        arrays = {}
+        for name in self._buffer[0]:
+            parts = [record[name] for record in self._buffer]
+            if name == "moves":
+                parts = [numpy.pad(part, ((0, 0), (0, steps - part.shape[1]), (0, 0)), constant_values=-1) for part in parts]
+            arrays[name] = numpy.concatenate(parts)
+        name = f"shard-{len(self.manifest['shards']):05d}.npz"
+        with open(os.path.join(self.directory, name), "wb") as file:
+            numpy.savez_compressed(file, **arrays)
+        self.manifest["shards"].append({"file": name, "games": len(self._buffer), "positions": self._buffered})
+        self._WriteManifest()
+        if self.debug: print(_green + f"Wrote shard {name} with [{len(self._buffer)}] games and [{self._buffered}] positions" + _white)
+        self._buffer, self._buffered = [], 0
+    def _WriteManifest(self):
+        """Replaces the manifest at once, so it is never seen half written"""
+        path = os.path.join(self.directory, "manifest.json")
+        with open(path + ".tmp", "w") as file:
+            json.dump(self.manifest, file, indent=2)
+        os.replace(path + ".tmp", path)
+def Generate(games: int, directory: str, workers: int = None, engine = MiniMax, depth = 2, size = 6, randomMoves = 4, temperatureMoves = 8, temperature = 10.0, positions = 50000, seed = 0, debug = False) -> dict:
+    """Plays self-play games on a process pool and streams them into shards
+
+    Args:
+        games (int): Ammount of games to play.
+        directory (str): Directory of the shards and manifest.
+        workers (int, optional): Processes playing games. Defaults to the ammount of CPUs.
+        engine (callable, optional): Search called as engine(board, depth), must be picklable (a module level function or functools.partial). Defaults to MiniMax.
+        positions (int, optional): Positions per shard. Defaults to 50000.
+        The other arguments are passed to PlayGame.
+
+    Returns:
+        dict: Manifest of the run
+    """
+    workers = workers or os.cpu_count()
+    settings = {
+        "engine": getattr(engine, "__name__", repr(engine)), "depth": depth, "size": size, "randomMoves": randomMoves,
+        "temperatureMoves": temperatureMoves, "temperature": temperature, "seed": seed,
+    }
+    writer = ShardWriter(directory, positions, settings, debug)
+    start = perf_counter()
+    with ProcessPoolExecutor(workers) as executor:
+        pending, submitted = set(), 0
+        while submitted < games or pending:
+            #Only a couple of games per worker are in flight, finished ones are written as they arrive
+            while submitted < games and len(pending) < 2 * workers:
+                pending.add(executor.submit(PlayGame, submitted, engine, depth, size, randomMoves, temperatureMoves, temperature, seed))
+                submitted += 1
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                writer.Add(future.result())
+            if debug: print(_cyan + f"Finished [{writer.manifest['games']}/{games}] games in [{perf_counter() - start:.1f}]s" + _white)
+    writer.Flush()
+    writer.manifest["seconds"] = round(perf_counter() - start, 2)
+    writer._WriteManifest()
+    return writer.manifest
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generates self-play games as compressed NumPy shards")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--out", type=str, default="SELFPLAY")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--size", type=int, default=6)
+    parser.add_argument("--random", type=int, default=4, help="Uniformly random movements at the start of every game")
+    parser.add_argument("--temperature-moves", type=int, default=8, help="Movements sampled by score after the random ones")
+    parser.add_argument("--temperature", type=float, default=10.0)
+    parser.add_argument("--positions", type=int, default=50000, help="Positions per shard")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--debug", action="store_true")
+    args = parser.parse_args()
+    manifest = Generate(
+        args.games, args.out, args.workers, depth=args.depth, size=args.size, randomMoves=args.random, temperatureMoves=args.temperature_moves,
+        temperature=args.temperature, positions=args.positions, seed=args.seed, debug=args.debug
+    )
+    print(f"Wrote [{manifest['games']}] games and [{manifest['positions']}] positions in [{len(manifest['shards'])}] shards to {args.out} in [{manifest['seconds']}]s, results {manifest['results']}")
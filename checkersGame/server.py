@@ -0,0 +1,335 @@
+from __future__ import annotations
+from .board import Board, TileMovement, Tile
+from .minimax import MiniMax
+from concurrent.futures import Executor, ProcessPoolExecutor
+from collections import deque
+from itertools import count
+import asyncio
+import json
+import os
+
+_red = "\033[31m"
+_blue = "\033[34m"
+_white = "\033[37m"
+_yellow = "\033[33m"
+_green = "\033[32m"
+_cyan = "\033[96m"
+
+"""
+    Hosts many independent games of checkers inside a single asyncio process
+
+    Server layout:
+        - Every game lives in its own GameSession with its own Board, no state is shared between sessions
+        - Engine searches run on a shared worker pool (processes by default) over a snapshot of the board
+        - Fairness: sessions with pending searches are served round-robin, one search in flight per session
+        - Backpressure: the ammount of queued searches is capped, callers wait until there is room
+        - Optional JSON-lines TCP front end, one request per line:
+            {"cmd": "new", "size": 6, "difficulty": 3}
+            {"cmd": "move", "id": 1, "steps": [[4, 2], [3, 1]]}
+            {"cmd": "ai", "id": 1}
+            {"cmd": "state", "id": 1}
+            {"cmd": "close", "id": 1}
+"""
+
+def _Search(board: Board, depth: int = None) -> tuple[TileMovement, int]:
+    """Worker entry point, runs MiniMax over a board snapshot
+
+    Args:
+        board (Board): Board snapshot to search.
+        depth (int, optional): Depth of search. Defaults to board's difficulty value.
+
+    Returns:
+        tuple[TileMovement, int]: Movement found and its score
+    """
+    movement, score = MiniMax(board, depth)
+    return movement, score
+class GameSession:
+    """Stores the state of a single game hosted by a GameServer"""
+    def __init__(self, ID: int, size = 6, difficulty = 3, debug = False):
+        """Initializes the session with a board on its starting position
+
+        Args:
+            ID (int): Identifier of the session.
+            size (int, optional): Size of the board. Defaults to 6.
+            difficulty (int, optional): Difficulty of the board, used as search depth. Defaults to 3.
+        """
+        self.ID = ID
+        self.board = Board(1, size, difficulty, debug)
+        self.board.SetBoard(debug)
+        self.history = []
+        self.pending = deque()
+        self.searching = False
+        self.searches = 0
+        self.lock = asyncio.Lock()
+        if debug: print(_green + f"Created session [{ID}] with size [{size}] at difficulty [{difficulty}]" + _white)
+    def State(self) -> dict:
+        """Returns the session state as plain values, for use in clients
+
+        Returns:
+            dict: Board IDs, turn and counters of the session
+        """
+        return {
+            "id": self.ID,
+            "board": [[tile.ID for tile in row] for row in self.board.board],
+            "turn": self.board.turn,
+            "turnCount": self.board.turnCount,
+            "staleTurns": self.board.staleTurns,
+            "history": [[[step.x, step.y] for step in movement.steps] for movement in self.history],
+        }
+    def IsFinished(self, debug = False) -> bool:
+        """Checks if the game in this session has ended
+
+        Returns:
+            bool:
+        """
+        return self.board.IsCheckmate(debug) or self.board.IsStalemate(debug=debug)
+class GameServer:
+    """Hosts many GameSession at once and schedules their engine searches on a shared worker pool"""
+    def __init__(self, workers: int = None, maxPending = 64, executor: Executor = None, debug = False):
+        """Initializes the server, the scheduler is started by Start()
+
+        Args:
+            workers (int, optional): Ammount of searches allowed to run at once, required with a custom executor. Defaults to the ammount of CPUs.
+            maxPending (int, optional): Ammount of searches allowed to wait in queue before callers are held. Defaults to 64.
+            executor (Executor, optional): Pool used for searches, with at least as many workers. Defaults to a ProcessPoolExecutor of the given workers.
+        """
+        assert 0 < maxPending, _red + f"Server {repr(self)} must allow at least one pending search" + _white
+        assert executor is None or workers is not None, _red + f"Server {repr(self)} needs the worker count of a custom executor" + _white
+        workers = workers or os.cpu_count()
+        self.executor = executor if executor is not None else ProcessPoolExecutor(workers)
+        assert 0 < workers, _red + f"Server {repr(self)} must have at least one worker" + _white
+        self.workers = workers
+        self.maxPending = maxPending
+        self.sessions: dict[int, GameSession] = {}
+        self.debug = debug
+        self._ids = count(1)
+        self._ready = deque()
+        self._wakeup = None
+        self._slots = None
+        self._capacity = None
+        self._scheduler = None
+        self._tcp = None
+        if debug: print(_green + f"Created server {repr(self)} with [{workers}] workers and [{maxPending}] pending searches" + _white)
+    async def Start(self):
+        """Starts the search scheduler, must be called from inside the running event loop"""
+        self._wakeup = asyncio.Event()
+        self._slots = asyncio.Semaphore(self.workers)
+        self._capacity = asyncio.Semaphore(self.maxPending)
+        self._scheduler = asyncio.create_task(self._Schedule())
+        if self.debug: print(_green + f"Started scheduler for server {repr(self)}" + _white)
+    async def Stop(self):
+        """Stops the scheduler and TCP front end, cancels pending searches and shuts down the worker pool"""
+        if self._tcp is not None:
+            self._tcp.close()
+            await self._tcp.wait_closed()
+            self._tcp = None
+        if self._scheduler is not None:
+            self._scheduler.cancel()
+            try:
+                await self._scheduler
+            except asyncio.CancelledError:
+                pass
+            self._scheduler = None
+        for session in self.sessions.values():
+            while session.pending:
+                _, future = session.pending.popleft()
+                future.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.debug: print(_green + f"Stopped server {repr(self)}" + _white)
+    def CreateSession(self, size = 6, difficulty = 3) -> GameSession:
+        """Creates a new game session
+
+        Args:
+            size (int, optional): Size of the board. Defaults to 6.
+            difficulty (int, optional): Difficulty of the board. Defaults to 3.
+
+        Returns:
+            GameSession: Session created
+        """
+        session = GameSession(next(self._ids), size, difficulty, self.debug)
+        self.sessions[session.ID] = session
+        return session
+    def GetSession(self, ID: int) -> GameSession:
+        """Returns a hosted session
+
+        Args:
+            ID (int): Identifier of the session.
+
+        Returns:
+            GameSession: Session found
+        """
+        assert ID in self.sessions, _red + f"Session [{ID}] does not exist in server {repr(self)}" + _white
+        return self.sessions[ID]
+    def CloseSession(self, ID: int):
+        """Removes a session from the server, cancelling any search it has queued
+
+        Args:
+            ID (int): Identifier of the session.
+        """
+        session = self.GetSession(ID)
+        while session.pending:
+            _, future = session.pending.popleft()
+            future.cancel()
+        del self.sessions[ID]
+        if self.debug: print(_green + f"Closed session [{ID}] in server {repr(self)}" + _white)
+    async def PlayMove(self, ID: int, movement: TileMovement) -> bool:
+        """Validates and performs a movement for the player whose turn it is
+
+        Args:
+            ID (int): Identifier of the session.
+            movement (TileMovement): Movement to perform.
+
+        Returns:
+            bool: True if the movement was valid and performed
+        """
+        session = self.GetSession(ID)
+        async with session.lock:
+            if not session.board.ValidateMovement(movement, self.debug):
+                return False
+            session.board.MoveTile(movement, validate=False, debug=self.debug)
+            session.board.ChangeTurn(self.debug)
+            session.history.append(movement)
+        return True
+    async def Search(self, ID: int, depth: int = None) -> tuple[TileMovement, int]:
+        """Queues an engine search over the current position of a session and waits for its result
+
+        Args:
+            ID (int): Identifier of the session.
+            depth (int, optional): Depth of search. Defaults to the session's difficulty.
+
+        Returns:
+            tuple[TileMovement, int]: Movement found and its score
+        """
+        assert self._scheduler is not None, _red + f"Server {repr(self)} must be started before searching" + _white
+        session = self.GetSession(ID)
+        await self._capacity.acquire()
+        try:
+            future = asyncio.get_running_loop().create_future()
+            session.pending.append((depth, future))
+            if not session.searching and session.ID not in self._ready:
+                self._ready.append(session.ID)
+            self._wakeup.set()
+            return await future
+        finally:
+            self._capacity.release()
+    async def PlayAI(self, ID: int, depth: int = None) -> TileMovement:
+        """Searches and performs the engine's movement for the current turn of a session
+
+        Args:
+            ID (int): Identifier of the session.
+            depth (int, optional): Depth of search. Defaults to the session's difficulty.
+
+        Returns:
+            TileMovement: Movement performed, False if no movement is possible or the position changed during the search
+        """
+        session = self.GetSession(ID)
+        position = (session.board.Key(), session.board.turnCount)
+        movement, _ = await self.Search(ID, depth)
+        if movement == TileMovement([Tile(-1, -1)]):
+            return False
+        async with session.lock:
+            #A movement played while searching makes the result stale, it would move the same side twice
+            if (session.board.Key(), session.board.turnCount) != position:
+                if self.debug: print(_yellow + f"Dropped stale search for session [{ID}], the position changed while searching" + _white)
+                return False
+            if not session.board.ValidateMovement(movement, self.debug):
+                return False
+            session.board.MoveTile(movement, validate=False, debug=self.debug)
+            session.board.ChangeTurn(self.debug)
+            session.history.append(movement)
+        return movement
+    async def _Schedule(self):
+        """Scheduler loop, hands out worker slots to sessions in round-robin order"""
+        loop = asyncio.get_running_loop()
+        while True:
+            while not self._ready:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            await self._slots.acquire()
+            session = None
+            while self._ready and session is None:
+                session = self.sessions.get(self._ready.popleft())
+                if session is not None and not session.pending:
+                    session = None
+            if session is None:
+                self._slots.release()
+                continue
+            depth, future = session.pending.popleft()
+            if future.cancelled():
+                self._slots.release()
+                if session.pending:
+                    self._ready.append(session.ID)
+                continue
+            session.searching = True
+            snapshot = session.board.Clone()
+            task = loop.run_in_executor(self.executor, _Search, snapshot, depth)
+            task.add_done_callback(lambda task, session=session, future=future: self._Finish(session, future, task))
+    def _Finish(self, session: GameSession, future: asyncio.Future, task: asyncio.Future):
+        """Delivers a finished search and requeues the session if it still has work"""
+        self._slots.release()
+        session.searching = False
+        session.searches += 1
+        if not future.cancelled():
+            if task.cancelled():
+                future.cancel()
+            elif task.exception() is not None:
+                future.set_exception(task.exception())
+            else:
+                future.set_result(task.result())
+        if session.pending and session.ID in self.sessions:
+            self._ready.append(session.ID)
+            self._wakeup.set()
+        if self.debug: print(_green + f"Finished search [{session.searches}] for session [{session.ID}]" + _white)
+    async def Serve(self, host = "127.0.0.1", port = 8765):
+        """Starts a JSON-lines TCP front end for the server
+
+        Args:
+            host (str, optional): Address to listen on. Defaults to "127.0.0.1".
+            port (int, optional): Port to listen on. Defaults to 8765.
+        """
+        if self._scheduler is None:
+            await self.Start()
+        self._tcp = await asyncio.start_server(self._HandleClient, host, port)
+        if self.debug: print(_green + f"Server {repr(self)} listening on [{host}:{port}]" + _white)
+        async with self._tcp:
+            await self._tcp.serve_forever()
+    async def _HandleClient(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Answers JSON-lines requests from a single client connection"""
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            try:
+                reply = await self.HandleRequest(json.loads(line))
+            except (AssertionError, ValueError, KeyError, TypeError) as e:
+                reply = {"error": str(e)}
+            writer.write((json.dumps(reply) + "\n").encode())
+            await writer.drain()
+        writer.close()
+    async def HandleRequest(self, request: dict) -> dict:
+        """Performs a single request of the JSON-lines protocol
+
+        Args:
+            request (dict): Request with a "cmd" key and its arguments.
+
+        Returns:
+            dict: Reply for the client
+        """
+        command = request["cmd"]
+        if command == "new":
+            session = self.CreateSession(request.get("size", 6), request.get("difficulty", 3))
+            return session.State()
+        elif command == "state":
+            return self.GetSession(request["id"]).State()
+        elif command == "move":
+            movement = TileMovement([Tile(int(x), int(y)) for x, y in request["steps"]])
+            valid = await self.PlayMove(request["id"], movement)
+            return {"valid": valid, **self.GetSession(request["id"]).State()}
+        elif command == "ai":
+            movement = await self.PlayAI(request["id"], request.get("depth"))
+            steps = [[step.x, step.y] for step in movement.steps] if movement else []
+            return {"movement": steps, **self.GetSession(request["id"]).State()}
+        elif command == "close":
+            self.CloseSession(request["id"])
+            return {"closed": request["id"]}
+        assert False, _red + f"Unknown command '{command}'" + _white
@@ -0,0 +1,261 @@
+from __future__ import annotations
+from collections import deque
+from functools import wraps
+from threading import Lock, local, get_ident
+from time import perf_counter
+import json
+import os
+
+_red = "\033[31m"
+_blue = "\033[34m"
+_white = "\033[37m"
+_yellow = "\033[33m"
+_green = "\033[32m"
+_cyan = "\033[96m"
+
+"""
+    Per turn timing spans, to find where the time of a slow turn goes
+
+    Every span opened while a turn is running becomes part of that turn's tree: spans nest inside the
+    span open on the same thread, and spans opened on other threads (the robot worker of TurnPipeline)
+    hang from the turn itself. Spans of work running in other processes (background searches) are not
+    seen, only the time spent waiting for them. Recording is off until Open or Enable is called, and
+    instrumented functions then only pay one attribute check.
+
+    Formats:
+        jsonl       One line per turn with its span tree, written when the turn ends.
+        chrome      Trace event format, one complete event per span as soon as it ends, open it in
+                    chrome://tracing or ui.perfetto.dev.
+
+    Usage:
+        tracer.Open(METRICS_PATH)
+        with tracer.Turn("ai"):
+            with tracer.Span("capture"):
+                frame = rClient.capture()
+        print(tracer.Summary())
+"""
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, ".."))
+METRICS_PATH = os.path.join(PROJECT_ROOT, "METRICS", "turns.jsonl")
+
+def _Percentile(values: list[float], q: float) -> float:
+    """Linear interpolation percentile of sorted values"""
+    position = (len(values) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (position - low)
+class Span:
+    """Timed section of a turn"""
+    __slots__ = ("name", "args", "start", "end", "thread", "children")
+    def __init__(self, name: str, args: dict = None):
+        self.name = name
+        self.args = args or {}
+        self.start = perf_counter()
+        self.end = None
+        self.thread = get_ident()
+        self.children = []
+    def __repr__(self):
+        return f"Span({self.name}, [{self.Duration():.4f}]s, {len(self.children)} children)"
+    def Duration(self) -> float:
+        """Returns the seconds the span took, or has taken so far if still open
+
+        Returns:
+            float:
+        """
+        return (perf_counter() if self.end is None else self.end) - self.start
+    def ToDict(self, origin: float) -> dict:
+        """Converts the span and its closed children to a JSON serializable tree
+
+        Args:
+            origin (float): perf_counter value used as time 0.
+
+        Returns:
+            dict: Name, start and duration in seconds, thread, arguments and children
+        """
+        return {
+            "name": self.name,
+            "start": round(self.start - origin, 6),
+            "duration": round(self.Duration(), 6),
+            "thread": self.thread,
+            "args": self.args,
+            "children": [child.ToDict(origin) for child in self.children if child.end is not None],
+        }
+class _Scope:
+    """Context manager opening and closing one span"""
+    __slots__ = ("tracer", "name", "args", "root", "span")
+    def __init__(self, tracer: Tracer, name: str, args: dict, root: bool):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.root = root
+        self.span = None
+    def __enter__(self) -> Span:
+        if self.tracer.enabled:
+            self.span = self.tracer._Open(self.name, self.args, self.root)
+        return self.span
+    def __exit__(self, *exception):
+        if self.span is not None:
+            self.tracer._Close(self.span)
+        return False
+class Tracer:
+    """Collects span trees per turn, exports them and keeps recent durations for percentile summaries"""
+    def __init__(self, samples = 1000, maxChildren = 256, debug = False):
+        """Initializes a disabled tracer
+
+        Args:
+            samples (int, optional): Durations kept per span name for the summary. Defaults to 1000.
+            maxChildren (int, optional): Children kept per span, later ones are only summarized, so watching a long human turn stays bounded. Defaults to 256.
+        """
+        assert 0 < samples, _red + f"At least one sample must be kept per span" + _white
+        self.enabled = False
+        self.samples = samples
+        self.maxChildren = maxChildren
+        self.dropped = 0
+        self.debug = debug
+        self.durations: dict[str, deque] = {}
+        self.origin = perf_counter()
+        self.turn: Span = None
+        self.turns = 0
+        self.path = None
+        self.format = None
+        self._file = None
+        self._local = local()
+        self._lock = Lock()
+    def Open(self, path: str = METRICS_PATH, format = "jsonl"):
+        """Starts recording and appending every turn to a file
+
+        Args:
+            path (str, optional): File to append to. Defaults to METRICS_PATH.
+            format (str, optional): "jsonl" or "chrome". Defaults to "jsonl".
+        """
+        assert format in ["jsonl", "chrome"], _red + f"Unknown metrics format '{format}', must be 'jsonl' or 'chrome'" + _white
+        self.Close()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, "a")
+        if format == "chrome" and new:
+            self._file.write("[\n") #The closing bracket is optional in the trace event format, so the file can keep growing
+        self.path, self.format = path, format
+        self.enabled = True
+        if self.debug: print(_green + f"Recording turn metrics to {path} as '{format}'" + _white)
+    def Enable(self, enabled = True):
+        """Starts or stops recording without a file, only the summary is kept"""
+        self.enabled = enabled
+    def Close(self):
+        """Stops writing to the metrics file, recording continues in memory"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+    def Span(self, name: str, **args) -> _Scope:
+        """Times a section, nested in the span open on this thread or else in the current turn
+
+        Args:
+            name (str): Name of the section, spans with the same name are summarized together.
+
+        Returns:
+            _Scope: Context manager yielding the Span, or None if not recording
+        """
+        return _Scope(self, name, args, False)
+    def Turn(self, name: str, **args) -> _Scope:
+        """Times a turn, the root of every span opened until it ends
+
+        Args:
+            name (str): Name of the turn, for example the game loop state.
+
+        Returns:
+            _Scope: Context manager yielding the Span, or None if not recording
+        """
+        return _Scope(self, name, args, True)
+    def _Stack(self) -> list[Span]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+    def _Open(self, name: str, args: dict, root: bool) -> Span:
+        stack = self._Stack()
+        span = Span(name, args)
+        with self._lock:
+            if root and self.turn is None:
+                self.turn = span
+            else:
+                parent = stack[-1] if stack else self.turn
+                if parent is not None and len(parent.children) < self.maxChildren:
+                    parent.children.append(span)
+                elif parent is not None:
+                    self.dropped += 1
+        stack.append(span)
+        return span
+    def _Close(self, span: Span):
+        span.end = perf_counter()
+        stack = self._Stack()
+        if stack and stack[-1] is span:
+            stack.pop()
+        with self._lock:
+            name = f"turn.{span.name}" if span is self.turn else span.name
+            if name not in self.durations:
+                self.durations[name] = deque(maxlen=self.samples)
+            self.durations[name].append(span.end - span.start)
+            if self._file is not None and self.format == "chrome":
+                event = {"name": name, "ph": "X", "ts": round((span.start - self.origin) * 1e6), "dur": round((span.end - span.start) * 1e6), "pid": os.getpid(), "tid": span.thread, "args": span.args}
+                self._file.write(json.dumps(event) + ",\n")
+            if span is self.turn:
+                self.turns += 1
+                self.turn = None
+                if self._file is not None and self.format == "jsonl":
+                    self._file.write(json.dumps({"turn": self.turns, **span.ToDict(self.origin)}) + "\n")
+                if self._file is not None:
+                    self._file.flush()
+                if self.debug: print(_green + f"Turn [{self.turns}] '{span.name}' took [{span.end - span.start:.3f}]s" + _white)
+    def Percentiles(self, name: str, percentiles: list[float] = [50, 90, 99]) -> list[float]:
+        """Returns percentiles of the recent durations of a span
+
+        Args:
+            name (str): Name of the span, turns are named "turn.<name>".
+            percentiles (list[float], optional): Percentiles to compute. Defaults to [50, 90, 99].
+
+        Returns:
+            list[float]: Seconds for each percentile, empty if the span was never recorded
+        """
+        with self._lock:
+            values = sorted(self.durations.get(name, []))
+        if not values:
+            return []
+        return [_Percentile(values, q) for q in percentiles]
+    def Summary(self) -> str:
+        """Returns count, mean and percentiles of every span, slowest total first
+
+        Returns:
+            str: One line per span name, times in milliseconds
+        """
+        with self._lock:
+            durations = {name: sorted(values) for name, values in self.durations.items()}
+        summary = f"Telemetry over [{self.turns}] turns (ms, last {self.samples} samples per span):\n"
+        summary += f"  {'span':<32}{'count':>7}{'mean':>10}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}\n"
+        for name, values in sorted(durations.items(), key=lambda item: -sum(item[1])):
+            p50, p90, p99 = (_Percentile(values, q) * 1000 for q in [50, 90, 99])
+            summary += f"  {name:<32}{len(values):>7}{sum(values) / len(values) * 1000:>10.2f}{p50:>10.2f}{p90:>10.2f}{p99:>10.2f}{values[-1] * 1000:>10.2f}\n"
+        return summary
+
+tracer = Tracer()
+
+def Traced(name: str = None):
+    """Decorator timing every call of a function as a span of the shared tracer, recursive calls are part of the outermost one
+
+    Args:
+        name (str, optional): Name of the span. Defaults to the function's qualified name.
+    """
+    def Decorator(function):
+        spanName = name or function.__qualname__
+        @wraps(function)
+        def Wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return function(*args, **kwargs)
+            stack = tracer._Stack()
+            if stack and stack[-1].name == spanName:
+                return function(*args, **kwargs)
+            with tracer.Span(spanName):
+                return function(*args, **kwargs)
+        return Wrapper
+    return Decorator
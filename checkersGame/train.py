@@ -0,0 +1,131 @@
+from __future__ import annotations
+from .board import Board
+from .minimax import MiniMax
+from .value import ValueNetwork, EncodeBatch, EncodeArrays, WEIGHTS_PATH
+from random import Random
+from time import perf_counter
+import argparse
+import json
+import numpy
+import os
+
+_red = "\033[31m"
+_blue = "\033[34m"
+_white = "\033[37m"
+_yellow = "\033[33m"
+_green = "\033[32m"
+_cyan = "\033[96m"
+
+"""
+    Trains the value network on self-play records
+
+    Every position of a game is labeled with the final result for player 1 (1, -1, or 0 for a
+    stalemate), the network learns to predict it. A few random movements at the start of every game
+    keep the records from repeating the same lines.
+
+    Usage:
+        python -m checkersGame.train --games 1200 --depth 1 --epochs 15
+        python -m checkersGame.train --shards SELFPLAY --epochs 15        #Games from checkersGame.selfplay
+"""
+
+def SelfPlay(games: int, depth = 1, size = 6, randomMoves = 4, seed = 0, network: ValueNetwork = None, debug = False) -> tuple[numpy.ndarray, numpy.ndarray]:
+    """Plays MiniMax against itself and records every position with the game's result
+
+    Args:
+        games (int): Ammount of games to play.
+        depth (int, optional): Depth of search. Defaults to 1.
+        size (int, optional): Size of the board (N). Defaults to 6.
+        randomMoves (int, optional): Random movements played at the start of every game. Defaults to 4.
+        seed (int, optional): Seed of the random movements. Defaults to 0.
+        network (ValueNetwork, optional): Evaluation used by the search, for training on its own games. Defaults to None.
+
+    Returns:
+        tuple[numpy.array, numpy.array]: Encoded positions and the result of their game for player 1
+    """
+    random = Random(seed)
+    positions, results = [], []
+    for game in range(games):
+        board = Board(1, size)
+        board.SetBoard()
+        boards = []
+        while not board.IsCheckmate() and not board.IsStalemate():
+            boards.append(board)
+            if len(boards) <= randomMoves:
+                movements = [movement for row in board.BuildMovementsTable() for moves in row for movement in moves]
+                movement = random.choice(movements)
+            else:
+                movement, _ = MiniMax(board, depth, network=network)
+            boardClone = board.Clone()
+            boardClone.MoveTile(movement, validate=False)
+            boardClone.ChangeTurn()
+            board = boardClone
+        #Stalemate by stale turns is a draw, else the player to move has no tiles or movements and loses
+        result = 0 if board.staleTurns > 40 else -board.turn
+        positions.append(EncodeBatch(boards))
+        results.append(numpy.full(len(boards), result, dtype=numpy.float32))
+        if debug: print(_green + f"Game [{game + 1}/{games}] ended after [{len(boards)}] movements with result [{result}]" + _white)
+    return numpy.concatenate(positions), numpy.concatenate(results)
+def LoadShards(directory: str, validation = 0.0) -> tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+    """Loads the positions written by checkersGame.selfplay, split by game so no game is in both sets
+
+    Args:
+        directory (str): Directory with the manifest and shards.
+        validation (float, optional): Fraction of games kept for validation. Defaults to 0.0.
+
+    Returns:
+        tuple[numpy.array, numpy.array, numpy.array, numpy.array]: Encoded training positions and results, then validation positions and results
+    """
+    with open(os.path.join(directory, "manifest.json")) as file:
+        manifest = json.load(file)
+    assert manifest["shards"], _red + f"No shards in {directory}" + _white
+    train, held = [], []
+    for shard in manifest["shards"]:
+        data = numpy.load(os.path.join(directory, shard["file"]))
+        X = EncodeArrays(data["boards"], data["turns"])
+        y = data["results"].astype(numpy.float32)
+        #Every n-th game is kept for validation
+        kept = data["games"] % max(1, round(1 / validation)) == 0 if validation > 0 else numpy.zeros(len(y), dtype=bool)
+        train.append((X[~kept], y[~kept]))
+        held.append((X[kept], y[kept]))
+    return (
+        numpy.concatenate([X for X, _ in train]), numpy.concatenate([y for _, y in train]),
+        numpy.concatenate([X for X, _ in held]), numpy.concatenate([y for _, y in held]),
+    )
+def Evaluate(network: ValueNetwork, X, y) -> tuple[float, float]:
+    """Measures a network on labeled positions
+
+    Returns:
+        tuple[float, float]: Mean squared error, and fraction of decided games whose winner is predicted
+    """
+    values = network.Evaluate(X)
+    decided = y != 0
+    accuracy = float((numpy.sign(values[decided]) == y[decided]).mean()) if decided.any() else 0.0
+    return float(((values - y) ** 2).mean()), accuracy
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Trains the value network on self-play records")
+    parser.add_argument("--games", type=int, default=500)
+    parser.add_argument("--depth", type=int, default=1)
+    parser.add_argument("--size", type=int, default=6)
+    parser.add_argument("--random", type=int, default=4, help="Random movements at the start of every game")
+    parser.add_argument("--epochs", type=int, default=15)
+    parser.add_argument("--hidden", type=int, nargs="+", default=[32, 16])
+    parser.add_argument("--validation", type=float, default=0.1, help="Fraction of games kept for validation")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=str, default=WEIGHTS_PATH)
+    parser.add_argument("--shards", type=str, default=None, help="Directory written by checkersGame.selfplay, used instead of playing games")
+    args = parser.parse_args()
+    start = perf_counter()
+    if args.shards is not None:
+        X, y, Xv, yv = LoadShards(args.shards, args.validation)
+        print(f"Loaded [{len(y)}] training and [{len(yv)}] validation positions in [{perf_counter() - start:.1f}]s")
+    else:
+        validationGames = max(1, int(args.games * args.validation))
+        X, y = SelfPlay(args.games - validationGames, args.depth, args.size, args.random, args.seed)
+        Xv, yv = SelfPlay(validationGames, args.depth, args.size, args.random, args.seed + 1)
+        print(f"Recorded [{len(y)}] training and [{len(yv)}] validation positions in [{perf_counter() - start:.1f}]s")
+    network = ValueNetwork(args.size, args.hidden, path=None, seed=args.seed)
+    losses = network.Train(X, y, args.epochs, seed=args.seed)
+    print(f"Training loss [{losses[-1]:.4f}], validation loss and accuracy {Evaluate(network, Xv, yv)}")
+    network.Save(args.out)
+    print(f"Saved weights to {args.out}")
@@ -0,0 +1,197 @@
+from __future__ import annotations
+from .board import Board
+import numpy
+import os
+
+_red = "\033[31m"
+_blue = "\033[34m"
+_white = "\033[37m"
+_yellow = "\033[33m"
+_green = "\033[32m"
+_cyan = "\033[96m"
+
+"""
+    Small value network in plain NumPy, estimates who is winning a position
+
+    Positions are encoded as 4 planes over the playing area (men and kings of player 1, men and kings of
+    player -1) plus the player to move, and go through a fully connected network with a tanh output:
+    1 means player 1 wins, -1 means player -1 wins. Evaluating many positions in one call costs about the
+    same as one, so searches should collect their leaves and evaluate them together, see MiniMax(network=).
+
+    Usage:
+        network = ValueNetwork()                        #Loads WEIGHTS_PATH if it exists
+        values = network.EvaluateBoards(boards)
+        python -m checkersGame.train --games 200        #Trains the weights from self-play
+"""
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+WEIGHTS_PATH = os.path.join(BASE_DIR, "weights", "value6.npz")
+
+_Planes = numpy.array([1, 2, -1, -2], dtype=numpy.int8)
+
+def Encode(board: Board) -> numpy.ndarray:
+    """Encodes a board as a flat tensor, cemetery columns are left out
+
+    Args:
+        board (Board): Board to encode.
+
+    Returns:
+        numpy.array: float32 array of (4 * N * N + 1) values, the planes followed by the player to move
+    """
+    IDs = numpy.array([[tile.ID for tile in row[1:-1]] for row in board.board], dtype=numpy.int8)
+    planes = (IDs[None] == _Planes[:, None, None]).astype(numpy.float32)
+    return numpy.append(planes.ravel(), numpy.float32(board.turn))
+def EncodeBatch(boards: list[Board]) -> numpy.ndarray:
+    """Encodes many boards at once
+
+    Args:
+        boards (list[Board]): Boards of the same size.
+
+    Returns:
+        numpy.array: float32 array of (len(boards), 4 * N * N + 1)
+    """
+    return numpy.stack([Encode(board) for board in boards])
+def EncodeArrays(boards, turns) -> numpy.ndarray:
+    """Encodes positions stored as tile IDs, such as self-play shards, same result as EncodeBatch
+
+    Args:
+        boards (numpy.array): (B, N, N+2) tile IDs, cemetery columns included.
+        turns (numpy.array): (B) player to move.
+
+    Returns:
+        numpy.array: float32 array of (B, 4 * N * N + 1)
+    """
+    boards = numpy.asarray(boards, dtype=numpy.int8)
+    planes = (boards[:, None, :, 1:-1] == _Planes[None, :, None, None]).astype(numpy.float32)
+    return numpy.concatenate([planes.reshape(len(boards), -1), numpy.asarray(turns, dtype=numpy.float32).reshape(-1, 1)], axis=1)
+class ValueNetwork:
+    """Fully connected network with ReLU hidden layers and a tanh output, trained with Adam on squared error"""
+    def __init__(self, size = 6, hidden: list[int] = [32, 16], scale = 100, path: str = WEIGHTS_PATH, seed = 0, debug = False):
+        """Initializes random weights, loading them from a file if it exists
+
+        Args:
+            size (int, optional): Size of the boards evaluated (N). Defaults to 6.
+            hidden (list[int], optional): Width of each hidden layer. Defaults to [32, 16].
+            scale (int, optional): Score given to a certain win when used by MiniMax. Defaults to 100.
+            path (str, optional): Weights file, None to start from random weights. Defaults to WEIGHTS_PATH.
+            seed (int, optional): Seed of the random weights. Defaults to 0.
+        """
+        assert 0 < scale, _red + f"Scale must be greater than 0" + _white
+        self.size = size
+        self.scale = scale
+        self.debug = debug
+        self.inputs = 4 * size * size + 1
+        random = numpy.random.default_rng(seed)
+        widths = [self.inputs] + list(hidden) + [1]
+        self.weights = [(random.standard_normal((a, b)) * numpy.sqrt(2 / a)).astype(numpy.float32) for a, b in zip(widths[:-1], widths[1:])]
+        self.biases = [numpy.zeros(b, dtype=numpy.float32) for b in widths[1:]]
+        if path is not None and os.path.exists(path):
+            self.Load(path)
+    def __repr__(self):
+        return f"ValueNetwork({[W.shape[1] for W in self.weights[:-1]]})"
+    def Evaluate(self, X) -> numpy.ndarray:
+        """Evaluates a batch of encoded positions
+
+        Args:
+            X (numpy.array): (B, inputs) encoded positions, see EncodeBatch.
+
+        Returns:
+            numpy.array: float32 array of (B) values from -1 to 1, positive when player 1 is winning
+        """
+        h = numpy.asarray(X, dtype=numpy.float32)
+        for W, b in zip(self.weights[:-1], self.biases[:-1]):
+            h = numpy.maximum(h @ W + b, 0)
+        return numpy.tanh(h @ self.weights[-1] + self.biases[-1])[:, 0]
+    def EvaluateBoards(self, boards: list[Board]) -> numpy.ndarray:
+        """Evaluates many boards with a single pass through the network
+
+        Args:
+            boards (list[Board]): Boards to evaluate.
+
+        Returns:
+            numpy.array: float32 array of values from -1 to 1, positive when player 1 is winning
+        """
+        if not boards:
+            return numpy.zeros(0, dtype=numpy.float32)
+        return self.Evaluate(EncodeBatch(boards))
+    def Train(self, X, y, epochs = 20, batch = 256, rate = 1e-3, seed = 0) -> list[float]:
+        """Fits the network to positions and their outcomes with minibatch Adam
+
+        Args:
+            X (numpy.array): (M, inputs) encoded positions.
+            y (numpy.array): (M) targets from -1 to 1, usually the final result of the game for player 1.
+            epochs (int, optional): Passes over the data. Defaults to 20.
+            batch (int, optional): Positions per update. Defaults to 256.
+            rate (float, optional): Learning rate. Defaults to 1e-3.
+            seed (int, optional): Seed of the shuffling. Defaults to 0.
+
+        Returns:
+            list[float]: Mean squared error of every epoch
+        """
+        X = numpy.asarray(X, dtype=numpy.float32)
+        y = numpy.asarray(y, dtype=numpy.float32).reshape(-1)
+        assert X.shape == (len(y), self.inputs), _red + f"Positions must have shape {(len(y), self.inputs)}" + _white
+        random = numpy.random.default_rng(seed)
+        parameters = self.weights + self.biases
+        m = [numpy.zeros_like(p) for p in parameters]
+        v = [numpy.zeros_like(p) for p in parameters]
+        beta1, beta2, step, losses = 0.9, 0.999, 0, []
+        for epoch in range(epochs):
+            order = random.permutation(len(y))
+            total = 0.0
+            for start in range(0, len(y), batch):
+                index = order[start:start + batch]
+                # Forward pass, keeping every activation
+                activations = [X[index]]
+                for W, b in zip(self.weights[:-1], self.biases[:-1]):
+                    activations.append(numpy.maximum(activations[-1] @ W + b, 0))
+                out = numpy.tanh(activations[-1] @ self.weights[-1] + self.biases[-1])[:, 0]
+                error = out - y[index]
+                total += float((error ** 2).sum())
+                # Backward pass
+                delta = (2 * error * (1 - out ** 2) / len(index))[:, None]
+                gradW, gradB = [], []
+                for layer in reversed(range(len(self.weights))):
+                    gradW.insert(0, activations[layer].T @ delta)
+                    gradB.insert(0, delta.sum(axis=0))
+                    if layer > 0:
+                        delta = (delta @ self.weights[layer].T) * (activations[layer] > 0)
+                # Adam update
+                step += 1
+                for p, g, mi, vi in zip(parameters, gradW + gradB, m, v):
+                    mi *= beta1
+                    mi += (1 - beta1) * g
+                    vi *= beta2
+                    vi += (1 - beta2) * g ** 2
+                    p -= rate * (mi / (1 - beta1 ** step)) / (numpy.sqrt(vi / (1 - beta2 ** step)) + 1e-8)
+            losses.append(total / len(y))
+            if self.debug: print(_green + f"Epoch [{epoch + 1}/{epochs}] loss [{losses[-1]:.4f}]" + _white)
+        return losses
+    def Save(self, path: str = WEIGHTS_PATH):
+        """Stores the weights in a compressed file
+
+        Args:
+            path (str, optional): File to write. Defaults to WEIGHTS_PATH.
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        layers = {f"W{i}": W.astype(numpy.float16) for i, W in enumerate(self.weights)}
+        layers.update({f"b{i}": b.astype(numpy.float16) for i, b in enumerate(self.biases)})
+        with open(path, "wb") as file:
+            numpy.savez_compressed(file, size=self.size, scale=self.scale, **layers)
+        if self.debug: print(_green + f"Saved value network to {path}" + _white)
+    def Load(self, path: str = WEIGHTS_PATH):
+        """Loads the weights from a file, files made for a different board size are ignored with a warning
+
+        Args:
+            path (str, optional): File to read. Defaults to WEIGHTS_PATH.
+        """
+        data = numpy.load(path)
+        if int(data["size"]) != self.size:
+            #Always reported, the network would otherwise play with its random weights unnoticed
+            print(_yellow + f"Ignoring value network {path} made for board size [{int(data['size'])}], using random weights for size [{self.size}]" + _white)
+            return
+        layers = len([name for name in data.files if name.startswith("W")])
+        self.weights = [data[f"W{i}"].astype(numpy.float32) for i in range(layers)]
+        self.biases = [data[f"b{i}"].astype(numpy.float32) for i in range(layers)]
+        self.scale = int(data["scale"])
+        if self.debug: print(_green + f"Loaded value network {repr(self)} from {path}" + _white)
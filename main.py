@@ -1,12 +1,11 @@
+from checkersBot.subsystems import Subsystems
+systems = Subsystems()
 from checkersGame.board import Board, Tile
-from checkersGame.minimax import MiniMax
-from checkersBot.control import Robot
-from checkersBot.detection import FindBoardCoords, ReadBoard
 from checkersBot.color import Color
-from checkersBot.input import *
-from mlf_api import RobotClient
-from re import findall
-import speech_recognition as sr
+from checkersBot.input import GetInput
+from checkersBot.pipeline import TurnPipeline
+from checkersGame.telemetry import tracer, METRICS_PATH
+from checkersGame.gameloop import GameLoop, SETUP, VERIFY, CORRECTION, HUMAN, AI, GAMEOVER
 
 _red = "\033[31m"
 _blue = "\033[34m"
@@ -16,131 +15,188 @@ _green = "\033[32m"
 _cyan = "\033[96m"
 
 RC = None
+pipeline = None
+loop = None
+watcher = None
+listener = None
 boardCoords = None
 virtualBoard = Board(0)
 prevBoard = Board(0)
 currentBoard = Board(0)
 playerColor = Color(35, 85, 120)
 AIColor = Color(110, 250, 80)
+minConfidence = 0.8
+turnKeywords = ["turn", "finished", "done", "ready"]
+stopKeywords = ["stop game"]
 debug = True
 
+def OnKeyword(keyword: str, text: str):
+    """Delivers voice keywords to the game, ending the human's turn or the session"""
+    if keyword in turnKeywords and watcher is not None:
+        watcher.Trigger()
+    elif keyword in stopKeywords and loop is not None:
+        loop.Stop()
 def Start():
-    """Initial loop"""
-    global markerColor, playerColor, AIColor, RC, virtualBoard, debug, boardCoords
-    command = GetInput("str", "Select action: \n")
-    if command == "Setup":
-        print(_yellow + f"Initiating SETUP" + _white)
-        rID = "10.200.145.10" + input("RC ID number: \n")
-        client = RobotClient(rID)
-        RC = Robot(client, True)
-        if GetInput("bool", "Select new color values? (Y/N): \n"):
-            markerColor = GetInput("color", "Insert board corner color (H, S, V): \n")
-            playerColor = GetInput("color", "Insert player color (H, S, V): \n")
-            AIColor = GetInput("color", "Insert AI color (H, S, V): \n")
-        debug = GetInput("bool", "Enable debug information? (Y/N): \n")
-        print(_yellow + f"Finished SETUP" + _white)
-        Start()
-    elif command == "Test ROB":
-        frame = RC.MoveAndCapture(debug=True)
-        boardCoords = FindBoardCoords(frame, markerColor, 6, 10, 100, debug=True)
-        RC.TestMovement(boardCoords, True)
-        Start()
-    elif command == "Test MIC":
-        voiceInput = FindVoiceInput(["hear me", "test", "wiggle", "hello"], debug=True)
-        if voiceInput:
-            RC.Emote(debug=True)
-        Start()
-    elif command == "Test CAM":
-        RC.MoveAndCapture(debug=True)
-        Start()
-    elif command == "Play":
-        Main()
-        Start()
-    else:
-        Start()
-def Main():
-    global playerColor, AIColor, RC, virtualBoard, debug, boardCoords
-    """Main loop"""
-    if virtualBoard.turn == 0:
-        boardCoords = FindBoardCoords(RC.MoveAndCapture(debug), debug=debug)
-        prevBoard.board = ReadBoard(RC.MoveAndCapture(debug=debug), playerColor, AIColor, boardCoords, debug=debug)
-        virtualBoard.SetBoard(debug)
-        for movement in RC.MoveToBoard(prevBoard, virtualBoard, debug):
-            RC.MoveRobot(movement, debug=debug)
-        Main()
-    else:
-        prevBoard.board = ReadBoard(RC.MoveAndCapture(debug=debug), playerColor, AIColor, boardCoords, debug=debug)
-        for i in [-2, -1, 1, -2]:
-            if  (
-                prevBoard.GetAmmountOf(i, False, debug) + prevBoard.GetAmmountOf(i, True, debug) != 
-                virtualBoard.GetAmmountOf(i, False, debug) + virtualBoard.GetAmmountOf(i, True, debug)
-            ):
-                RC.Emote("no", 2, 1.5, debug=debug)
-                Main()
-        if virtualBoard != prevBoard:
-            RC.Emote("no", debug=debug)
-            for movement in RC.MoveToBoard(prevBoard, virtualBoard, debug):
-                RC.MoveRobot(movement, debug=debug)
-            Main()
-        if virtualBoard.turn == 1:
-            if virtualBoard.IsCheckmate(debug) or virtualBoard.IsStalemate(20, debug=debug):
-                RC.Emote("dance", 30, debug=debug)
-                virtualBoard.turn = 0
-                Main()
-            RC.Emote()
-            #voiceInput = False
-            #while voiceInput == False:
-            #    voiceInput = FindVoiceInput(["turn, finished, done, ready"], debug=debug)
-            input("Press enter to continue")
-            correct = False
-            while not correct:
-                currentBoard.board = ReadBoard(RC.MoveAndCapture(debug=debug), playerColor, AIColor, boardCoords, debug=debug)
-                for i in [-2, -1, 1, -2]:
-                    if  (
-                        prevBoard.GetAmmountOf(i, False, debug) + prevBoard.GetAmmountOf(i, True, debug) != 
-                        virtualBoard.GetAmmountOf(i, False, debug) + virtualBoard.GetAmmountOf(i, True, debug)
-                    ):
-                        RC.Emote("no", 2, 1.5, debug=debug)
-                        input("Press enter to retry")
-                    else:
-                        correct = True
-            movement = virtualBoard.FindMovement(currentBoard, debug)
-            if movement is not False:
-                if virtualBoard.MoveTile(movement, debug=debug) is not False:
-                    virtualBoard.MoveTile(movement, debug=debug)
-                    virtualBoard.ChangeTurn(debug)
-                    RC.Emote("yes", debug=debug)
-                    Main()
-            virtualBoard.board = prevBoard.board
-            RC.Emote("no", debug=debug)
-            for movement in RC.MoveToBoard(currentBoard, prevBoard, debug):
-                RC.MoveRobot(movement, debug=debug)
+    """Initial loop, runs commands until Quit"""
+    global markerColor, playerColor, AIColor, RC, virtualBoard, debug, boardCoords, pipeline, listener
+    while True:
+        command = GetInput("str", "Select action: \n")
+        if command == "Setup":
+            print(_yellow + f"Initiating SETUP" + _white)
+            rID = input("RC ID number (sim for a simulated robot): \n")
+            RC = systems.SimulatedRobot() if rID == "sim" else systems.Robot("10.200.145.10" + rID)
+            if GetInput("bool", "Select new color values? (Y/N): \n"):
+                markerColor = GetInput("color", "Insert board corner color (H, S, V): \n")
+                playerColor = GetInput("color", "Insert player color (H, S, V): \n")
+                AIColor = GetInput("color", "Insert AI color (H, S, V): \n")
+                #A stored color table would take precedence over the colors just entered
+                systems.Calibration().ResetColors()
+            debug = GetInput("bool", "Enable debug information? (Y/N): \n")
+            if GetInput("bool", "Record turn telemetry? (Y/N): \n"):
+                tracer.Open(METRICS_PATH)
+            pipeline = TurnPipeline(RC, debug=debug)
+            systems.debug = debug
+            if systems.Available("speech") and GetInput("bool", "Confirm turns by voice? (Y/N): \n"):
+                listener = systems.Listener()
+                listener.AddKeywords(turnKeywords + stopKeywords)
+                listener.OnKeyword(OnKeyword)
+            if debug:
+                systems.Vision().SetDisplay(GetInput("bool", "Display debug images while they are archived? (Y/N): \n"))
+            print(_yellow + f"Finished SETUP" + _white)
+            print(systems.Report())
+        elif command == "Test ROB":
+            frame = RC.MoveAndCapture(fresh=True, debug=True)
+            boardCoords = systems.Calibration().Update(frame, force=True, debug=True)
+            RC.TestMovement(boardCoords[0], True)
+        elif command == "Test MIC":
+            voiceInput = systems.Speech().FindVoiceInput(["hear me", "test", "wiggle", "hello"], debug=True)
+            if voiceInput:
+                RC.Emote(debug=True)
+        elif command == "Test CAM":
+            RC.MoveAndCapture(fresh=True, debug=True)
+        elif command == "Report":
+            print(systems.Report())
+            if loop is not None:
+                print(loop.Report())
+            if tracer.enabled:
+                print(tracer.Summary())
+        elif command == "Play":
             Main()
-        else:
-            if virtualBoard.IsCheckmate(debug) or virtualBoard.IsStalemate(debug=debug):
-                RC.Emote("no", 30, debug=debug)
-                virtualBoard.turn = 0
-                Main()
-            movement, _ = MiniMax(virtualBoard, debug=debug)
-            movement3D = RC.Movement2Dto3D(movement, debug)
-            RC.MoveRobot(movement3D, debug=debug)
-            virtualBoard.MoveTile(movement, debug=debug)
-            currentBoard.board = ReadBoard(RC.MoveAndCapture(debug=debug), playerColor, AIColor, boardCoords, debug=debug)
-            for i, j in [(x, y) for x in range(0, virtualBoard.height) for y in range(0, virtualBoard.height)]:
-                j += 1
-                if virtualBoard.board[i][j] == currentBoard.board[i][j]:
-                    continue
-                else:
-                    RC.Emote("no", debug=debug)
-                    virtualBoard.MoveTile(movement.Reversed(), debug=debug)
-                    for move in RC.MoveToBoard(currentBoard, virtualBoard, debug):
-                        RC.MoveRobot(move, debug=debug)
-                    Main()
-            RC.Emote("yes", debug=debug)
-            for move in RC.MoveToBoard(currentBoard, virtualBoard, debug):
-                RC.MoveRobot(move, debug=debug)
-            RC.MoveToBoard(currentBoard, virtualBoard)
-            virtualBoard.ChangeTurn(debug)
-            print(virtualBoard)
-            Main()
-Start()
\ No newline at end of file
+        elif command == "Quit":
+            if pipeline is not None:
+                pipeline.Shutdown()
+            tracer.Close()
+            if listener is not None:
+                listener.Stop()
+            break
+def Setup(loop: GameLoop) -> str:
+    """Calibrates the board and the arm, then sets the starting position on the physical board"""
+    global boardCoords
+    ReadBoard = systems.Calibration().Read
+    pipeline.Sync()
+    with RC.Parked(debug):
+        frame = RC.MoveAndCapture(debug=debug)
+        boardCoords = systems.Calibration().Update(frame, debug=debug)
+        RC.poses.Build(boardCoords[0])
+        prevBoard.board = ReadBoard(frame, playerColor, AIColor, debug=debug)
+    virtualBoard.SetBoard(debug)
+    RC.Relocate(prevBoard, virtualBoard, debug=debug)
+    #The board now holds the starting position, sample it to build the color table under the current lighting
+    systems.Calibration().CalibrateColors(RC.MoveAndCapture(debug=debug), [[tile.ID for tile in row] for row in virtualBoard.board], debug=debug)
+    return "ready"
+def Verify(loop: GameLoop) -> str:
+    """Reads the board at the start of a turn, only acts on the reading if it confidently contradicts the known board"""
+    ReadProbabilities = systems.Calibration().ReadProbabilities
+    IDsFromProbabilities, TilesFromArray = systems.Vision().IDsFromProbabilities, systems.Vision().TilesFromArray
+    #Queued after any emote still running, a background search keeps going meanwhile
+    probabilities = ReadProbabilities(pipeline.Capture(debug).result(), playerColor, AIColor, debug=debug)
+    prevBoard.board = TilesFromArray(IDsFromProbabilities(probabilities))
+    index, confidence = systems.Resolver().ResolveBoard([virtualBoard, prevBoard], probabilities, debug=debug)
+    if index != 0 and confidence >= minConfidence:
+        return "mismatch"
+    prevBoard.board = virtualBoard.CreateClone(debug)
+    return "human" if virtualBoard.turn == 1 else "ai"
+def Correction(loop: GameLoop) -> str:
+    """Moves the pieces back to the known board, if pieces are missing the human has to fix it"""
+    #Readings never contain kings, so pieces are counted per player by sign, cemetery included
+    for player in [1, -1]:
+        if  (
+            sum(tile.ID * player > 0 for row in prevBoard.board for tile in row) !=
+            sum(tile.ID * player > 0 for row in virtualBoard.board for tile in row)
+        ):
+            pipeline.Robot(RC.Emote, "no", 2, 1.5, debug=debug).result()
+            return "retry"
+    pipeline.Robot(RC.Emote, "no", debug=debug)
+    pipeline.Robot(RC.Relocate, prevBoard, virtualBoard, debug=debug).result()
+    return "corrected"
+def HumanTurn(loop: GameLoop) -> str:
+    """Parks the arm and waits for the human to play a legal movement, saying a turn keyword reads the board right away"""
+    global watcher
+    ReadProbabilities = systems.Calibration().ReadProbabilities
+    if virtualBoard.IsCheckmate(debug) or virtualBoard.IsStalemate(20, debug=debug):
+        pipeline.Robot(RC.Emote, "dance", 30, debug=debug)
+        virtualBoard.turn = 0
+        return GAMEOVER
+    pipeline.Robot(RC.Emote)
+    pipeline.Robot(RC.Park, debug=debug).result()
+    if listener is not None:
+        listener.Clear()
+    watcher = systems.Watcher(RC.rClient.capture, playerColor, AIColor)
+    watcher.Start([[tile.ID for tile in row] for row in prevBoard.board])
+    movement, confidence = False, 0
+    try:
+        while movement is False or confidence < minConfidence:
+            watcher.Wait()
+            #The watcher is stopped so the confirming read is the only capture on the client
+            watcher.Stop()
+            probabilities = ReadProbabilities(RC.rClient.capture(), playerColor, AIColor, debug=debug)
+            movement, confidence = systems.Resolver().ResolveMove(virtualBoard, probabilities, debug)
+            if movement is False or confidence < minConfidence:
+                print(_yellow + f"Board does not match a legal move (confidence {confidence:.2f}), waiting for it to be corrected" + _white)
+                watcher.Resume()
+    finally:
+        #An interrupt returns to the menu, the watcher must not keep capturing behind it
+        watcher.Stop()
+        watcher = None
+    virtualBoard.MoveTile(movement, validate=False, debug=debug)
+    virtualBoard.ChangeTurn(debug)
+    #The reply is searched while the arm returns home and emotes
+    pipeline.StartSearch(virtualBoard, debug=debug)
+    pipeline.Robot(RC.motion.Home)
+    pipeline.Robot(RC.Emote, "yes", debug=debug)
+    return "moved"
+def AITurn(loop: GameLoop) -> str:
+    """Plays the engine's movement with the arm and verifies it on the physical board"""
+    ReadProbabilities = systems.Calibration().ReadProbabilities
+    IDsFromProbabilities, TilesFromArray = systems.Vision().IDsFromProbabilities, systems.Vision().TilesFromArray
+    if virtualBoard.IsCheckmate(debug) or virtualBoard.IsStalemate(debug=debug):
+        pipeline.Robot(RC.Emote, "no", 30, debug=debug)
+        virtualBoard.turn = 0
+        return GAMEOVER
+    movement, _ = pipeline.Search(virtualBoard, debug=debug)
+    #The arm parks for the verification read straight from the board instead of going home first
+    pipeline.Robot(RC.MoveRobot, RC.Movement2Dto3D(movement, debug, board=virtualBoard), home=False, debug=debug)
+    frame = pipeline.Capture(debug)
+    boardBefore = virtualBoard.CreateClone(debug)
+    virtualBoard.MoveTile(movement, debug=debug)
+    probabilities = ReadProbabilities(frame.result(), playerColor, AIColor, debug=debug)
+    currentBoard.board = TilesFromArray(IDsFromProbabilities(probabilities))
+    index, confidence = systems.Resolver().ResolveBoard([virtualBoard, currentBoard], probabilities, debug=debug)
+    if index != 0 and confidence >= minConfidence:
+        pipeline.Robot(RC.Emote, "no", debug=debug)
+        virtualBoard.board = boardBefore
+        pipeline.Robot(RC.Relocate, currentBoard, virtualBoard, debug=debug).result()
+        return "rejected"
+    pipeline.Robot(RC.Emote, "yes", debug=debug)
+    pipeline.Robot(RC.Relocate, currentBoard, virtualBoard, debug=debug).result()
+    virtualBoard.ChangeTurn(debug)
+    print(virtualBoard)
+    return "moved"
+def Main():
+    """Main loop, plays games back to back until interrupted, resuming the current game if there is one"""
+    global loop
+    if loop is None:
+        loop = GameLoop({SETUP: Setup, VERIFY: Verify, CORRECTION: Correction, HUMAN: HumanTurn, AI: AITurn}, tracer=tracer, debug=debug)
+    loop.debug = debug
+    loop.Run(SETUP if virtualBoard.turn == 0 else VERIFY)
+Start()